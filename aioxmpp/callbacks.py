@@ -101,7 +101,9 @@ import asyncio
 import collections
 import contextlib
 import functools
+import heapq
 import logging
+import math
 import types
 import weakref
 
@@ -255,6 +257,140 @@ class TagDispatcher:
         self._listeners.clear()
 
 
+class TimerWheel:
+    """
+    Timer wheel for a large number of coarse timeouts.
+
+    :param on_expire: Function called with the key of each expired timer.
+    :param resolution: Granularity of the timers in seconds.
+    :type resolution: :class:`float`
+
+    Timers are grouped by the tick (multiple of `resolution`) at which they
+    expire. Instead of one :meth:`asyncio.BaseEventLoop.call_at` handle per
+    timer, a single handle per wheel is used, which is armed for the earliest
+    tick at which any timer is pending. Timers expire at their tick, that is,
+    at most `resolution` seconds late, but never early.
+
+    Slots for the ticks are created when the first timer for a tick is added
+    and dropped when they become empty, so that an idle wheel occupies almost
+    no memory.
+
+    Each key can only have one timer; :meth:`add` replaces an existing timer
+    for the same key.
+    """
+
+    def __init__(self, on_expire, *, resolution=0.1, loop=None):
+        super().__init__()
+        self._on_expire = on_expire
+        self._resolution = resolution
+        # tick -> set of keys expiring at that tick
+        self._slots = {}
+        # heap of the ticks in _slots; may contain ticks of dropped slots
+        self._heap = []
+        self._ticks = {}
+        self._handle = None
+        self._handle_tick = None
+        self._loop = loop or asyncio.get_event_loop()
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def __contains__(self, key):
+        return key in self._ticks
+
+    def _cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        heap = self._heap
+        while heap and heap[0] not in self._slots:
+            heapq.heappop(heap)
+        if not heap:
+            self._cancel()
+            return
+
+        tick = heap[0]
+        if self._handle is not None:
+            if self._handle_tick <= tick:
+                # a spurious early wakeup is cheaper than re-arming
+                return
+            self._handle.cancel()
+        self._handle_tick = tick
+        self._handle = self._loop.call_at(
+            tick * self._resolution,
+            self._tick,
+        )
+
+    def _tick(self):
+        self._handle = None
+        now_tick = math.floor(self._loop.time() / self._resolution)
+
+        heap = self._heap
+        expired = []
+        while heap and heap[0] <= now_tick:
+            slot = self._slots.pop(heapq.heappop(heap), None)
+            if slot is None:
+                continue
+            for key in slot:
+                del self._ticks[key]
+            expired.extend(slot)
+
+        if self._ticks:
+            self._schedule()
+        else:
+            heap.clear()
+
+        for key in expired:
+            self._on_expire(key)
+
+    def add(self, key, timeout):
+        """
+        Start a timer for `key` which expires after `timeout` seconds.
+        """
+        self.discard(key)
+        tick = math.ceil((self._loop.time() + timeout) / self._resolution)
+        try:
+            slot = self._slots[tick]
+        except KeyError:
+            slot = set()
+            self._slots[tick] = slot
+            if len(self._heap) > 2 * len(self._slots) + 16:
+                # too many ticks of dropped slots, rebuild the heap
+                self._heap = sorted(self._slots)
+            else:
+                heapq.heappush(self._heap, tick)
+        slot.add(key)
+        self._ticks[key] = tick
+        self._schedule()
+
+    def discard(self, key):
+        """
+        Stop the timer for `key`, if there is any.
+        """
+        try:
+            tick = self._ticks.pop(key)
+        except KeyError:
+            return
+        slot = self._slots[tick]
+        slot.discard(key)
+        if not slot:
+            del self._slots[tick]
+        if not self._ticks:
+            self._heap.clear()
+            self._cancel()
+
+    def clear(self):
+        """
+        Stop all timers.
+        """
+        self._slots.clear()
+        self._heap.clear()
+        self._ticks.clear()
+        self._cancel()
+
+
 class AbstractAdHocSignal:
     def __init__(self):
         super().__init__()
@@ -731,6 +867,23 @@ class Filter:
     Other arguments passed to :meth:`filter` are passed unmodified to each
     function called; only the first argument is subject to filtering.
 
+    :param key: Function which classifies the objects to filter, or
+                :data:`None`.
+
+    If `key` is given, functions may be registered for a subset of the
+    classes only (see the `keys` argument of :meth:`register`). The class of
+    an object is determined once, by calling `key` with the object passed to
+    :meth:`filter`; functions registered without `keys` are called for all
+    objects. For example, the stanza filters of
+    :class:`~.stream.StanzaStream` use the
+    :attr:`~aioxmpp.stanza.StanzaBase.type_` of the stanzas as key.
+
+    .. versionchanged:: 0.10
+
+       The `key` argument was added. The chain of functions is now compiled
+       when functions are registered or unregistered, instead of on each call
+       to :meth:`filter`.
+
     .. versionchanged:: 0.9
 
        This class was formerly available at :class:`aioxmpp.stream.Filter`.
@@ -751,11 +904,36 @@ class Filter:
                 type(self).__qualname__,
                 id(self))
 
-    def __init__(self):
+    def __init__(self, *, key=None):
         super().__init__()
         self._filter_order = []
+        self._key = key
+        # functions registered without keys, in order
+        self._chain = ()
+        # whether any function has been registered with keys
+        self._keyed = False
+        # cache of compiled chains for each key value
+        self._keyed_chains = {}
+
+    def _compile(self):
+        self._chain = tuple(
+            func for _, _, func, keys in self._filter_order
+            if keys is None
+        )
+        self._keyed = any(
+            keys is not None for _, _, _, keys in self._filter_order
+        )
+        self._keyed_chains = {}
+
+    def _compile_for_key(self, key):
+        chain = tuple(
+            func for _, _, func, keys in self._filter_order
+            if keys is None or key in keys
+        )
+        self._keyed_chains[key] = chain
+        return chain
 
-    def register(self, func, order):
+    def register(self, func, order, *, keys=None):
         """
         Add a function to the filter chain.
 
@@ -780,11 +958,25 @@ class Filter:
         same time in the same :class:`Filter` need to be totally orderable with
         respect to each other.
 
+        If `keys` is not :data:`None`, it must be a collection of values
+        returned by the `key` function of the filter; `func` is then only
+        called for objects with one of these keys. If the filter has no `key`
+        function, :class:`ValueError` is raised.
+
         The returned token can be used to :meth:`unregister` a filter.
+
+        .. versionchanged:: 0.10
+
+           The `keys` argument was added.
         """
+        if keys is not None:
+            if self._key is None:
+                raise ValueError("filter has no key function")
+            keys = frozenset(keys)
         token = self.Token()
-        self._filter_order.append((order, token, func))
+        self._filter_order.append((order, token, func, keys))
         self._filter_order.sort(key=lambda x: x[0])
+        self._compile()
         return token
 
     def filter(self, obj, *args, **kwargs):
@@ -802,7 +994,16 @@ class Filter:
         Returns the object returned by the last function in the filter chain or
         :data:`None` if any function returned :data:`None`.
         """
-        for _, _, func in self._filter_order:
+        if self._keyed:
+            key = self._key(obj)
+            try:
+                chain = self._keyed_chains[key]
+            except KeyError:
+                chain = self._compile_for_key(key)
+        else:
+            chain = self._chain
+
+        for func in chain:
             obj = func(obj, *args, **kwargs)
             if obj is None:
                 return None
@@ -817,16 +1018,17 @@ class Filter:
         Unregister a function from the filter chain using the token returned by
         :meth:`register`.
         """
-        for i, (_, token, _) in enumerate(self._filter_order):
+        for i, (_, token, _, _) in enumerate(self._filter_order):
             if token == token_to_remove:
                 break
         else:
             raise ValueError("unregistered token: {!r}".format(
                 token_to_remove))
         del self._filter_order[i]
+        self._compile()
 
     @contextlib.contextmanager
-    def context_register(self, func, *args):
+    def context_register(self, func, *args, **kwargs):
         """
         :term:`Context manager <context manager>` which temporarily registers a
         filter function.
@@ -839,11 +1041,12 @@ class Filter:
 
         If :meth:`register` does not require `order` because it has been
         overridden in a subclass, the `order` argument can be omitted here,
-        too.
+        too. Keyword arguments (such as `keys`) are passed to
+        :meth:`register`.
 
         .. versionadded:: 0.9
         """
-        token = self.register(func, *args)
+        token = self.register(func, *args, **kwargs)
         try:
             yield
         finally:
@@ -24,12 +24,29 @@ import collections
 
 
 class AsyncDeque:
-    def __init__(self, *, loop=None):
+    """
+    A double-ended queue with asynchronous :meth:`get`.
+
+    :param loop: The event loop to use.
+    :param wakeup: Optional event to set whenever an item is added.
+    :type wakeup: :class:`asyncio.Event`
+
+    The `wakeup` event allows a consumer to wait for any of several queues to
+    become non-empty without creating a task per queue. The event is only
+    ever set by the queue; clearing it is up to the consumer.
+
+    .. versionchanged:: 0.10
+
+       The `wakeup` argument was added.
+    """
+
+    def __init__(self, *, loop=None, wakeup=None):
         super().__init__()
         self._loop = loop
         self._data = collections.deque()
         self._non_empty = asyncio.Event(loop=self._loop)
         self._non_empty.clear()
+        self._wakeup = wakeup
 
     def __len__(self):
         return len(self._data)
@@ -43,10 +60,14 @@ class AsyncDeque:
     def put_nowait(self, obj):
         self._data.append(obj)
         self._non_empty.set()
+        if self._wakeup is not None:
+            self._wakeup.set()
 
     def putleft_nowait(self, obj):
         self._data.appendleft(obj)
         self._non_empty.set()
+        if self._wakeup is not None:
+            self._wakeup.set()
 
     def get_nowait(self):
         try:
@@ -75,3 +96,136 @@ class AsyncDeque:
     def clear(self):
         self._data.clear()
         self._non_empty.clear()
+
+
+class WeightedFairQueue:
+    """
+    A queue which holds items in several lanes and serves them in a weighted
+    round-robin fashion.
+
+    :param weights: The lanes and their weights, in order of precedence.
+    :type weights: sequence of pairs of a lane key and a positive
+        :class:`int`
+    :param key: Function which returns the lane key for an item.
+    :param loop: The event loop to use.
+    :param wakeup: Optional event to set whenever an item is added.
+    :type wakeup: :class:`asyncio.Event`
+
+    Each lane is a FIFO; the order of items within a lane is always preserved.
+    When items are taken from the queue, each non-empty lane may hand out as
+    many items as its weight allows before the lanes later in `weights` get
+    their turn. Once all non-empty lanes have used up their share, a new
+    round starts. Under sustained load, the lanes thus get their share of the
+    queue proportional to their weight, while no lane is starved.
+
+    The interface is the same as the one of :class:`AsyncDeque`, except that
+    :meth:`getright_nowait` is not supported. :meth:`putleft_nowait` puts the
+    item at the front of its lane.
+
+    .. automethod:: items
+
+    .. automethod:: lane_depths
+
+    .. versionadded:: 0.10
+    """
+
+    def __init__(self, weights, key, *, loop=None, wakeup=None):
+        super().__init__()
+        self._loop = loop
+        self._key = key
+        self._weights = [(lane, weight) for lane, weight in weights]
+        for lane, weight in self._weights:
+            if weight <= 0:
+                raise ValueError(
+                    "weight of lane {!r} must be positive".format(lane)
+                )
+        self._lanes = collections.OrderedDict(
+            (lane, collections.deque())
+            for lane, _ in self._weights
+        )
+        self._credit = dict(self._weights)
+        self._size = 0
+        self._non_empty = asyncio.Event(loop=self._loop)
+        self._non_empty.clear()
+        self._wakeup = wakeup
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, obj):
+        return obj in self._lanes[self._key(obj)]
+
+    def empty(self):
+        return not self._non_empty.is_set()
+
+    def items(self):
+        """
+        Return a list of all items in the queue, lane by lane.
+
+        This does not remove the items from the queue.
+        """
+        return [
+            item
+            for items in self._lanes.values()
+            for item in items
+        ]
+
+    def lane_depths(self):
+        """
+        Return a dictionary mapping each lane key to the number of items
+        currently held in that lane.
+        """
+        return {
+            lane: len(items)
+            for lane, items in self._lanes.items()
+        }
+
+    def put_nowait(self, obj):
+        self._lanes[self._key(obj)].append(obj)
+        self._size += 1
+        self._non_empty.set()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def putleft_nowait(self, obj):
+        self._lanes[self._key(obj)].appendleft(obj)
+        self._size += 1
+        self._non_empty.set()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _select_lane(self):
+        for lane, items in self._lanes.items():
+            if items and self._credit[lane] > 0:
+                return lane, items
+
+        # all non-empty lanes have used up their share: start a new round
+        self._credit.update(self._weights)
+        for lane, items in self._lanes.items():
+            if items:
+                return lane, items
+
+    def get_nowait(self):
+        if not self._size:
+            raise asyncio.QueueEmpty()
+        lane, items = self._select_lane()
+        self._credit[lane] -= 1
+        self._size -= 1
+        if not self._size:
+            # the queue ran dry, so the next burst starts a fresh round
+            self._credit.update(self._weights)
+            self._non_empty.clear()
+        return items.popleft()
+
+    @asyncio.coroutine
+    def get(self):
+        while not self._size:
+            yield from self._non_empty.wait()
+        return self.get_nowait()
+
+    def clear(self):
+        for items in self._lanes.values():
+            items.clear()
+        self._credit.update(self._weights)
+        self._size = 0
+        self._non_empty.clear()
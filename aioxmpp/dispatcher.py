@@ -90,6 +90,42 @@ class SimpleStanzaDispatcher(metaclass=abc.ABCMeta):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._map = {}
+        # type_ -> (localpart, domain) -> [wildcard_cb, {resource: cb}]
+        self._index = {}
+        # type_ -> cb, for callbacks registered with from_ = None
+        self._type_index = {}
+
+    def _index_add(self, type_, from_, wildcard_resource, cb):
+        if from_ is None:
+            self._type_index[type_] = cb
+            return
+
+        entry = self._index.setdefault(type_, {}).setdefault(
+            (from_.localpart, from_.domain),
+            [None, {}],
+        )
+        if wildcard_resource:
+            entry[0] = cb
+        else:
+            entry[1][from_.resource] = cb
+
+    def _index_remove(self, type_, from_, wildcard_resource):
+        if from_ is None:
+            del self._type_index[type_]
+            return
+
+        by_bare = self._index[type_]
+        bare_key = from_.localpart, from_.domain
+        entry = by_bare[bare_key]
+        if wildcard_resource:
+            entry[0] = None
+        else:
+            del entry[1][from_.resource]
+
+        if entry[0] is None and not entry[1]:
+            del by_bare[bare_key]
+            if not by_bare:
+                del self._index[type_]
 
     @abc.abstractproperty
     def local_jid(self):
@@ -117,23 +153,31 @@ class SimpleStanzaDispatcher(metaclass=abc.ABCMeta):
         if from_ is None:
             from_ = self.local_jid
 
-        keys = [
-            (stanza.type_, from_, False),
-            (stanza.type_, from_.bare(), True),
-            (None, from_, False),
-            (None, from_.bare(), True),
-            (stanza.type_, None, False),
-            (None, from_, False),
-            (None, None, False),
-        ]
-
-        for key in keys:
+        type_ = stanza.type_
+        bare_key = from_.localpart, from_.domain
+        resource = from_.resource
+
+        # exact sender (or bare sender without wildcard) first, then the
+        # wildcard for the bare sender; both first for the stanza type, then
+        # for the wildcard type
+        for key_type in (type_, None):
             try:
-                cb = self._map[key]
+                wildcard_cb, by_resource = self._index[key_type][bare_key]
             except KeyError:
                 continue
+            cb = by_resource.get(resource, wildcard_cb)
+            if cb is not None:
+                cb(stanza)
+                return True
+
+        cb = self._type_index.get(type_)
+        if cb is None:
+            cb = self._type_index.get(None)
+        if cb is not None:
             cb(stanza)
-            return
+            return True
+
+        return False
 
     def register_callback(self, type_, from_, cb, *,
                           wildcard_resource=True):
@@ -209,6 +253,7 @@ class SimpleStanzaDispatcher(metaclass=abc.ABCMeta):
             )
 
         self._map[type_, from_, wildcard_resource] = cb
+        self._index_add(type_, from_, wildcard_resource, cb)
 
     def unregister_callback(self, type_, from_, *,
                             wildcard_resource=True):
@@ -231,6 +276,7 @@ class SimpleStanzaDispatcher(metaclass=abc.ABCMeta):
             wildcard_resource = False
 
         self._map.pop((type_, from_, wildcard_resource))
+        self._index_remove(type_, from_, wildcard_resource)
 
     @contextlib.contextmanager
     def handler_context(self, type_, from_, cb, *, wildcard_resource=True):
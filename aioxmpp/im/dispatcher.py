@@ -21,6 +21,7 @@
 ########################################################################
 import asyncio
 import enum
+import operator
 
 import aioxmpp.callbacks
 import aioxmpp.carbons
@@ -62,6 +63,10 @@ class IMDispatcher(aioxmpp.service.Service):
        `source` indicates how the message was sent or received. It may be one
        of the values of the :class:`MessageSource` enumeration.
 
+    The ``message_filter`` and ``presence_filter`` filter chains use the
+    :attr:`~.StanzaBase.type_` of the stanza as key (see the `keys` argument
+    of :meth:`.callbacks.Filter.register`).
+
     """
 
     ORDER_AFTER = [
@@ -77,8 +82,12 @@ class IMDispatcher(aioxmpp.service.Service):
 
     def __init__(self, client, **kwargs):
         super().__init__(client, **kwargs)
-        self.message_filter = aioxmpp.callbacks.Filter()
-        self.presence_filter = aioxmpp.callbacks.Filter()
+        self.message_filter = aioxmpp.callbacks.Filter(
+            key=operator.attrgetter("type_")
+        )
+        self.presence_filter = aioxmpp.callbacks.Filter(
+            key=operator.attrgetter("type_")
+        )
 
     @aioxmpp.service.depsignal(
         aioxmpp.node.Client,
@@ -38,6 +38,8 @@ Using XMPP
 
 .. currentmodule:: aioxmpp.node
 
+.. autoclass:: ClientPool
+
 .. class:: AbstractClient
 
    Alias of :class:`Client`.
@@ -58,8 +60,11 @@ Utilities
 
 .. autoclass:: UseConnected
 
+.. autoclass:: SendMany
+
 """
 import asyncio
+import collections
 import contextlib
 import logging
 import warnings
@@ -86,6 +91,7 @@ from . import (
     structs,
     security_layer,
     dispatcher,
+    tasks,
     presence as mod_presence,
 )
 from .utils import namespaces
@@ -434,6 +440,8 @@ class Client:
     :type loop: :class:`asyncio.BaseEventLoop` or :data:`None`
     :param logger: Logger to use instead of the default logger
     :type logger: :class:`logging.Logger` or :data:`None`
+    :param iq_timers: Timer wheel for the IQ timeouts of the stanza stream
+    :type iq_timers: :class:`~aioxmpp.callbacks.TimerWheel` or :data:`None`
 
     These classes deal with managing the :class:`~aioxmpp.stream.StanzaStream`
     and the underlying :class:`~aioxmpp.protocol.XMLStream` instances. The
@@ -508,6 +516,12 @@ class Client:
        `max_initial_attempts`. The :meth:`on_stream_suspended` signal and the
        associated logic has been introduced.
 
+    .. versionchanged:: 0.10
+
+       The `iq_timers` argument was added. It is passed to the
+       :class:`~aioxmpp.stream.StanzaStream` and mainly used by
+       :class:`ClientPool`.
+
     Controlling the client:
 
     .. automethod:: connected
@@ -516,6 +530,8 @@ class Client:
 
     .. automethod:: stop
 
+    .. automethod:: suspend
+
     .. autoattribute:: running
 
     .. attribute:: negotiation_timeout
@@ -546,6 +562,20 @@ class Client:
     .. autoattribute:: resumption_timeout
         :annotation: = None
 
+    .. attribute:: sm_state_store
+        :annotation: = None
+
+       An :class:`aioxmpp.sm_store.AbstractSMStateStore` instance or
+       :data:`None`.
+
+       If set, :meth:`suspend` saves the Stream Management state of the
+       stream to the store, and :meth:`start` attempts to resume the stream
+       from the saved state (which is then removed from the store). This
+       allows resuming a stream after the process has been restarted. If the
+       resumption fails, a new stream is negotiated as usual.
+
+       .. versionadded:: 0.10
+
     Connection information:
 
     .. autoattribute:: established
@@ -582,6 +612,8 @@ class Client:
 
     .. automethod:: enqueue
 
+    .. automethod:: send_many
+
     Configuration of exponential backoff for reconnects:
 
     .. attribute:: backoff_start
@@ -710,7 +742,8 @@ class Client:
                  max_initial_attempts=4,
                  override_peer=[],
                  loop=None,
-                 logger=None):
+                 logger=None,
+                 iq_timers=None):
         super().__init__()
         self._local_jid = local_jid
         self._loop = loop or asyncio.get_event_loop()
@@ -727,6 +760,7 @@ class Client:
         self._backoff_time = None
 
         self._is_suspended = False
+        self._suspend_requested = False
 
         # track whether the connection succeeded *at least once*
         # used to enforce max_initial_attempts
@@ -745,6 +779,7 @@ class Client:
         self.established_event = asyncio.Event()
         self._max_initial_attempts = max_initial_attempts
         self._resumption_timeout = None
+        self.sm_state_store = None
 
         self.on_stopped.logger = self.logger.getChild("on_stopped")
         self.on_failure.logger = self.logger.getChild("on_failure")
@@ -761,7 +796,8 @@ class Client:
             stream_base_logger = logging.getLogger("aioxmpp")
         self.stream = stream.StanzaStream(
             local_jid.bare(),
-            base_logger=stream_base_logger
+            base_logger=stream_base_logger,
+            iq_timers=iq_timers,
         )
 
         self.stream._xxx_message_dispatcher = self.summon(
@@ -821,6 +857,7 @@ class Client:
             task.result()
         except asyncio.CancelledError:
             # task terminated normally
+            self._suspend_requested = False
             self.on_stopped()
         except Exception as err:
             self.logger.exception("main failed")
@@ -867,6 +904,12 @@ class Client:
             resumed = yield from self._try_resume_stream_management(
                 xmlstream, features)
             if resumed:
+                if not self.established_event.is_set():
+                    # resumed from a state restored from the store
+                    self.stream_features = features
+                    self.established_event.set()
+                    yield from self.before_stream_established()
+                    self.on_stream_established()
                 return features, resumed
         else:
             resumed = False
@@ -956,6 +999,14 @@ class Client:
             self.logger.error("stream failed: %s", exc)
             raise exc
         except asyncio.CancelledError:
+            if self._suspend_requested:
+                self.logger.info("client suspending (on request)")
+                # keep the stream alive on the server side so that it can be
+                # resumed later
+                yield from self.stream.wait_stop()
+                xmlstream.abort()
+                self._save_sm_state()
+                raise
             self.logger.info("client shutting down (on request)")
             # cancelled, this means a clean shutdown is requested
             yield from self.stream.close()
@@ -964,8 +1015,49 @@ class Client:
             self.logger.info("stopping stream")
             self.stream.stop()
 
+    def _save_sm_state(self):
+        if self.sm_state_store is None:
+            return
+        if not self.stream.sm_enabled or not self.stream.sm_resumable:
+            self.logger.info("stream is not resumable, not saving SM state")
+            return
+        self.sm_state_store.save(self._local_jid,
+                                 self.stream.export_sm_state())
+        self.logger.debug("SM state saved")
+
+    def _restore_sm_state(self):
+        if self.sm_state_store is None:
+            return
+        if self.stream.sm_enabled:
+            # the state held by the stream supersedes any stored snapshot
+            self.sm_state_store.clear()
+            return
+        try:
+            loaded = self.sm_state_store.load()
+        except Exception:
+            self.logger.warning("failed to load SM state, discarding it",
+                                exc_info=True)
+            self.sm_state_store.clear()
+            return
+        if loaded is None:
+            return
+        local_jid, state = loaded
+        self.sm_state_store.clear()
+        if local_jid.bare() != self._local_jid.bare():
+            self.logger.warning(
+                "stored SM state belongs to %s, not to %s; discarding it",
+                local_jid.bare(),
+                self._local_jid.bare(),
+            )
+            return
+        self._local_jid = local_jid
+        self.stream.local_jid = local_jid.bare()
+        self.stream.import_sm_state(state)
+        self.logger.debug("SM state restored for %s", local_jid)
+
     @asyncio.coroutine
     def _main(self):
+        self._restore_sm_state()
         with contextlib.ExitStack() as stack:
             stack.enter_context(
                 self.stream.on_failure.context_connect(self._stream_failure)
@@ -1020,6 +1112,7 @@ class Client:
         if self.running:
             raise RuntimeError("client already running")
 
+        self._suspend_requested = False
         self._main_task = asyncio.async(
             self._main(),
             loop=self._loop
@@ -1041,6 +1134,26 @@ class Client:
         self.logger.debug("stopping main task of %r", self, stack_info=True)
         self._main_task.cancel()
 
+    def suspend(self):
+        """
+        Stop the client without closing the stream.
+
+        This works like :meth:`stop`, except that the connection is aborted
+        instead of closed, so that the server keeps the Stream Management
+        session alive. If :attr:`sm_state_store` is set and the stream is
+        resumable, the Stream Management state is saved to the store and the
+        stream can be resumed by a client started later (possibly in another
+        process).
+
+        .. versionadded:: 0.10
+        """
+        if not self.running:
+            return
+
+        self.logger.debug("suspending main task of %r", self)
+        self._suspend_requested = True
+        self._main_task.cancel()
+
     # services
 
     def _summon(self, class_, visited):
@@ -1182,7 +1295,8 @@ class Client:
 
         The `stanza` is enqueued in the active queue for transmission and will
         be sent on the next opportunity. The relative ordering of stanzas
-        enqueued is always preserved.
+        enqueued with the same `priority` (see
+        :class:`~aioxmpp.stream.StanzaToken`) is always preserved.
 
         Return a fresh :class:`StanzaToken` instance which traks the progress
         of the transmission of the `stanza`. The `kwargs` are forwarded to the
@@ -1207,7 +1321,8 @@ class Client:
         return self.stream._enqueue(stanza, **kwargs)
 
     @asyncio.coroutine
-    def send(self, stanza, *, timeout=None, cb=None):
+    def send(self, stanza, *, timeout=None, cb=None,
+             priority=stream.StanzaPriority.INTERACTIVE):
         """
         Send a stanza.
 
@@ -1226,6 +1341,8 @@ class Client:
         :raise aioxmpp.errors.XMPPError: if an error IQ response is received
         :raise aioxmpp.errors.ErroneousStanza: if the IQ response could not be
             parsed
+        :param priority: Lane of the active queue to put the stanza in.
+        :type priority: :class:`~aioxmpp.stream.StanzaPriority`
         :raise ValueError: if `cb` is given and `stanza` is not an IQ request.
         :return: IQ response :attr:`~.IQ.payload` or :data:`None`
 
@@ -1281,6 +1398,7 @@ class Client:
 
             * This method now waits until the stream is ready to send stanza¸
               payloads.
+            * The `priority` argument was added.
             * This method was moved from
               :meth:`aioxmpp.stream.StanzaStream.send`.
 
@@ -1324,7 +1442,485 @@ class Client:
 
         return (yield from self.stream._send_immediately(stanza,
                                                          timeout=timeout,
-                                                         cb=cb))
+                                                         cb=cb,
+                                                         priority=priority))
+
+    def send_many(self, stanzas, *, max_in_flight=None, timeout=None,
+                  priority=stream.StanzaPriority.INTERACTIVE):
+        """
+        Send many stanzas, with a limit on the number of outstanding requests.
+
+        :param stanzas: Stanzas to send
+        :type stanzas: iterable of :class:`~.IQ`, :class:`~.Presence` or
+            :class:`~.Message`
+        :param max_in_flight: Maximum number of stanzas for which :meth:`send`
+            may be running at the same time, or :data:`None` for no limit.
+        :type max_in_flight: positive :class:`int` or :data:`None`
+        :param timeout: Passed to :meth:`send` for each stanza.
+        :param priority: Passed to :meth:`send` for each stanza.
+        :rtype: :class:`SendMany`
+        :return: Asynchronous iterator over the results.
+
+        Each stanza is sent with :meth:`send`, in the order in which they are
+        taken from `stanzas`. `stanzas` is consumed lazily: the next stanza is
+        only taken when fewer than `max_in_flight` stanzas are in flight.
+
+        The returned :class:`SendMany` yields pairs of a stanza and the
+        (done) :class:`asyncio.Future` which holds the result of :meth:`send`
+        for that stanza, in the order in which the sends complete:
+
+        .. code-block:: python
+
+           async for iq, fut in client.send_many(iqs, max_in_flight=64):
+               try:
+                   payload = fut.result()
+               except aioxmpp.errors.XMPPError as exc:
+                   ...
+
+        The timeouts of all pending IQ requests share the timer of the
+        :class:`~.StanzaStream`; no additional timer is created per request.
+
+        .. versionadded:: 0.10
+        """
+        return SendMany(
+            self,
+            stanzas,
+            max_in_flight=max_in_flight,
+            timeout=timeout,
+            priority=priority,
+        )
+
+
+class ClientPool:
+    """
+    Run a large number of :class:`Client` instances on one event loop.
+
+    :param connect_interval: Minimum time between starting two clients
+    :type connect_interval: :class:`datetime.timedelta`
+    :param max_connecting: Maximum number of clients establishing their stream
+                           at the same time
+    :type max_connecting: :class:`int` or :data:`None`
+    :param iq_timer_resolution: Granularity of the IQ timeouts in seconds
+    :type iq_timer_resolution: :class:`float`
+    :param loop: Override the :mod:`asyncio` event loop to use
+    :type loop: :class:`asyncio.BaseEventLoop` or :data:`None`
+    :param logger: Logger to use instead of the default logger
+    :type logger: :class:`logging.Logger` or :data:`None`
+
+    The pool reduces the per-account overhead of running many accounts in one
+    process:
+
+    * All clients created with :meth:`create` share one timer wheel for the
+      timeouts of their IQ requests and for the ping timers of their streams
+      (see :func:`aioxmpp.stream.make_iq_timer_wheel`), instead of a wheel
+      and timer handles per stream.
+
+    * The :class:`aioxmpp.EntityCapsService` instances summoned with
+      :meth:`summon` share the :attr:`entitycaps_cache`, so that a verified
+      capability hash is looked up only once per process.
+
+    * :xep:`30` nodes mounted with :meth:`mount_disco_node` are shared by the
+      :class:`aioxmpp.DiscoServer` instances of all clients. The root node is
+      not shared: it is the :class:`~aioxmpp.DiscoServer` itself, and the
+      services of each client register their features and identities on it
+      individually.
+
+    * Connection establishment is staggered. :meth:`start` starts the clients
+      one after the other, with at least `connect_interval` between two starts
+      and with at most `max_connecting` clients connecting at the same time
+      (:data:`None` means no limit). A client is connecting from the moment it
+      is started until its stream is established for the first time, it fails
+      or it is stopped.
+
+    The pool supports :func:`len`, iteration over the clients (in the order in
+    which they were added) and membership tests.
+
+    .. automethod:: create
+
+    .. automethod:: add
+
+    .. automethod:: remove
+
+    .. automethod:: summon
+
+    .. automethod:: mount_disco_node
+
+    .. automethod:: start
+
+    .. automethod:: stop
+
+    .. autoattribute:: running
+
+    .. autoattribute:: entitycaps_cache
+
+    .. attribute:: connect_interval
+
+       The minimum time between starting two clients, as
+       :class:`datetime.timedelta`. Changes take effect with the next start.
+
+    .. versionadded:: 0.10
+    """
+
+    def __init__(self, *,
+                 connect_interval=timedelta(0),
+                 max_connecting=None,
+                 iq_timer_resolution=0.1,
+                 loop=None,
+                 logger=None):
+        super().__init__()
+        if max_connecting is not None and max_connecting <= 0:
+            raise ValueError("max_connecting must be positive or None")
+        self._loop = loop or asyncio.get_event_loop()
+        self.logger = (logger or
+                       logging.getLogger(".".join([
+                           type(self).__module__,
+                           type(self).__qualname__,
+                       ])))
+        self.connect_interval = connect_interval
+        self._max_connecting = max_connecting
+        self._iq_timers = stream.make_iq_timer_wheel(
+            resolution=iq_timer_resolution,
+            loop=self._loop,
+        )
+        self._entitycaps_cache = None
+        # used as ordered set
+        self._clients = collections.OrderedDict()
+        self._services = []
+        self._disco_nodes = {}
+        self._connecting = {}
+        self._start_queue = collections.deque()
+        self._start_wakeup = asyncio.Event(loop=self._loop)
+        self._starter_task = None
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __iter__(self):
+        return iter(self._clients)
+
+    def __contains__(self, client):
+        return client in self._clients
+
+    @property
+    def running(self):
+        """
+        :data:`True` between :meth:`start` and :meth:`stop`.
+        """
+        return (self._starter_task is not None and
+                not self._starter_task.done())
+
+    @property
+    def entitycaps_cache(self):
+        """
+        The :class:`aioxmpp.entitycaps.Cache` shared by the
+        :class:`~aioxmpp.EntityCapsService` instances of the clients in the
+        pool.
+        """
+        if self._entitycaps_cache is None:
+            import aioxmpp.entitycaps
+            self._entitycaps_cache = aioxmpp.entitycaps.Cache()
+        return self._entitycaps_cache
+
+    def _share_services(self, client):
+        import aioxmpp.disco
+        import aioxmpp.entitycaps
+        try:
+            caps = client._services[aioxmpp.entitycaps.EntityCapsService]
+        except KeyError:
+            pass
+        else:
+            caps.cache = self.entitycaps_cache
+
+        try:
+            disco = client._services[aioxmpp.disco.DiscoServer]
+        except KeyError:
+            pass
+        else:
+            for mountpoint, node in self._disco_nodes.items():
+                disco.mount_node(mountpoint, node)
+
+    def create(self, local_jid, security_layer, *,
+               client_class=Client, **kwargs):
+        """
+        Create a client and add it to the pool.
+
+        :param client_class: The class to instantiate
+        :type client_class: subclass of :class:`Client`
+        :return: The new client
+
+        `local_jid`, `security_layer` and the keyword arguments are passed to
+        `client_class`, together with the event loop of the pool and the
+        shared timer wheel for IQ timeouts.
+        """
+        client = client_class(
+            local_jid,
+            security_layer,
+            loop=self._loop,
+            iq_timers=self._iq_timers,
+            **kwargs
+        )
+        self.add(client)
+        return client
+
+    def add(self, client):
+        """
+        Add an existing `client` to the pool.
+
+        All services summoned with :meth:`summon` are summoned on the client.
+        If the pool is running and the client is not, the client is queued
+        for starting.
+
+        Clients which were not created with :meth:`create` do not share the
+        timer wheel for IQ timeouts.
+
+        :raises ValueError: if the client is already in the pool
+        """
+        if client in self._clients:
+            raise ValueError("client is already in the pool")
+        self._clients[client] = None
+        for class_ in self._services:
+            client.summon(class_)
+        self._share_services(client)
+
+        if self.running and not client.running:
+            self._enqueue_start(client)
+
+    def remove(self, client):
+        """
+        Remove `client` from the pool.
+
+        The client is not stopped. If it is waiting to be started by the pool,
+        it will not be started.
+
+        :raises KeyError: if the client is not in the pool
+        """
+        del self._clients[client]
+        try:
+            self._start_queue.remove(client)
+        except ValueError:
+            pass
+        self._connected(client)
+
+    def summon(self, class_):
+        """
+        Summon the service `class_` on all clients in the pool and on all
+        clients which are added later.
+
+        Use :meth:`Client.summon` to obtain the instance of a specific client.
+        """
+        if class_ not in self._services:
+            self._services.append(class_)
+        for client in self._clients:
+            client.summon(class_)
+            self._share_services(client)
+
+    def mount_disco_node(self, mountpoint, node):
+        """
+        Mount the :class:`aioxmpp.disco.Node` `node` at `mountpoint` on the
+        :class:`aioxmpp.DiscoServer` of all clients in the pool and of all
+        clients which are added later.
+
+        The :class:`~aioxmpp.DiscoServer` is summoned as with :meth:`summon`.
+        All clients refer to the same `node` object, so a
+        :class:`aioxmpp.disco.StaticNode` with the same contents for all
+        accounts is held only once per process.
+        """
+        import aioxmpp.disco
+        self._disco_nodes[mountpoint] = node
+        self.summon(aioxmpp.disco.DiscoServer)
+
+    def start(self):
+        """
+        Start the clients in the pool which are not running yet.
+
+        The clients are started in the background, staggered as described
+        above. While the pool is running, clients which are added to it are
+        started, too. If the pool is already :attr:`running`,
+        :class:`RuntimeError` is raised.
+        """
+        if self.running:
+            raise RuntimeError("pool already running")
+
+        for client in self._clients:
+            if not client.running:
+                self._start_queue.append(client)
+
+        self._starter_task = asyncio.async(
+            self._starter(),
+            loop=self._loop,
+        )
+        self._starter_task.add_done_callback(self._on_starter_done)
+
+    def stop(self):
+        """
+        Stop the pool and all clients in it.
+
+        Clients which are still waiting to be started are not started.
+        """
+        if self._starter_task is not None:
+            self._starter_task.cancel()
+            self._starter_task = None
+        self._start_queue.clear()
+        for client in list(self._connecting):
+            self._connected(client)
+        for client in self._clients:
+            client.stop()
+
+    def _on_starter_done(self, task):
+        try:
+            task.result()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.logger.exception("starting clients failed")
+
+    def _enqueue_start(self, client):
+        self._start_queue.append(client)
+        self._start_wakeup.set()
+
+    def _track_connecting(self, client):
+        def done(*args, **kwargs):
+            self._connected(client)
+
+        self._connecting[client] = [
+            (signal, signal.connect(done))
+            for signal in [client.on_stream_established,
+                           client.on_failure,
+                           client.on_stopped]
+        ]
+
+    def _connected(self, client):
+        try:
+            tokens = self._connecting.pop(client)
+        except KeyError:
+            return
+        for signal, token in tokens:
+            signal.disconnect(token)
+        self._start_wakeup.set()
+
+    def _may_start(self):
+        if not self._start_queue:
+            return False
+        return (self._max_connecting is None or
+                len(self._connecting) < self._max_connecting)
+
+    @asyncio.coroutine
+    def _starter(self):
+        while True:
+            if not self._may_start():
+                self._start_wakeup.clear()
+                yield from self._start_wakeup.wait()
+                continue
+
+            client = self._start_queue.popleft()
+            if client.running:
+                continue
+
+            self.logger.debug("starting %r", client)
+            self._track_connecting(client)
+            client.start()
+
+            interval = self.connect_interval.total_seconds()
+            if interval > 0:
+                yield from asyncio.sleep(interval, loop=self._loop)
+
+
+class SendMany:
+    """
+    Asynchronous iterator over the results of :meth:`Client.send_many`.
+
+    The stanzas are sent by tasks in a :class:`~aioxmpp.tasks.TaskPool` whose
+    total limit is the `max_in_flight` value. New stanzas are only sent while
+    the iterator is being consumed.
+
+    .. automethod:: cancel
+
+    .. autoattribute:: in_flight
+
+    .. versionadded:: 0.10
+    """
+
+    def __init__(self, client, stanzas, *, max_in_flight=None, timeout=None,
+                 priority=stream.StanzaPriority.INTERACTIVE):
+        super().__init__()
+        if max_in_flight is not None and max_in_flight <= 0:
+            raise ValueError("max_in_flight must be positive")
+        self._client = client
+        self._stanzas = iter(stanzas)
+        self._timeout = timeout
+        self._priority = priority
+        self._pool = tasks.TaskPool(max_tasks=max_in_flight)
+        self._pending = {}
+        self._done = collections.deque()
+        self._done_event = asyncio.Event()
+        self._exhausted = False
+
+    @property
+    def in_flight(self):
+        """
+        The number of stanzas which are currently being sent or awaiting a
+        response.
+        """
+        return self._pool.get_task_count(())
+
+    def _fill(self):
+        limit = self._pool.get_limit(())
+        while not self._exhausted:
+            if limit is not None and self._pool.get_task_count(()) >= limit:
+                break
+            try:
+                stanza = next(self._stanzas)
+            except StopIteration:
+                self._exhausted = True
+                break
+            task = self._pool.spawn(
+                set(),
+                self._client.send,
+                stanza,
+                timeout=self._timeout,
+                priority=self._priority,
+            )
+            self._pending[task] = stanza
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        try:
+            stanza = self._pending.pop(task)
+        except KeyError:
+            # dropped by cancel()
+            return
+        self._done.append((stanza, task))
+        self._done_event.set()
+
+    def cancel(self):
+        """
+        Stop sending stanzas and cancel the sends which are in flight.
+
+        This should be called when the iteration is aborted early.
+        """
+        self._exhausted = True
+        for task in self._pending:
+            task.cancel()
+        self._pending.clear()
+        self._done.clear()
+        # wake up a pending __anext__, which then finds nothing left to do
+        self._done_event.set()
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        while not self._done:
+            self._fill()
+            if not self._pending:
+                raise StopAsyncIteration
+            self._done_event.clear()
+            yield from self._done_event.wait()
+        # refill right away so that sends are not delayed until the consumer
+        # asks for the next result
+        self._fill()
+        return self._done.popleft()
 
 
 class PresenceManagedClient(Client):
@@ -42,6 +42,8 @@ Utilities for XML streams
 
 .. autofunction:: reset_stream_and_get_features
 
+.. autoclass:: WriteCoalescer
+
 Enumerations
 ============
 
@@ -52,6 +54,7 @@ Enumerations
 """
 
 import asyncio
+import collections
 import contextlib
 import functools
 import inspect
@@ -186,6 +189,110 @@ class DebugWrapper:
             self._muted = False
 
 
+class WriteCoalescer:
+    """
+    Collect data written to a transport and pass it on in larger chunks.
+
+    :param transport: The transport to write to.
+    :type transport: :class:`asyncio.WriteTransport`
+    :param loop: The event loop to schedule the writes on.
+    :type loop: :class:`asyncio.BaseEventLoop`
+    :param max_bytes: Amount of collected data after which it is written
+        immediately.
+    :type max_bytes: :class:`int`
+    :param max_delay: Maximum time in seconds for which data is held back.
+    :type max_delay: :class:`float`
+
+    Data passed to :meth:`write` is collected and passed to
+    :meth:`~asyncio.WriteTransport.writelines` of the `transport` in one call.
+    If `max_delay` is zero, this happens in the next iteration of the event
+    loop. Thus, everything written in one iteration (for example a burst of
+    stanzas sent by the :class:`~.StanzaStream`) reaches the transport
+    together, which saves system calls and TLS records. Otherwise, the data
+    is written at most `max_delay` seconds after the first piece was
+    collected.
+
+    If at least `max_bytes` bytes are collected, they are written right away.
+
+    .. automethod:: write
+
+    .. automethod:: flush_buffer
+
+    .. automethod:: discard
+
+    .. autoattribute:: buffered_bytes
+
+    .. note::
+
+       The class deliberately has no ``flush`` method:
+       :class:`~.xml.XMPPXMLGenerator` flushes its sink after each stanza,
+       which would defeat the purpose of collecting the data.
+
+    .. versionadded:: 0.10
+    """
+
+    def __init__(self, transport, loop, max_bytes=65536, max_delay=0):
+        super().__init__()
+        self.transport = transport
+        self._loop = loop
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay
+        self._pieces = []
+        self._size = 0
+        self._handle = None
+
+    @property
+    def buffered_bytes(self):
+        """
+        The number of bytes which have been collected, but not written yet.
+        """
+        return self._size
+
+    def _cancel_handle(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def write(self, data):
+        """
+        Collect `data` for writing to the transport.
+
+        `data` is copied, so that buffers owned by the caller can be re-used.
+        """
+        self._pieces.append(bytes(data))
+        self._size += len(data)
+        if self._size >= self._max_bytes:
+            self.flush_buffer()
+        elif self._handle is None:
+            if self._max_delay > 0:
+                self._handle = self._loop.call_later(self._max_delay,
+                                                     self.flush_buffer)
+            else:
+                self._handle = self._loop.call_soon(self.flush_buffer)
+
+    def flush_buffer(self):
+        """
+        Write all collected data to the transport immediately.
+        """
+        self._cancel_handle()
+        if not self._pieces:
+            return
+        pieces = self._pieces
+        self._pieces = []
+        self._size = 0
+        self.transport.writelines(pieces)
+
+    def discard(self):
+        """
+        Drop all collected data without writing it.
+
+        This is used when the transport is gone.
+        """
+        self._cancel_handle()
+        self._pieces.clear()
+        self._size = 0
+
+
 class XMLStream(asyncio.Protocol):
     """
     XML stream implementation. This is an streaming :class:`asyncio.Protocol`
@@ -247,6 +354,14 @@ class XMLStream(asyncio.Protocol):
 
     .. automethod:: abort
 
+    Flow control:
+
+    .. autoattribute:: writing_paused
+
+    .. automethod:: pause_reading
+
+    .. automethod:: resume_reading
+
     Controlling debug output:
 
     .. automethod:: mute
@@ -273,6 +388,21 @@ class XMLStream(asyncio.Protocol):
        will be able to deal with unhandled top level stanzas correctly at this
        point (by ignoring them).
 
+    .. signal:: on_writing_paused()
+
+       The transport asked the stream to pause writing, because its write
+       buffer is above its high-water mark. Data sent in the meantime is
+       still buffered by the transport.
+
+       .. versionadded:: 0.10
+
+    .. signal:: on_writing_resumed()
+
+       The transport drained its write buffer below its low-water mark, or
+       the connection has been lost while writing was paused.
+
+       .. versionadded:: 0.10
+
     Timeouts:
 
     .. attribute:: shutdown_timeout
@@ -280,10 +410,87 @@ class XMLStream(asyncio.Protocol):
        The maximum time to wait for the peer ``</stream:stream>`` before
        forcing to close the transport and considering the stream closed.
 
+    Parsing:
+
+    .. attribute:: batched_parsing
+
+       If true, a :class:`~aioxmpp.xml.BatchingExpatReader` is used instead
+       of the :mod:`xml.sax` reader from :func:`~aioxmpp.xml.make_parser` to
+       parse the received data. Each stream-level element is then collected
+       completely before the :attr:`stanza_parser` processes it in one go,
+       which is considerably cheaper for large stanzas.
+
+       The value is evaluated whenever the parser is (re-)created, that is,
+       on :meth:`reset` and after :meth:`starttls`. It defaults to false.
+
+       .. versionadded:: 0.10
+
+    .. attribute:: offload_threshold
+
+       If not :data:`None` and :attr:`batched_parsing` is enabled,
+       stream-level elements with at least this many characters of text
+       content (for example stanzas with large base64 encoded payloads) are
+       parsed in :attr:`offload_executor` instead of on the event loop. The
+       parsed objects are passed to the :attr:`stanza_parser` callbacks in the
+       order in which the elements were received; elements received while a
+       large element is being parsed are held back until it is done.
+
+       The value is evaluated whenever the parser is (re-)created, like
+       :attr:`batched_parsing`. It defaults to :data:`None`.
+
+       .. versionadded:: 0.10
+
+    .. attribute:: offload_executor
+
+       The :class:`concurrent.futures.Executor` used for
+       :attr:`offload_threshold`, or :data:`None` for the default executor of
+       the event loop.
+
+       .. versionadded:: 0.10
+
+    .. autoattribute:: offload_handler
+
+    Writing:
+
+    .. attribute:: coalesce_writes
+
+       If true, the serialised XSOs are not written to the transport one by
+       one, but collected by a :class:`WriteCoalescer` and written together,
+       see there for details. The stream header and footer and the data
+       written before STARTTLS or closing the transport are always written
+       out before the transport is manipulated.
+
+       The value is evaluated whenever the writer is (re-)created, that is,
+       on :meth:`reset` and after :meth:`starttls`. It defaults to false.
+
+       .. versionadded:: 0.10
+
+    .. attribute:: coalesce_max_bytes
+
+       Passed as `max_bytes` to the :class:`WriteCoalescer`.
+
+       .. versionadded:: 0.10
+
+    .. attribute:: coalesce_max_delay
+
+       Passed as `max_delay` to the :class:`WriteCoalescer`. With the default
+       of zero, the data is written at the end of the current event loop
+       iteration.
+
+       .. versionadded:: 0.10
+
     """
 
     on_closing = callbacks.Signal()
+    on_writing_paused = callbacks.Signal()
+    on_writing_resumed = callbacks.Signal()
     shutdown_timeout = 15
+    batched_parsing = False
+    offload_threshold = None
+    offload_executor = None
+    coalesce_writes = False
+    coalesce_max_bytes = 65536
+    coalesce_max_delay = 0
 
     def __init__(self, to,
                  features_future,
@@ -301,6 +508,12 @@ class XMLStream(asyncio.Protocol):
         self._smachine = statemachine.OrderedStateMachine(State.READY)
         self._transport_closing = False
         self._footer_timeout_future = None
+        self._coalescer = None
+        self._writing_paused = False
+        self._rx_pending = collections.deque()
+        self._offload_handler = None
+        self._processor = None
+        self._parser = None
 
         self._closing_future = asyncio.async(
             self._smachine.wait_for(
@@ -333,10 +546,15 @@ class XMLStream(asyncio.Protocol):
             text += " (at: {})".format(at)
         return RuntimeError(text)
 
+    def _flush_coalesced_writes(self):
+        if self._coalescer is not None:
+            self._coalescer.flush_buffer()
+
     def _close_transport(self):
         if self._transport_closing:
             return
         self._transport_closing = True
+        self._flush_coalesced_writes()
         self._transport.close()
 
     def _stream_starts_closing(self, task):
@@ -438,6 +656,14 @@ class XMLStream(asyncio.Protocol):
         self._fail(err.to_exception())
 
     def _rx_stream_footer(self):
+        if self._rx_pending:
+            # elements received before the footer are still being parsed;
+            # act on the footer only after they have been processed
+            self._rx_pending.append(self._rx_process_stream_footer)
+            return
+        self._rx_process_stream_footer()
+
+    def _rx_process_stream_footer(self):
         if self._smachine.state < State.CLOSING:
             # any other state, this is an issue
             if self._exception is None:
@@ -479,6 +705,132 @@ class XMLStream(asyncio.Protocol):
                      " details."
             )
 
+    @property
+    def offload_handler(self):
+        """
+        May be :data:`None` or a callable which takes over stream-level
+        elements before they are parsed. It is only used if
+        :attr:`batched_parsing` is enabled.
+
+        The callable is called with the events of each complete stream-level
+        element (in the event format used by :mod:`aioxmpp.xso`) and the
+        language of the stream (see :attr:`~.xml.XMPPXMLProcessor.remote_lang`
+        of the processor). If it returns true, the element is neither parsed
+        nor passed to the :attr:`stanza_parser`. Elements taken over are not
+        held back behind elements which are still being parsed in the
+        :attr:`offload_executor`.
+
+        The callable is invoked from within :meth:`data_received`; exceptions
+        raised by it fail the stream.
+
+        .. versionadded:: 0.10
+        """
+        return self._offload_handler
+
+    @offload_handler.setter
+    def offload_handler(self, value):
+        self._offload_handler = value
+        if self._processor is not None:
+            self._install_offload_hook()
+
+    def _install_offload_hook(self):
+        if     (isinstance(self._parser, xml.BatchingExpatReader) and
+                (self.offload_threshold is not None or
+                 self._offload_handler is not None)):
+            self._processor.offload = self._rx_offload
+        else:
+            self._processor.offload = None
+
+    def _rx_offload(self, events):
+        handler = self._offload_handler
+        if     (handler is not None and
+                handler(events, self._processor.remote_lang)):
+            return True
+
+        size = 0
+        if self.offload_threshold is not None:
+            for ev in events:
+                if ev[0] == "text":
+                    size += len(ev[1])
+
+        if (self.offload_threshold is not None and
+                size >= self.offload_threshold):
+            fut = self._loop.run_in_executor(
+                self.offload_executor,
+                self._processor.parse_detached,
+                events,
+            )
+            fut.add_done_callback(self._rx_offload_done)
+            self._rx_pending.append(fut)
+            return True
+
+        if self._rx_pending:
+            # keep the order: hold back until the preceding elements are done
+            self._rx_pending.append(events)
+            return True
+
+        return False
+
+    def _rx_offload_done(self, fut):
+        if fut.cancelled():
+            return
+        self._rx_process_pending()
+
+    def _rx_process_pending(self):
+        pending = self._rx_pending
+        processor = self._processor
+        try:
+            while pending:
+                head = pending[0]
+                if isinstance(head, asyncio.Future):
+                    if not head.done():
+                        return
+                    pending.popleft()
+                    exc = head.exception()
+                    if exc is not None:
+                        processor.process_detached(exc=exc)
+                    else:
+                        processor.process_detached(head.result())
+                elif callable(head):
+                    # stream-level event deferred behind the elements
+                    pending.popleft()
+                    head()
+                else:
+                    pending.popleft()
+                    try:
+                        result = processor.parse_detached(head)
+                    except Exception as exc:
+                        processor.process_detached(exc=exc)
+                    else:
+                        processor.process_detached(result)
+        except errors.StreamError as exc:
+            self._rx_fail(exc)
+        except Exception:
+            self._logger.exception(
+                "unexpected exception while processing offloaded stanza"
+            )
+            self._rx_fail(errors.StreamError(
+                condition=(namespaces.streams, "internal-server-error"),
+                text="Internal error while parsing XML. Client logs have more"
+                     " details."
+            ))
+
+    def _rx_discard_pending(self):
+        for item in self._rx_pending:
+            if isinstance(item, asyncio.Future):
+                item.cancel()
+        self._rx_pending.clear()
+
+    def _rx_fail(self, exc):
+        self._rx_discard_pending()
+        stanza_obj = nonza.StreamError.from_exception(exc)
+        if not self._writer.closed:
+            self._writer.send(stanza_obj)
+        self._fail(exc)
+        # shutdown, we do not really care about </stream:stream> by the
+        # server at this point
+        self._close_transport()
+
     def connection_made(self, transport):
         if self._smachine.state != State.READY:
             raise self._invalid_state("connection_made")
@@ -498,27 +850,48 @@ class XMLStream(asyncio.Protocol):
             return
         self._smachine.state = State.CLOSED
         self._exception = self._exception or exc
+        if self._coalescer is not None:
+            self._coalescer.discard()
+            self._coalescer = None
         self._kill_state()
         self._writer = None
         self._transport = None
         self._closing_future.cancel()
         if self._footer_timeout_future is not None:
             self._footer_timeout_future.cancel()
+        if self._writing_paused:
+            # release anyone waiting for the transport to drain; they will
+            # find the stream closed
+            self._writing_paused = False
+            self.on_writing_resumed()
+
+    def pause_writing(self):
+        self._logger.debug("transport asks to pause writing")
+        self._writing_paused = True
+        self.on_writing_paused()
+
+    def resume_writing(self):
+        self._logger.debug("transport allows to resume writing")
+        self._writing_paused = False
+        self.on_writing_resumed()
 
     def data_received(self, blob):
         self._logger.debug("RECV %r", blob)
         try:
             self._rx_feed(blob)
         except errors.StreamError as exc:
-            stanza_obj = nonza.StreamError.from_exception(exc)
-            if not self._writer.closed:
-                self._writer.send(stanza_obj)
-            self._fail(exc)
-            # shutdown, we do not really care about </stream:stream> by the
-            # server at this point
-            self._close_transport()
+            self._rx_fail(exc)
 
     def eof_received(self):
+        if self._rx_pending:
+            # do not tear down the transport before the elements received
+            # so far have been processed; returning true keeps the transport
+            # from closing itself in the meantime
+            self._rx_pending.append(self._rx_process_eof)
+            return True
+        self._rx_process_eof()
+
+    def _rx_process_eof(self):
         if self._smachine.state == State.OPEN:
             # close and set to EOF received
             self.close()
@@ -555,6 +928,7 @@ class XMLStream(asyncio.Protocol):
                 self._smachine.state == State.CLOSED):
             return
         self._writer.close()
+        self._flush_coalesced_writes()
         if self._transport.can_write_eof():
             self._transport.write_eof()
         if self._smachine.state == State.STREAM_HEADER_SENT:
@@ -582,7 +956,11 @@ class XMLStream(asyncio.Protocol):
     def _kill_state(self):
         if self._writer:
             self._writer.abort()
+        if self._coalescer is not None:
+            self._coalescer.flush_buffer()
+            self._coalescer = None
 
+        self._rx_discard_pending()
         self._processor = None
         self._parser = None
 
@@ -594,15 +972,27 @@ class XMLStream(asyncio.Protocol):
         self._processor.on_stream_header = self._rx_stream_header
         self._processor.on_stream_footer = self._rx_stream_footer
         self._processor.on_exception = self._rx_exception
-        self._parser = xml.make_parser()
+        if self.batched_parsing:
+            self._parser = xml.BatchingExpatReader()
+        else:
+            self._parser = xml.make_parser()
+        self._install_offload_hook()
         self._parser.setContentHandler(self._processor)
         self._debug_wrapper = None
 
+        dest = self._transport
+        if self.coalesce_writes:
+            self._coalescer = WriteCoalescer(
+                dest,
+                self._loop,
+                max_bytes=self.coalesce_max_bytes,
+                max_delay=self.coalesce_max_delay,
+            )
+            dest = self._coalescer
+
         if self._logger.getEffectiveLevel() <= logging.DEBUG:
-            dest = DebugWrapper(self._transport, self._logger)
+            dest = DebugWrapper(dest, self._logger)
             self._debug_wrapper = dest
-        else:
-            dest = self._transport
         self._writer = xml.XMLStreamWriter(
             dest,
             self._to,
@@ -652,6 +1042,7 @@ class XMLStream(asyncio.Protocol):
             return
         if     (self._smachine.state != State.CLOSING and
                 self._transport.can_write_eof()):
+            self._flush_coalesced_writes()
             self._transport.write_eof()
         self._close_transport()
 
@@ -668,6 +1059,8 @@ class XMLStream(asyncio.Protocol):
         :raises OSError: if the stream got disconnected due to a another
                          permanent transport error
         :raises Exception: if serialisation of `obj` failed
+        :return: The number of bytes written for `obj`.
+        :rtype: :class:`int`
 
         Calling :meth:`send_xso` while the stream is disconnected,
         disconnecting or still waiting for the remote to send a stream header
@@ -681,9 +1074,58 @@ class XMLStream(asyncio.Protocol):
            *no* content is sent over the stream. The stream is still valid and
            usable afterwards.
 
+        .. versionchanged:: 0.10
+
+           The number of bytes written is returned.
+
         """
         self._require_connection()
-        self._writer.send(obj)
+        return self._writer.send(obj)
+
+    @property
+    def writing_paused(self):
+        """
+        True while the transport has asked the stream to pause writing (see
+        :attr:`on_writing_paused`).
+
+        .. versionadded:: 0.10
+        """
+        return self._writing_paused
+
+    def pause_reading(self):
+        """
+        Ask the transport to stop receiving data.
+
+        :return: Whether the transport supports pausing.
+        :rtype: :class:`bool`
+
+        No XSOs are received until :meth:`resume_reading` is called. If there
+        is no transport or the transport does not support pausing, nothing
+        happens.
+
+        .. versionadded:: 0.10
+        """
+        if self._transport is None:
+            return False
+        try:
+            self._transport.pause_reading()
+        except NotImplementedError:
+            self._logger.debug("transport does not support pause_reading")
+            return False
+        return True
+
+    def resume_reading(self):
+        """
+        Undo the effect of :meth:`pause_reading`.
+
+        .. versionadded:: 0.10
+        """
+        if self._transport is None:
+            return
+        try:
+            self._transport.resume_reading()
+        except NotImplementedError:
+            pass
 
     def can_starttls(self):
         """
@@ -716,6 +1158,7 @@ class XMLStream(asyncio.Protocol):
         if not self.can_starttls():
             raise RuntimeError("starttls not available on transport")
 
+        self._flush_coalesced_writes()
         yield from self._transport.starttls(ssl_context,
                                             post_handshake_callback)
         self._reset_state()
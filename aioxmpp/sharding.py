@@ -0,0 +1,323 @@
+########################################################################
+# File name: sharding.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+:mod:`~aioxmpp.sharding` --- Processing stanzas in worker processes
+###################################################################
+
+All parsing, dispatching and handling of the stanzas of a
+:class:`aioxmpp.Client` happens on its event loop, in a single thread. For
+an account with a very high stanza rate (a large bridge, for example), the
+handlers can thus only use one core.
+
+The :class:`ShardedStanzaProcessor` moves the parsing and handling of
+stanzas into worker processes. It takes the stanzas over from the stanza
+stream of the client before they are parsed (see
+:attr:`aioxmpp.stream.StanzaStream.detached_stanza_handler`), so the event
+loop of the client only does the I/O and the framing of the XML stream. The
+stanzas are sharded by a key, by default the bare sender JID (that is, the
+conversation), and each shard is processed by its own single-process
+executor. This keeps the order of the stanzas within a conversation while
+conversations are processed in parallel. The stanzas which the handler
+returns are sent back through the stream of the client.
+
+Stanzas are transferred in the event format used by :mod:`aioxmpp.xso`, as
+produced by :class:`aioxmpp.xml.BatchingExpatReader`. The XML streams of the
+client must thus use :attr:`~aioxmpp.protocol.XMLStream.batched_parsing`;
+otherwise, no stanzas are taken over.
+
+.. versionadded:: 0.10
+
+    This module was added in version 0.10.
+
+.. autoclass:: ShardedStanzaProcessor
+
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+
+from . import (
+    stanza,
+    structs,
+    xso,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class _EventCollector:
+    # SAX-ish receiver for XSO.unparse_to_sax which records the events in the
+    # format used by aioxmpp.xso
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def startPrefixMapping(self, prefix, uri):
+        pass
+
+    def endPrefixMapping(self, prefix):
+        pass
+
+    def startElementNS(self, name, qname, attributes):
+        self.events.append(("start",) + tuple(name) + (dict(attributes),))
+
+    def characters(self, data):
+        self.events.append(("text", data))
+
+    def endElementNS(self, name, qname):
+        self.events.append(("end",))
+
+
+def _capture(stanza_obj):
+    if not isinstance(stanza_obj, stanza.StanzaBase):
+        raise ValueError("not a stanza: {!r}".format(stanza_obj))
+    collector = _EventCollector()
+    stanza_obj.unparse_to_sax(collector)
+    return collector.events
+
+
+def _parse(events, lang=None):
+    result = None
+
+    def cb(instance):
+        nonlocal result
+        result = instance
+
+    xso_parser = xso.XSOParser()
+    xso_parser.add_class(stanza.IQ, cb)
+    xso_parser.add_class(stanza.Message, cb)
+    xso_parser.add_class(stanza.Presence, cb)
+    xso_parser.lang = lang
+    xso.SAXDriver(xso_parser).send_events(events)
+    if result is None:
+        raise ValueError("not a stanza")
+    return result
+
+
+def _run_handler(handler, events, lang):
+    # runs in the worker process
+    replies = handler(_parse(events, lang))
+    if replies is None:
+        return []
+    return [_capture(reply) for reply in replies]
+
+
+def _default_accept(tag, attributes):
+    return tag == stanza.Message.TAG
+
+
+def _default_key(tag, attributes):
+    try:
+        return structs.JID.fromstr(attributes[None, "from"]).bare()
+    except (KeyError, ValueError):
+        return None
+
+
+def _default_executor_factory():
+    return concurrent.futures.ProcessPoolExecutor(max_workers=1)
+
+
+class ShardedStanzaProcessor:
+    """
+    Parse and handle the stanzas of a client in worker processes.
+
+    :param client: The client whose stanzas are handled.
+    :type client: :class:`aioxmpp.Client`
+    :param handler: Function to call in the worker with each stanza.
+    :param nshards: Number of shards; defaults to the number of CPUs.
+    :type nshards: :class:`int` or :data:`None`
+    :param accept: Function deciding whether a stanza is taken over.
+    :param key: Function returning the shard key of a stanza.
+    :param executor_factory: Function returning the executor for one shard.
+    :param loop: Override the :mod:`asyncio` event loop to use.
+    :raises ValueError: if the stanza stream of `client` already has a
+                        :attr:`~.StanzaStream.detached_stanza_handler`
+
+    On construction, the processor installs itself as
+    :attr:`~.StanzaStream.detached_stanza_handler` on the stanza stream of
+    `client`. For each received stanza, `accept` is called with the tag of the
+    stanza (a ``(namespace_uri, localname)`` tuple) and a dictionary of its
+    attributes (keyed by ``(namespace_uri, name)`` tuples). If it returns true,
+    the stanza is not parsed on the event loop, but handed to its shard;
+    otherwise, the client processes it as usual. The default accepts all
+    :class:`~.Message` stanzas. IQ responses must not be accepted, since they
+    are needed by the client to correlate its requests.
+
+    Stanzas which are taken over bypass the filters and dispatchers of the
+    client.
+
+    `handler` is called in the worker with the parsed stanza and may return an
+    iterable of stanzas (or :data:`None`). Those are sent with
+    :meth:`aioxmpp.Client.enqueue` in the main process. The `handler` must be
+    picklable, which in practice means that it has to be a module-level
+    function, and the module which defines it must import all payload classes
+    which are needed to parse the stanzas.
+
+    `key` is called with the same arguments as `accept` and defaults to the
+    bare ``from`` JID of the stanza. Stanzas with equal keys end up in the
+    same shard and are handled in the order in which they were received.
+
+    `executor_factory` is called once per shard and must return a
+    :class:`concurrent.futures.Executor` with a single worker (otherwise the
+    order within a shard is not kept). The default creates a
+    :class:`concurrent.futures.ProcessPoolExecutor` with one worker process.
+
+    .. autoattribute:: nshards
+
+    .. automethod:: shard_of
+
+    .. automethod:: feed
+
+    .. automethod:: shutdown
+    """
+
+    def __init__(self, client, handler, *,
+                 nshards=None,
+                 accept=_default_accept,
+                 key=_default_key,
+                 executor_factory=_default_executor_factory,
+                 loop=None):
+        super().__init__()
+        if nshards is None:
+            nshards = os.cpu_count() or 1
+        if nshards <= 0:
+            raise ValueError("nshards must be positive")
+        if client.stream.detached_stanza_handler is not None:
+            raise ValueError("stanza stream already has a detached handler")
+        self._client = client
+        self._handler = handler
+        self._accept = accept
+        self._key = key
+        self._loop = loop or asyncio.get_event_loop()
+        self._executors = [executor_factory() for _ in range(nshards)]
+        self._logger = logger
+        client.stream.detached_stanza_handler = self._take_over
+
+    @property
+    def nshards(self):
+        """
+        The number of shards.
+        """
+        return len(self._executors)
+
+    def shard_of(self, events):
+        """
+        Return the index of the shard which handles the stanza with the given
+        `events`.
+        """
+        _, namespace, localname, attributes = events[0]
+        return hash(self._key((namespace, localname), attributes)) % \
+            len(self._executors)
+
+    def _send_replies(self, fut, result):
+        if fut.cancelled():
+            if result is not None:
+                result.cancel()
+            return
+
+        exc = fut.exception()
+        if exc is not None:
+            self._logger.error("stanza handler failed", exc_info=exc)
+            if result is not None and not result.done():
+                result.set_exception(exc)
+            return
+
+        try:
+            # parse all replies first, so that none are sent if any of them
+            # is broken
+            replies = [_parse(events) for events in fut.result()]
+            tokens = [
+                self._client.enqueue(reply)
+                for reply in replies
+            ]
+        except Exception as exc:
+            # for example, the stream may have been lost while the handler
+            # was running
+            self._logger.error("failed to send replies", exc_info=True)
+            if result is not None and not result.done():
+                result.set_exception(exc)
+            return
+
+        if result is not None and not result.done():
+            result.set_result(tokens)
+
+    def _submit(self, events, lang, result):
+        executor = self._executors[self.shard_of(events)]
+        fut = asyncio.wrap_future(
+            executor.submit(_run_handler, self._handler, events, lang),
+            loop=self._loop,
+        )
+        fut.add_done_callback(
+            lambda fut: self._send_replies(fut, result)
+        )
+
+    def _take_over(self, events, lang):
+        _, namespace, localname, attributes = events[0]
+        if not self._accept((namespace, localname), attributes):
+            return False
+        # nobody waits for the result; failures are logged
+        self._submit(events, lang, None)
+        return True
+
+    def feed(self, events, lang=None):
+        """
+        Hand the stanza with the given `events` to its shard.
+
+        :param events: The events of the stanza, in the format used by
+                       :mod:`aioxmpp.xso`.
+        :param lang: The default language for the stanza.
+        :type lang: :class:`~.structs.LanguageTag` or :data:`None`
+        :return: A future which receives the list of
+                 :class:`~.stream.StanzaToken` instances for the replies.
+        :rtype: :class:`asyncio.Future`
+
+        Stanzas received by the client are fed automatically; this method is
+        for stanzas obtained by other means.
+
+        The replies are enqueued as soon as the handler has returned, even if
+        nobody waits for the returned future. If the handler raises, the
+        exception is logged and set on the future.
+
+        If any of the replies is not a stanza, none of them are sent. If
+        enqueueing a reply fails (for example with :class:`ConnectionError`
+        because the stream is not established), the replies after it are not
+        sent. In both cases, the exception is logged and set on the future.
+        """
+        result = asyncio.Future(loop=self._loop)
+        self._submit(events, lang, result)
+        return result
+
+    def shutdown(self, wait=True):
+        """
+        Stop taking over stanzas and shut down the executors of all shards.
+
+        If `wait` is true, this blocks until the pending stanzas have been
+        handled.
+        """
+        if self._client.stream.detached_stanza_handler == self._take_over:
+            self._client.stream.detached_stanza_handler = None
+        for executor in self._executors:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,345 @@
+########################################################################
+# File name: sm_store.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+"""
+:mod:`~aioxmpp.sm_store` --- Persistent Stream Management state
+###############################################################
+
+This module provides storage for :class:`~aioxmpp.stream.SMState` snapshots,
+so that a :class:`aioxmpp.Client` can resume its stream management session
+after the process has been restarted. See
+:attr:`aioxmpp.Client.sm_state_store` and :meth:`aioxmpp.Client.suspend`
+for how to use them.
+
+.. versionadded:: 0.10
+
+    This module was added in version 0.10.
+
+Stores
+======
+
+.. autoclass:: AbstractSMStateStore
+
+.. autoclass:: FileSMStateStore
+
+.. autoclass:: SQLiteSMStateStore
+
+Serialisation
+=============
+
+.. autofunction:: dump_state
+
+.. autofunction:: load_state
+
+"""
+
+import abc
+import io
+import json
+import os
+import sqlite3
+
+from . import (
+    stanza,
+    stream,
+    structs,
+    xml,
+    xso,
+)
+
+
+_FORMAT_VERSION = 1
+
+_LOCATION_TYPE = xso.ConnectionLocation()
+
+
+def _parse_stanza(serialised):
+    result = None
+
+    def cb(instance):
+        nonlocal result
+        result = instance
+
+    try:
+        xml.read_xso(
+            io.BytesIO(serialised.encode("utf-8")),
+            {
+                stanza.IQ: cb,
+                stanza.Message: cb,
+                stanza.Presence: cb,
+            }
+        )
+    except Exception as exc:
+        raise ValueError("failed to parse stanza: {}".format(exc)) from exc
+
+    if result is None:
+        raise ValueError("no stanza in serialised data")
+
+    return result
+
+
+def _dump_priorities(priorities):
+    if priorities is None:
+        return None
+    return [priority.value for priority in priorities]
+
+
+def _load_priorities(values, stanzas):
+    if values is None:
+        return None
+    if len(values) != len(stanzas):
+        raise ValueError("number of priorities does not match stanzas")
+    return [stream.StanzaPriority(value) for value in values]
+
+
+def dump_state(local_jid, state):
+    """
+    Serialise a stream management state snapshot to a string.
+
+    :param local_jid: The full JID the stream is bound to.
+    :type local_jid: :class:`aioxmpp.JID`
+    :param state: The snapshot to serialise.
+    :type state: :class:`aioxmpp.stream.SMState`
+    :rtype: :class:`str`
+
+    The stanzas are serialised with :func:`aioxmpp.xml.serialize_single_xso`.
+    """
+    location = state.location
+    if location is not None:
+        location = _LOCATION_TYPE.format(location)
+
+    return json.dumps({
+        "version": _FORMAT_VERSION,
+        "local_jid": str(local_jid),
+        "id": state.id_,
+        "location": location,
+        "max": state.max_,
+        "outbound_base": state.outbound_base,
+        "inbound_ctr": state.inbound_ctr,
+        "unacked": [
+            xml.serialize_single_xso(stanza_obj)
+            for stanza_obj in state.unacked_stanzas
+        ],
+        "queued": [
+            xml.serialize_single_xso(stanza_obj)
+            for stanza_obj in state.queued_stanzas
+        ],
+        "unacked_priorities": _dump_priorities(state.unacked_priorities),
+        "queued_priorities": _dump_priorities(state.queued_priorities),
+    })
+
+
+def load_state(data):
+    """
+    Restore a stream management state snapshot from a string created with
+    :func:`dump_state`.
+
+    :param data: The serialised snapshot.
+    :type data: :class:`str`
+    :raises ValueError: if `data` is not a valid snapshot.
+    :return: The local JID and the snapshot.
+    :rtype: pair of :class:`aioxmpp.JID` and :class:`aioxmpp.stream.SMState`
+
+    The payloads of the stanzas must be registered (that is, the modules
+    defining them must be imported) for them to be restored faithfully.
+    """
+    try:
+        obj = json.loads(data)
+        if obj["version"] != _FORMAT_VERSION:
+            raise ValueError(
+                "unsupported SM state version: {!r}".format(obj["version"])
+            )
+
+        location = obj["location"]
+        if location is not None:
+            location = _LOCATION_TYPE.parse(location)
+
+        unacked_stanzas = [
+            _parse_stanza(serialised)
+            for serialised in obj["unacked"]
+        ]
+        queued_stanzas = [
+            _parse_stanza(serialised)
+            for serialised in obj["queued"]
+        ]
+
+        state = stream.SMState(
+            id_=obj["id"],
+            location=location,
+            max_=obj["max"],
+            outbound_base=obj["outbound_base"],
+            inbound_ctr=obj["inbound_ctr"],
+            unacked_stanzas=unacked_stanzas,
+            queued_stanzas=queued_stanzas,
+            # snapshots written before the priorities were recorded lack
+            # these keys
+            unacked_priorities=_load_priorities(
+                obj.get("unacked_priorities"),
+                unacked_stanzas,
+            ),
+            queued_priorities=_load_priorities(
+                obj.get("queued_priorities"),
+                queued_stanzas,
+            ),
+        )
+        local_jid = structs.JID.fromstr(obj["local_jid"])
+    except (KeyError, TypeError) as exc:
+        raise ValueError("malformed SM state: {}".format(exc)) from None
+
+    return local_jid, state
+
+
+class AbstractSMStateStore(metaclass=abc.ABCMeta):
+    """
+    Interface for stores of stream management state.
+
+    A store holds at most one snapshot. To keep the state of several clients,
+    use one store per client.
+
+    .. automethod:: save
+
+    .. automethod:: load
+
+    .. automethod:: clear
+    """
+
+    @abc.abstractmethod
+    def save(self, local_jid, state):
+        """
+        Save the snapshot `state` of the stream bound to `local_jid`,
+        replacing any previously saved snapshot.
+        """
+
+    @abc.abstractmethod
+    def load(self):
+        """
+        Return the saved snapshot.
+
+        :return: The local JID and the snapshot, or :data:`None` if no
+            snapshot is saved.
+        :raises ValueError: if the saved snapshot cannot be restored.
+        """
+
+    @abc.abstractmethod
+    def clear(self):
+        """
+        Remove the saved snapshot, if any.
+        """
+
+
+class FileSMStateStore(AbstractSMStateStore):
+    """
+    Store the stream management state in a file.
+
+    :param path: Path of the file to use.
+
+    The file is replaced atomically on :meth:`save`, so that a crash while
+    saving never leaves a partially written snapshot.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def save(self, local_jid, state):
+        data = dump_state(local_jid, state)
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return load_state(data)
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteSMStateStore(AbstractSMStateStore):
+    """
+    Store the stream management state in an SQLite database.
+
+    :param path: Path of the database file.
+    :param key: Key under which the snapshot is stored.
+    :type key: :class:`str`
+
+    Several stores may share one database file, as long as they use
+    different `key` values (for example the bare JID of the account). The
+    table ``aioxmpp_sm_state`` is created as needed.
+    """
+
+    def __init__(self, path, key):
+        super().__init__()
+        self.path = path
+        self.key = key
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS aioxmpp_sm_state "
+            "(key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        return conn
+
+    def save(self, local_jid, state):
+        data = dump_state(local_jid, state)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO aioxmpp_sm_state (key, data) "
+                    "VALUES (?, ?)",
+                    (self.key, data),
+                )
+        finally:
+            conn.close()
+
+    def load(self):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT data FROM aioxmpp_sm_state WHERE key = ?",
+                (self.key,),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return load_state(row[0])
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM aioxmpp_sm_state WHERE key = ?",
+                    (self.key,),
+                )
+        finally:
+            conn.close()
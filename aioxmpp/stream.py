@@ -60,6 +60,27 @@ internal queues.
 
 .. autoclass:: StanzaState
 
+.. autoclass:: StanzaPriority
+
+Stream management state
+=======================
+
+.. autoclass:: SMState
+
+IQ response correlation
+=======================
+
+.. autoclass:: IQResponseStats
+
+.. autoclass:: IQResponseTable
+
+.. autofunction:: make_iq_timer_wheel
+
+Rate limiting
+=============
+
+.. autoclass:: TokenBucket
+
 Filters
 =======
 
@@ -77,9 +98,13 @@ Exceptions
 """
 
 import asyncio
+import collections
 import contextlib
 import functools
+import itertools
 import logging
+import operator
+import time
 import warnings
 
 from datetime import datetime, timedelta
@@ -108,12 +133,15 @@ class AppFilter(callbacks.Filter):
     .. automethod:: register
     """
 
-    def register(self, func, order=0):
+    def register(self, func, order=0, **kwargs):
         """
         This method works exactly like :meth:`Filter.register`, but `order` has
         a default value of ``0``.
         """
-        return super().register(func, order)
+        return super().register(func, order, **kwargs)
+
+
+_stanza_type = operator.attrgetter("type_")
 
 
 class PingEventType(Enum):
@@ -198,6 +226,201 @@ class StanzaState(Enum):
     FAILED = 7
 
 
+class StanzaPriority(Enum):
+    """
+    Priority class of an outgoing stanza.
+
+    Each priority class has its own lane in the active queue of the
+    :class:`StanzaStream`. The lanes are served in a weighted round-robin
+    fashion (see :attr:`StanzaStream.priority_weights`), so that a large
+    amount of stanzas in one lane does not block the stanzas in the other
+    lanes.
+
+    The relative ordering of stanzas is only preserved among stanzas of the
+    same priority class.
+
+    .. attribute:: CONTROL
+
+       Stanzas which keep the protocol going, such as the IQ responses
+       generated by the stanza stream itself.
+
+    .. attribute:: INTERACTIVE
+
+       Stanzas for which a user or a peer is waiting. This is the default.
+
+    .. attribute:: BULK
+
+       Stanzas which are part of a large transfer in the background, such as
+       publishing many items or importing a roster.
+
+    .. versionadded:: 0.10
+    """
+
+    CONTROL = 0
+    INTERACTIVE = 1
+    BULK = 2
+
+
+class SMState(collections.namedtuple(
+        "SMState",
+        [
+            "id_",
+            "location",
+            "max_",
+            "outbound_base",
+            "inbound_ctr",
+            "unacked_stanzas",
+            "queued_stanzas",
+            "unacked_priorities",
+            "queued_priorities",
+        ])):
+    """
+    Snapshot of the stream management state of a :class:`StanzaStream`, as
+    returned by :meth:`StanzaStream.export_sm_state`. The attributes are
+    initialised from the arguments of the same name.
+
+    .. attribute:: id_
+
+       The SM-ID of the stream.
+
+    .. attribute:: location
+
+       The location to connect to for resumption, as a host-port pair, or
+       :data:`None`.
+
+    .. attribute:: max_
+
+       The maximum resumption timeout announced by the server or
+       :data:`None`.
+
+    .. attribute:: outbound_base
+
+       The value of :attr:`StanzaStream.sm_outbound_base`.
+
+    .. attribute:: inbound_ctr
+
+       The value of :attr:`StanzaStream.sm_inbound_ctr`.
+
+    .. attribute:: unacked_stanzas
+
+       The stanzas which have been sent but not acked by the server, in the
+       order in which they were sent.
+
+    .. attribute:: queued_stanzas
+
+       The stanzas which were still in the active queue.
+
+    .. attribute:: unacked_priorities
+
+       The :class:`StanzaPriority` of each of the :attr:`unacked_stanzas` or
+       :data:`None` (the default), in which case
+       :attr:`StanzaPriority.INTERACTIVE` is assumed for all of them.
+
+    .. attribute:: queued_priorities
+
+       Like :attr:`unacked_priorities`, for the :attr:`queued_stanzas`.
+
+    .. seealso::
+
+       :mod:`aioxmpp.sm_store`
+          for storing :class:`SMState` snapshots.
+
+    .. versionadded:: 0.10
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, id_, location, max_, outbound_base, inbound_ctr,
+                unacked_stanzas, queued_stanzas,
+                unacked_priorities=None, queued_priorities=None):
+        return super().__new__(
+            cls,
+            id_, location, max_, outbound_base, inbound_ctr,
+            unacked_stanzas, queued_stanzas,
+            unacked_priorities, queued_priorities,
+        )
+
+
+class TokenBucket:
+    """
+    A token bucket to limit the rate of an operation.
+
+    :param rate: Rate at which the bucket is refilled, in units per second.
+    :type rate: :class:`numbers.Real`
+    :param burst: Capacity of the bucket.
+    :type burst: :class:`numbers.Real`
+    :param clock: Function returning the current time in seconds.
+
+    The bucket starts full. :meth:`consume` takes units out of the bucket; the
+    level may become negative. In that case, the debt has to be refilled
+    before the next operation may happen. This allows to charge for
+    operations whose cost is only known after they happened, such as the size
+    of a serialised stanza.
+
+    .. autoattribute:: level
+
+    .. automethod:: delay
+
+    .. automethod:: consume
+
+    .. versionadded:: 0.10
+    """
+
+    def __init__(self, rate, burst, *, clock=time.monotonic):
+        super().__init__()
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst <= 0:
+            raise ValueError("burst must be positive")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._level = burst
+        self._updated_at = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._level = min(
+            self.burst,
+            self._level + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    @property
+    def level(self):
+        """
+        The current amount of units in the bucket. This may be negative if more
+        units have been consumed than were available.
+        """
+        self._refill()
+        return self._level
+
+    def delay(self, amount=0):
+        """
+        Return the time in seconds until `amount` units are available.
+
+        :param amount: Amount of units which are about to be consumed.
+        :type amount: :class:`numbers.Real`
+        :return: Time until the operation may happen or ``0``.
+        :rtype: :class:`float`
+
+        `amount` is capped at the :attr:`burst` size. With the default of
+        ``0``, the delay is the time until any debt has been refilled.
+        """
+        missing = min(amount, self.burst) - self.level
+        if missing <= 0:
+            return 0
+        return missing / self.rate
+
+    def consume(self, amount):
+        """
+        Take `amount` units out of the bucket, independent of whether they are
+        available.
+        """
+        self._refill()
+        self._level -= amount
+
+
 class StanzaErrorAwareListener:
     def __init__(self, forward_to):
         self._forward_to = forward_to
@@ -216,6 +439,156 @@ class StanzaErrorAwareListener:
         return self._forward_to.is_valid()
 
 
+class IQResponseStats(collections.namedtuple(
+        "IQResponseStats",
+        [
+            "outstanding",
+            "registered",
+            "answered",
+            "timed_out",
+        ])):
+    """
+    Statistics about the IQ responses awaited by a :class:`StanzaStream`, as
+    returned by :attr:`StanzaStream.iq_response_stats`.
+
+    .. attribute:: outstanding
+
+       Number of IQ requests for which a response is currently awaited.
+
+    .. attribute:: registered
+
+       Total number of response handlers registered so far.
+
+    .. attribute:: answered
+
+       Total number of responses (including error responses) delivered so far.
+
+    .. attribute:: timed_out
+
+       Total number of requests which timed out while waiting for a response.
+
+    .. versionadded:: 0.10
+    """
+
+
+_STANZA_TAGS = frozenset({
+    stanza.IQ.TAG,
+    stanza.Message.TAG,
+    stanza.Presence.TAG,
+})
+
+
+def _expire_timer(key):
+    owner, tag = key
+    owner._expire(tag)
+
+
+def make_iq_timer_wheel(*, resolution=0.1, loop=None):
+    """
+    Create a :class:`~.callbacks.TimerWheel` which can be shared by several
+    :class:`IQResponseTable` instances.
+
+    The arguments are passed to :class:`~.callbacks.TimerWheel`.
+
+    A :class:`StanzaStream` which is given such a wheel also keeps its ping
+    timer on it (see :attr:`StanzaStream.ping_interval`).
+
+    .. versionadded:: 0.10
+    """
+    return callbacks.TimerWheel(
+        _expire_timer,
+        resolution=resolution,
+        loop=loop,
+    )
+
+
+class IQResponseTable(callbacks.TagDispatcher):
+    """
+    Correlation table for IQ responses, keyed by ``(from_, id_)``.
+
+    Timeouts for all pending requests are handled by a single
+    :class:`~.callbacks.TimerWheel`; when a timeout expires, the listener
+    receives a :class:`TimeoutError` via its ``error`` method.
+
+    If `timers` is given, it must be a wheel created with
+    :func:`make_iq_timer_wheel` and is used instead of a wheel of its own.
+    This allows many tables (for example of the streams of many clients in a
+    :class:`~.node.ClientPool`) to share one wheel and one timer handle.
+    """
+
+    def __init__(self, *, resolution=0.1, timers=None, loop=None):
+        super().__init__()
+        self._shared_timers = timers is not None
+        if timers is None:
+            timers = make_iq_timer_wheel(resolution=resolution, loop=loop)
+        self._timers = timers
+        self._nregistered = 0
+        self._nanswered = 0
+        self._ntimed_out = 0
+
+    def _expire(self, tag):
+        try:
+            listener = self._listeners.pop(tag)
+        except KeyError:
+            return
+        if listener.is_valid():
+            self._ntimed_out += 1
+            listener.error(TimeoutError())
+
+    def _discard_timer(self, tag):
+        if tag not in self._listeners:
+            self._timers.discard((self, tag))
+
+    def add_listener(self, tag, listener):
+        super().add_listener(tag, listener)
+        # the listener may have replaced an invalidated one with a timer
+        self._timers.discard((self, tag))
+        self._nregistered += 1
+
+    def set_timeout(self, tag, timeout):
+        """
+        Make the listener for `tag` fail with :class:`TimeoutError` if no
+        response arrives within `timeout` seconds.
+
+        If there is no listener for `tag` (for example because the response
+        has already been delivered), this is a no-op.
+        """
+        if tag in self._listeners:
+            self._timers.add((self, tag), timeout)
+
+    def unicast(self, tag, data):
+        super().unicast(tag, data)
+        self._nanswered += 1
+        self._discard_timer(tag)
+
+    def unicast_error(self, tag, exc):
+        super().unicast_error(tag, exc)
+        self._discard_timer(tag)
+
+    def remove_listener(self, tag):
+        super().remove_listener(tag)
+        self._timers.discard((self, tag))
+
+    def close_all(self, exc):
+        if self._shared_timers:
+            for tag in self._listeners:
+                self._timers.discard((self, tag))
+        else:
+            self._timers.clear()
+        super().close_all(exc)
+
+    def stats(self):
+        """
+        Return the current :class:`IQResponseStats`.
+        """
+        return IQResponseStats(
+            outstanding=len(self._listeners),
+            registered=self._nregistered,
+            answered=self._nanswered,
+            timed_out=self._ntimed_out,
+        )
+
+
 class StanzaToken:
     """
     A token to follow the processing of a `stanza`.
@@ -223,6 +596,13 @@ class StanzaToken:
     `on_state_change` may be a function which will be called with the token and
     the new :class:`StanzaState` whenever the state of the token changes.
 
+    `priority` must be a :class:`StanzaPriority` and selects the lane of the
+    active queue the stanza is put in.
+
+    .. versionchanged:: 0.10
+
+       The `priority` argument was added.
+
     .. versionadded:: 0.8
 
        Stanza tokens are :term:`awaitable`.
@@ -265,13 +645,19 @@ class StanzaToken:
 
     .. autoattribute:: state
 
+    .. attribute:: priority
+
+       The :class:`StanzaPriority` of the stanza.
+
     .. automethod:: abort
     """
     __slots__ = ("stanza", "_state", "on_state_change", "_sent_future",
-                 "_state_exception")
+                 "_state_exception", "priority")
 
-    def __init__(self, stanza, *, on_state_change=None):
+    def __init__(self, stanza, *, on_state_change=None,
+                 priority=StanzaPriority.INTERACTIVE):
         self.stanza = stanza
+        self.priority = priority
         self._state = StanzaState.ACTIVE
         self._state_exception = None
         self._sent_future = None
@@ -375,10 +761,21 @@ class StanzaStream:
     instance to fork off the logger from. The :class:`StanzaStream` will use a
     child logger of `base_logger` called ``StanzaStream``.
 
+    `iq_timers` may be a :class:`~.callbacks.TimerWheel` created with
+    :func:`make_iq_timer_wheel` to use for the timeouts of IQ requests instead
+    of a wheel owned by the stream (see :class:`IQResponseTable`). The ping
+    timer of the stream is then kept on that wheel, too, so that an idle
+    stream does not hold a timer handle of its own; pings are delayed by at
+    most the resolution of the wheel.
+
     .. versionchanged:: 0.4
 
        The `local_jid` argument was added.
 
+    .. versionchanged:: 0.10
+
+       The `iq_timers` argument was added.
+
     The stanza stream takes care of ensuring stream liveness. For that, pings
     are sent in a periodic interval. If stream management is enabled, stream
     management ack requests are used as pings, otherwise :xep:`0199` pings are
@@ -449,6 +846,114 @@ class StanzaStream:
 
           This alias is deprecated and will be removed in 1.0.
 
+    Outbound stanzas are queued in one lane per :class:`StanzaPriority`:
+
+    .. attribute:: priority_weights
+
+       A mapping from each :class:`StanzaPriority` to a positive integer
+       weight. When several lanes hold stanzas, each lane may send as many
+       stanzas as its weight before the lanes of lower priority get their
+       turn; afterwards, a new round starts.
+
+       The default gives :attr:`~StanzaPriority.CONTROL` a weight of 8,
+       :attr:`~StanzaPriority.INTERACTIVE` a weight of 4 and
+       :attr:`~StanzaPriority.BULK` a weight of 1. The weights are read when
+       the stream is constructed; to change them, override the attribute in a
+       subclass.
+
+       .. versionadded:: 0.10
+
+    .. autoattribute:: queue_depths
+
+    The rate at which stanzas are sent can be limited, for example to stay
+    within the limits a server imposes on its clients:
+
+    .. attribute:: outbound_stanza_shaper = None
+
+       :data:`None` or a :class:`TokenBucket` which limits the number of
+       stanzas sent per second. One unit is consumed for each stanza sent.
+
+    .. attribute:: outbound_byte_shaper = None
+
+       :data:`None` or a :class:`TokenBucket` which limits the number of bytes
+       sent per second. After each stanza, the size of its serialised form is
+       consumed.
+
+    While a shaper delays the sending, stanzas stay in the active queue in
+    :attr:`~StanzaState.ACTIVE` state and can still be aborted. Since the
+    shapers apply to the active queue, stanzas which are re-sent after
+    stream management resumption are subject to them, too. Stream-level
+    elements such as stream management requests and pings are not shaped.
+
+    .. autoattribute:: outbound_backlog
+
+    .. autoattribute:: iq_response_stats
+
+    .. versionadded:: 0.10
+
+       The shaping attributes.
+
+    To keep a slow connection from piling up stanzas in memory, the queues
+    can be bounded with watermarks:
+
+    .. attribute:: outbound_high_watermark = None
+
+       If not :data:`None`, :meth:`aioxmpp.Client.send` blocks before
+       enqueueing a stanza while the active queue has reached this many
+       stanzas, until it has drained to :attr:`outbound_low_watermark`.
+
+       :meth:`aioxmpp.Client.send` also blocks while the transport of the
+       XML stream has asked to pause writing (see
+       :attr:`~.protocol.XMLStream.on_writing_paused`); in that time, no
+       stanzas are taken from the active queue either. This happens
+       independently of the watermarks.
+
+       :meth:`aioxmpp.Client.enqueue` never blocks and thus is not subject
+       to the watermark; since the check happens before enqueueing, the
+       queue may also exceed the watermark by the number of producers
+       waiting in :meth:`~aioxmpp.Client.send`.
+
+    .. attribute:: outbound_low_watermark = None
+
+       The number of stanzas in the active queue at which blocked producers
+       are released again. If :data:`None`, half of
+       :attr:`outbound_high_watermark` is used.
+
+    .. attribute:: inbound_high_watermark = None
+
+       If not :data:`None`, reading from the transport of the XML stream is
+       paused (see :meth:`~.protocol.XMLStream.pause_reading`) once the
+       incoming queue holds this many stanzas, until it has drained to
+       :attr:`inbound_low_watermark`. Since one chunk of data may contain
+       several stanzas, the queue may grow somewhat beyond the watermark.
+
+    .. attribute:: inbound_low_watermark = None
+
+       The number of stanzas in the incoming queue at which reading is
+       resumed. If :data:`None`, half of :attr:`inbound_high_watermark` is
+       used.
+
+    .. versionadded:: 0.10
+
+       The watermark attributes.
+
+    Handing stanzas over before they are parsed:
+
+    .. attribute:: detached_stanza_handler = None
+
+       May be :data:`None` or a callable which is offered each received
+       stanza before it is parsed, if the XML stream uses
+       :attr:`~.protocol.XMLStream.batched_parsing`. It is called with the
+       events of the stanza (in the event format used by :mod:`aioxmpp.xso`)
+       and the language of the XML stream. If it returns true, the stanza is
+       neither parsed nor dispatched by the stream; it still counts as
+       received for stream management. If it returns false or raises, the
+       stanza is processed as usual.
+
+       This is used by :class:`aioxmpp.sharding.ShardedStanzaProcessor`.
+
+       .. versionadded:: 0.10
+
     .. automethod:: send_and_wait_for_sent
 
     .. automethod:: send_iq_and_wait_for_reply
@@ -494,6 +999,22 @@ class StanzaStream:
     :data:`None`), it **must** ensure that the client still behaves RFC
     compliant.
 
+    All stanza filters use the :attr:`~.StanzaBase.type_` of the stanza as
+    key (see :class:`~.callbacks.Filter`), so that filter functions which
+    only care about some stanza types can be registered with the `keys`
+    argument and are not called for other stanzas:
+
+    .. code-block:: python
+
+       stream.app_inbound_message_filter.register(
+           func,
+           keys={aioxmpp.MessageType.GROUPCHAT},
+       )
+
+    .. versionchanged:: 0.10
+
+       The filters use the stanza type as key.
+
     .. attribute:: app_inbound_presence_filter
 
        This is a :class:`AppFilter` based filter chain on inbound presence
@@ -625,6 +1146,28 @@ class StanzaStream:
 
     .. autoattribute:: sm_resumable
 
+    Saving and restoring the stream management state, for example to resume
+    the stream after a restart of the process:
+
+    .. automethod:: export_sm_state
+
+    .. automethod:: import_sm_state
+
+    Scheduling of stream management requests:
+
+    .. attribute:: sm_request_after_stanzas = None
+
+    .. attribute:: sm_request_after_bytes = None
+
+       By default, a stream management request (``<r/>``) is sent after each
+       batch of stanzas. If any of these attributes is not :data:`None`,
+       requests are only sent once the given number of stanzas or bytes have
+       been sent since the last request, or when the ping timer asks for a
+       ping (see :attr:`ping_interval`). This reduces the amount of requests
+       and acks when many stanzas are sent.
+
+       .. versionadded:: 0.10
+
     Miscellaneous:
 
     .. autoattribute:: local_jid
@@ -716,6 +1259,12 @@ class StanzaStream:
 
     _ALLOW_ENUM_COERCION = True
 
+    priority_weights = {
+        StanzaPriority.CONTROL: 8,
+        StanzaPriority.INTERACTIVE: 4,
+        StanzaPriority.BULK: 1,
+    }
+
     on_failure = callbacks.Signal()
     on_stream_destroyed = callbacks.Signal()
     on_stream_established = callbacks.Signal()
@@ -727,7 +1276,8 @@ class StanzaStream:
                  local_jid=None,
                  *,
                  loop=None,
-                 base_logger=logging.getLogger("aioxmpp")):
+                 base_logger=logging.getLogger("aioxmpp"),
+                 iq_timers=None):
         super().__init__()
         self._loop = loop or asyncio.get_event_loop()
         self._logger = base_logger.getChild("StanzaStream")
@@ -737,11 +1287,31 @@ class StanzaStream:
         self._xxx_presence_dispatcher = None
 
         self._local_jid = local_jid
+        self._xmlstream = None
+
+        # set whenever one of the queues receives an item, so that the broker
+        # can wait for both queues without creating tasks
+        self._broker_wakeup = asyncio.Event(loop=self._loop)
+        self._active_queue = custom_queue.WeightedFairQueue(
+            [
+                (priority, self.priority_weights[priority])
+                for priority in StanzaPriority
+            ],
+            key=lambda token: token.priority,
+            loop=self._loop,
+            wakeup=self._broker_wakeup,
+        )
+        self._incoming_queue = custom_queue.AsyncDeque(
+            loop=self._loop,
+            wakeup=self._broker_wakeup,
+        )
 
-        self._active_queue = custom_queue.AsyncDeque(loop=self._loop)
-        self._incoming_queue = custom_queue.AsyncDeque(loop=self._loop)
-
-        self._iq_response_map = callbacks.TagDispatcher()
+        self._iq_response_map = IQResponseTable(
+            timers=iq_timers,
+            loop=self._loop,
+        )
+        self._shared_timers = iq_timers
+        self._ping_timer_at = None
         self._iq_request_map = {}
 
         # list of running IQ request coroutines: used to cancel them when the
@@ -760,21 +1330,53 @@ class StanzaStream:
         self.ping_interval = timedelta(seconds=15)
         self.ping_opportunistic_interval = timedelta(seconds=15)
 
+        self.outbound_stanza_shaper = None
+        self.outbound_byte_shaper = None
+
+        self.sm_request_after_stanzas = None
+        self.sm_request_after_bytes = None
+        # stanzas and bytes sent since the last SM request
+        self._sm_unrequested_stanzas = 0
+        self._sm_unrequested_bytes = 0
+
+        self.outbound_high_watermark = None
+        self.outbound_low_watermark = None
+        self.inbound_high_watermark = None
+        self.inbound_low_watermark = None
+
+        self.detached_stanza_handler = None
+
+        # set while producers may enqueue more stanzas, see
+        # _update_outbound_flow_control
+        self._outbound_open = asyncio.Event(loop=self._loop)
+        self._outbound_open.set()
+        self._xmlstream_writing_paused = False
+        # the XML stream on which we paused reading, if any
+        self._reading_paused_on = None
+
         self._sm_enabled = False
 
         self._broker_lock = asyncio.Lock(loop=loop)
 
-        self.app_inbound_presence_filter = AppFilter()
-        self.service_inbound_presence_filter = callbacks.Filter()
+        self.app_inbound_presence_filter = AppFilter(key=_stanza_type)
+        self.service_inbound_presence_filter = callbacks.Filter(
+            key=_stanza_type
+        )
 
-        self.app_inbound_message_filter = AppFilter()
-        self.service_inbound_message_filter = callbacks.Filter()
+        self.app_inbound_message_filter = AppFilter(key=_stanza_type)
+        self.service_inbound_message_filter = callbacks.Filter(
+            key=_stanza_type
+        )
 
-        self.app_outbound_presence_filter = AppFilter()
-        self.service_outbound_presence_filter = callbacks.Filter()
+        self.app_outbound_presence_filter = AppFilter(key=_stanza_type)
+        self.service_outbound_presence_filter = callbacks.Filter(
+            key=_stanza_type
+        )
 
-        self.app_outbound_message_filter = AppFilter()
-        self.service_outbound_message_filter = callbacks.Filter()
+        self.app_outbound_message_filter = AppFilter(key=_stanza_type)
+        self.service_outbound_message_filter = callbacks.Filter(
+            key=_stanza_type
+        )
 
     @property
     def local_jid(self):
@@ -847,6 +1449,7 @@ class StanzaStream:
         while not self._active_queue.empty():
             token = self._active_queue.get_nowait()
             token._set_state(StanzaState.DISCONNECTED)
+        self._update_outbound_flow_control()
 
         if self._established:
             self.on_stream_destroyed(exc)
@@ -876,7 +1479,7 @@ class StanzaStream:
         else:
             response = request.make_reply(type_=structs.IQType.RESULT)
             response.payload = payload
-        self._enqueue(response)
+        self._enqueue(response, priority=StanzaPriority.CONTROL)
 
     def _process_incoming_iq(self, stanza_obj):
         """
@@ -924,7 +1527,7 @@ class StanzaStream:
                     condition=(namespaces.stanzas,
                                "service-unavailable"),
                 )
-                self._enqueue(response)
+                self._enqueue(response, priority=StanzaPriority.CONTROL)
                 return
 
             try:
@@ -1023,13 +1626,13 @@ class StanzaStream:
                 namespaces.stanzas,
                 "service-unavailable")
             ))
-            self._enqueue(reply)
+            self._enqueue(reply, priority=StanzaPriority.CONTROL)
         elif isinstance(exc, stanza.PayloadParsingError):
             reply = stanza_obj.make_error(error=stanza.Error(condition=(
                 namespaces.stanzas,
                 "bad-request")
             ))
-            self._enqueue(reply)
+            self._enqueue(reply, priority=StanzaPriority.CONTROL)
 
     def _process_incoming(self, xmlstream, queue_entry):
         """
@@ -1145,15 +1748,22 @@ class StanzaStream:
                            stanza_obj)
 
         try:
-            xmlstream.send_xso(stanza_obj)
+            nbytes = xmlstream.send_xso(stanza_obj)
         except Exception as exc:
             self._logger.warning("failed to send stanza", exc_info=True)
             token._set_state(StanzaState.FAILED, exc)
             return
 
+        if self.outbound_stanza_shaper is not None:
+            self.outbound_stanza_shaper.consume(1)
+        if self.outbound_byte_shaper is not None and nbytes:
+            self.outbound_byte_shaper.consume(nbytes)
+
         if self._sm_enabled:
             token._set_state(StanzaState.SENT)
             self._sm_unacked_list.append(token)
+            self._sm_unrequested_stanzas += 1
+            self._sm_unrequested_bytes += nbytes or 0
         else:
             token._set_state(StanzaState.SENT_WITHOUT_SM)
 
@@ -1163,19 +1773,83 @@ class StanzaStream:
         stanza which is currently in the active queue. After all stanzas have
         been processed, use :meth:`_send_ping` to allow an opportunistic ping
         to be sent.
+
+        The order in which the stanzas are taken from the lanes of the active
+        queue is determined by the queue, according to
+        :attr:`priority_weights`. Stanzas are only taken from the queue while
+        the shapers and the transport allow it (see :meth:`_may_send`).
         """
 
         self._send_stanza(xmlstream, token)
         # try to send a bulk
-        while True:
-            try:
-                token = self._active_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
-            self._send_stanza(xmlstream, token)
+        while self._active_queue and self._may_send():
+            self._send_stanza(xmlstream, self._active_queue.get_nowait())
 
         self._send_ping(xmlstream)
 
+    def _outbound_delay(self):
+        """
+        Return the time in seconds until the shapers allow the next stanza to
+        be sent.
+        """
+        delay = 0
+        if self.outbound_stanza_shaper is not None:
+            delay = self.outbound_stanza_shaper.delay(1)
+        if self.outbound_byte_shaper is not None:
+            delay = max(delay, self.outbound_byte_shaper.delay())
+        return delay
+
+    def _may_send(self):
+        """
+        Return whether a stanza may be taken from the active queue now.
+        """
+        return (not self._xmlstream_writing_paused and
+                self._outbound_delay() <= 0)
+
+    def _outbound_low_watermark(self):
+        if self.outbound_low_watermark is not None:
+            return self.outbound_low_watermark
+        return self.outbound_high_watermark // 2
+
+    def _update_outbound_flow_control(self):
+        """
+        Open or close the gate for producers waiting in
+        :meth:`_send_immediately`, according to the state of the transport
+        and the outbound watermarks.
+        """
+        if self._xmlstream_writing_paused:
+            self._outbound_open.clear()
+        elif self.outbound_high_watermark is None:
+            self._outbound_open.set()
+        elif self._outbound_open.is_set():
+            if len(self._active_queue) >= self.outbound_high_watermark:
+                self._outbound_open.clear()
+        elif len(self._active_queue) <= self._outbound_low_watermark():
+            self._outbound_open.set()
+
+    def _xmlstream_writing_paused_changed(self, paused):
+        self._xmlstream_writing_paused = paused
+        self._update_outbound_flow_control()
+        if not paused:
+            self._broker_wakeup.set()
+
+    def _check_inbound_flow_control(self):
+        """
+        Pause reading from the XML stream if the incoming queue reached
+        :attr:`inbound_high_watermark`.
+        """
+        if (self._reading_paused_on is None and
+                self._xmlstream is not None and
+                len(self._incoming_queue) >= self.inbound_high_watermark):
+            self._logger.debug("incoming queue full, pausing reading")
+            if self._xmlstream.pause_reading():
+                self._reading_paused_on = self._xmlstream
+
+    def _resume_reading(self):
+        self._logger.debug("resuming reading")
+        self._reading_paused_on.resume_reading()
+        self._reading_paused_on = None
+
     def _recv_pong(self, stanza):
         """
         Process the reception of a XEP-0199 ping reply.
@@ -1192,10 +1866,12 @@ class StanzaStream:
         """
         Opportunistically send a ping over the given `xmlstream`.
 
-        If stream management is enabled, an SM request is always sent,
-        independent of the current ping state. Otherwise, a XEP-0199 ping is
-        sent if and only if we are currently in the opportunistic ping interval
-        (see :attr:`ping_opportunistic_interval`).
+        If stream management is enabled, an SM request is sent independent of
+        the current ping state, unless :attr:`sm_request_after_stanzas` or
+        :attr:`sm_request_after_bytes` are in use (see
+        :meth:`_sm_request_due`). Otherwise, a XEP-0199 ping is sent if and
+        only if we are currently in the opportunistic ping interval (see
+        :attr:`ping_opportunistic_interval`).
 
         If a ping is sent, and we are currently not waiting for a pong to be
         received, the ping timeout is configured.
@@ -1204,8 +1880,12 @@ class StanzaStream:
             return
 
         if self._sm_enabled:
+            if not self._sm_request_due():
+                return
             self._logger.debug("sending SM req")
             xmlstream.send_xso(nonza.SMRequest())
+            self._sm_unrequested_stanzas = 0
+            self._sm_unrequested_bytes = 0
         else:
             request = stanza.IQ(type_=structs.IQType.GET)
             request.payload = ping.Ping()
@@ -1224,6 +1904,48 @@ class StanzaStream:
             self._next_ping_event_at = datetime.utcnow() + self.ping_interval
             self._next_ping_event_type = PingEventType.TIMEOUT
 
+    def _sm_request_due(self):
+        """
+        Return whether an SM request should be sent now.
+
+        This is always the case if neither :attr:`sm_request_after_stanzas`
+        nor :attr:`sm_request_after_bytes` is set. Otherwise, a request is due
+        if one of the thresholds has been reached or if the ping timer is in
+        the opportunistic interval.
+        """
+        after_stanzas = self.sm_request_after_stanzas
+        after_bytes = self.sm_request_after_bytes
+        if after_stanzas is None and after_bytes is None:
+            return True
+        if self._next_ping_event_type == PingEventType.SEND_NOW:
+            return True
+        if (after_stanzas is not None and
+                self._sm_unrequested_stanzas >= after_stanzas):
+            return True
+        if (after_bytes is not None and
+                self._sm_unrequested_bytes >= after_bytes):
+            return True
+        return False
+
+    def _arm_ping_timer(self, timeout):
+        """
+        Make the shared timer wheel wake up the broker when the next ping
+        event is due in `timeout` seconds.
+
+        The timer is only replaced if the ping event has moved or the timer
+        has already fired.
+        """
+        key = self, "ping"
+        if (self._ping_timer_at != self._next_ping_event_at or
+                key not in self._shared_timers):
+            self._shared_timers.add(key, timeout)
+            self._ping_timer_at = self._next_ping_event_at
+
+    def _expire(self, tag):
+        # called by the shared timer wheel when the ping timer fires; the
+        # broker re-checks whether the ping event is actually due
+        self._broker_wakeup.set()
+
     def _process_ping_event(self, xmlstream):
         """
         Process a ping timed event on the current `xmlstream`.
@@ -1736,11 +2458,22 @@ class StanzaStream:
         self._xmlstream_failure_token = xmlstream.on_closing.connect(
             self._xmlstream_failed
         )
+        self._xmlstream_writing_tokens = (
+            xmlstream.on_writing_paused.connect(
+                functools.partial(self._xmlstream_writing_paused_changed,
+                                  True)
+            ),
+            xmlstream.on_writing_resumed.connect(
+                functools.partial(self._xmlstream_writing_paused_changed,
+                                  False)
+            ),
+        )
 
         xmlstream.stanza_parser.add_class(stanza.IQ, receiver)
         xmlstream.stanza_parser.add_class(stanza.Message, receiver)
         xmlstream.stanza_parser.add_class(stanza.Presence, receiver)
         xmlstream.error_handler = self.recv_erroneous_stanza
+        xmlstream.offload_handler = self._recv_stanza_events
 
         if self._sm_enabled:
             self._logger.debug("using SM")
@@ -1753,6 +2486,7 @@ class StanzaStream:
 
     def _start_rollback(self, xmlstream):
         xmlstream.error_handler = None
+        xmlstream.offload_handler = None
         xmlstream.stanza_parser.remove_class(stanza.Presence)
         xmlstream.stanza_parser.remove_class(stanza.Message)
         xmlstream.stanza_parser.remove_class(stanza.IQ)
@@ -1765,6 +2499,13 @@ class StanzaStream:
         xmlstream.on_closing.disconnect(
             self._xmlstream_failure_token
         )
+        paused_token, resumed_token = self._xmlstream_writing_tokens
+        xmlstream.on_writing_paused.disconnect(paused_token)
+        xmlstream.on_writing_resumed.disconnect(resumed_token)
+        if self._xmlstream_writing_paused:
+            self._xmlstream_writing_paused_changed(False)
+        if self._reading_paused_on is not None:
+            self._resume_reading()
 
     def _start_commit(self, xmlstream):
         if not self._established:
@@ -1882,57 +2623,78 @@ class StanzaStream:
     @asyncio.coroutine
     def _run(self, xmlstream):
         self._xmlstream = xmlstream
-        active_fut = asyncio.async(self._active_queue.get(),
-                                   loop=self._loop)
-        incoming_fut = asyncio.async(self._incoming_queue.get(),
-                                     loop=self._loop)
 
         try:
             while True:
-                timeout = self._next_ping_event_at - datetime.utcnow()
-                if timeout.total_seconds() < 0:
-                    timeout = timedelta()
-
-                done, pending = yield from asyncio.wait(
-                    [
-                        active_fut,
-                        incoming_fut,
-                    ],
-                    return_when=asyncio.FIRST_COMPLETED,
-                    timeout=timeout.total_seconds())
+                can_send = (bool(self._active_queue) and
+                            not self._xmlstream_writing_paused)
+                outbound_delay = self._outbound_delay() if can_send else 0
+                if (can_send and outbound_delay <= 0) or self._incoming_queue:
+                    # still work to do, but give others a chance to run (and
+                    # to enqueue more stanzas for this batch)
+                    yield from asyncio.sleep(0, loop=self._loop)
+                else:
+                    timeout = (
+                        self._next_ping_event_at - datetime.utcnow()
+                    ).total_seconds()
+                    if outbound_delay > 0:
+                        # the shapers hold back the active queue
+                        timeout = min(timeout, outbound_delay)
+                    if timeout < 0:
+                        timeout = 0
+
+                    if (self._shared_timers is not None and
+                            outbound_delay <= 0 and timeout > 0):
+                        # the ping timer lives on the shared wheel, which
+                        # wakes us up via _expire
+                        self._arm_ping_timer(timeout)
+                        yield from self._broker_wakeup.wait()
+                    else:
+                        try:
+                            yield from asyncio.wait_for(
+                                self._broker_wakeup.wait(),
+                                timeout=timeout,
+                                loop=self._loop,
+                            )
+                        except asyncio.TimeoutError:
+                            pass
+
+                self._broker_wakeup.clear()
 
                 with (yield from self._broker_lock):
-                    if active_fut in done:
-                        self._process_outgoing(xmlstream, active_fut.result())
-                        active_fut = asyncio.async(
-                            self._active_queue.get(),
-                            loop=self._loop)
-
-                    if incoming_fut in done:
-                        self._process_incoming(xmlstream,
-                                               incoming_fut.result())
-                        incoming_fut = asyncio.async(
-                            self._incoming_queue.get(),
-                            loop=self._loop)
+                    if self._active_queue and self._may_send():
+                        self._process_outgoing(
+                            xmlstream,
+                            self._active_queue.get_nowait()
+                        )
+                        self._update_outbound_flow_control()
+
+                    # only process what is there now; stanzas which are
+                    # received while processing are picked up in the next
+                    # iteration, after yielding to the event loop
+                    for _ in range(len(self._incoming_queue)):
+                        self._process_incoming(
+                            xmlstream,
+                            self._incoming_queue.get_nowait()
+                        )
+
+                    if (self._reading_paused_on is not None and
+                            len(self._incoming_queue) <=
+                            self._inbound_low_watermark()):
+                        self._resume_reading()
 
                     timeout = self._next_ping_event_at - datetime.utcnow()
                     if timeout.total_seconds() <= 0:
                         self._process_ping_event(xmlstream)
 
         finally:
-            # make sure we rescue any stanzas which possibly have already been
-            # caught by the calls to get()
-            self._logger.debug("task terminating, rescuing stanzas and "
-                               "clearing handlers")
-            if incoming_fut.done() and not incoming_fut.exception():
-                self._incoming_queue.putleft_nowait(incoming_fut.result())
-            else:
-                incoming_fut.cancel()
+            # stanzas stay in the queues until they are processed, so there is
+            # nothing to rescue here
+            self._logger.debug("task terminating, clearing handlers")
 
-            if active_fut.done() and not active_fut.exception():
-                self._active_queue.putleft_nowait(active_fut.result())
-            else:
-                active_fut.cancel()
+            if self._shared_timers is not None:
+                self._shared_timers.discard((self, "ping"))
+                self._ping_timer_at = None
 
             # we also lock shutdown, because the main race is among the SM
             # variables
@@ -1953,14 +2715,48 @@ class StanzaStream:
             if self._xmlstream_exception:
                 raise self._xmlstream_exception
 
+    def _inbound_low_watermark(self):
+        if self.inbound_low_watermark is not None:
+            return self.inbound_low_watermark
+        return self.inbound_high_watermark // 2
+
     def recv_stanza(self, stanza):
         """
         Inject a `stanza` into the incoming queue.
         """
         self._incoming_queue.put_nowait((stanza, None))
+        if self.inbound_high_watermark is not None:
+            self._check_inbound_flow_control()
+
+    def _recv_stanza_events(self, events, lang):
+        handler = self.detached_stanza_handler
+        if handler is None:
+            return False
+
+        _, namespace, localname, _ = events[0]
+        if (namespace, localname) not in _STANZA_TAGS:
+            return False
+
+        try:
+            if not handler(events, lang):
+                return False
+        except Exception:
+            self._logger.exception(
+                "detached stanza handler failed, processing the stanza on "
+                "the stream"
+            )
+            return False
+
+        # like in _process_incoming, stanzas always increment the SM counter
+        if self._sm_enabled:
+            self._sm_inbound_ctr += 1
+            self._sm_inbound_ctr &= 0xffffffff
+        return True
 
     def recv_erroneous_stanza(self, partial_obj, exc):
         self._incoming_queue.put_nowait((partial_obj, exc))
+        if self.inbound_high_watermark is not None:
+            self._check_inbound_flow_control()
 
     def _enqueue(self, stanza, **kwargs):
         if self._closed:
@@ -1969,6 +2765,8 @@ class StanzaStream:
         stanza.validate()
         token = StanzaToken(stanza, **kwargs)
         self._active_queue.put_nowait(token)
+        if self.outbound_high_watermark is not None:
+            self._update_outbound_flow_control()
         stanza.autoset_id()
         self._logger.debug("enqueued stanza %r with token %r",
                            stanza, token)
@@ -2078,7 +2876,9 @@ class StanzaStream:
 
             self._sm_outbound_base = 0
             self._sm_inbound_ctr = 0
-            self._sm_unacked_list = []
+            self._sm_unacked_list = collections.deque()
+            self._sm_unrequested_stanzas = 0
+            self._sm_unrequested_bytes = 0
             self._sm_enabled = True
             self._sm_id = response.id_
             self._sm_resumable = response.resume
@@ -2167,6 +2967,13 @@ class StanzaStream:
         A **copy** of the list of stanza tokens which have not yet been acked
         by the remote party.
 
+        The tokens are kept in a :class:`collections.deque` internally, in
+        the order in which they were sent, so that the token at index ``i``
+        belongs to the stanza counter value :attr:`sm_outbound_base` + ``i``
+        + 1 (modulo 2\ :sup:`32`). Acks are processed in time proportional to
+        the number of stanzas acked, independent of the number of stanzas in
+        flight.
+
         .. note::
 
            Accessing this attribute when :attr:`sm_enabled` is :data:`False`
@@ -2179,7 +2986,7 @@ class StanzaStream:
 
         if not self.sm_enabled:
             raise RuntimeError("Stream Management not enabled")
-        return self._sm_unacked_list[:]
+        return list(self._sm_unacked_list)
 
     @property
     def sm_max(self):
@@ -2249,6 +3056,38 @@ class StanzaStream:
             raise RuntimeError("Stream Management not enabled")
         return self._sm_resumable
 
+    @property
+    def outbound_backlog(self):
+        """
+        The number of stanzas in the active queue which have not been sent
+        yet.
+
+        .. versionadded:: 0.10
+        """
+        return len(self._active_queue)
+
+    @property
+    def iq_response_stats(self):
+        """
+        An :class:`IQResponseStats` snapshot for the IQ responses awaited on
+        this stream.
+
+        .. versionadded:: 0.10
+        """
+        return self._iq_response_map.stats()
+
+    @property
+    def queue_depths(self):
+        """
+        A dictionary mapping each :class:`StanzaPriority` to the number of
+        stanzas in the active queue with that priority.
+
+        This is a fresh snapshot on each access.
+
+        .. versionadded:: 0.10
+        """
+        return self._active_queue.lane_depths()
+
     def _resume_sm(self, remote_ctr):
         """
         Version of :meth:`resume_sm` which can be used during slow start.
@@ -2340,6 +3179,115 @@ class StanzaStream:
             "stream management disabled"
         ))
 
+    def export_sm_state(self):
+        """
+        Return a snapshot of the stream management state.
+
+        :raises RuntimeError: if the stream is running, stream management is
+            not enabled or the stream is not resumable.
+        :rtype: :class:`SMState`
+
+        The stream must be stopped without closing it, as closing the stream
+        ends the stream management session on the server. The snapshot is
+        only valid as long as the stream is not started again.
+
+        .. versionadded:: 0.10
+        """
+        if self.running:
+            raise RuntimeError("cannot export SM state while"
+                               " StanzaStream is running")
+        if not self.sm_enabled:
+            raise RuntimeError("Stream Management is not enabled")
+        if not self._sm_resumable:
+            raise RuntimeError("stream is not resumable")
+
+        queued = [
+            token
+            for token in self._active_queue.items()
+            if token.state == StanzaState.ACTIVE
+        ]
+
+        return SMState(
+            id_=self._sm_id,
+            location=self._sm_location,
+            max_=self._sm_max,
+            outbound_base=self._sm_outbound_base,
+            inbound_ctr=self._sm_inbound_ctr,
+            unacked_stanzas=[
+                token.stanza for token in self._sm_unacked_list
+            ],
+            queued_stanzas=[token.stanza for token in queued],
+            unacked_priorities=[
+                token.priority for token in self._sm_unacked_list
+            ],
+            queued_priorities=[token.priority for token in queued],
+        )
+
+    def import_sm_state(self, state):
+        """
+        Restore the stream management state from a snapshot.
+
+        :param state: The snapshot to restore.
+        :type state: :class:`SMState`
+        :raises RuntimeError: if the stream is running or stream management
+            is already enabled.
+        :return: The tokens for the unacked and the queued stanzas, in that
+            order.
+        :rtype: :class:`list` of :class:`StanzaToken`
+
+        Afterwards, :attr:`sm_enabled` is true and the stream can be resumed
+        with :meth:`resume_sm`. New :class:`StanzaToken` instances are created
+        for the stanzas of the snapshot, with the priorities recorded in it.
+
+        .. versionadded:: 0.10
+        """
+        if self.running:
+            raise RuntimeError("cannot import SM state while"
+                               " StanzaStream is running")
+        if self.sm_enabled:
+            raise RuntimeError("Stream Management already enabled")
+
+        self._sm_outbound_base = state.outbound_base
+        self._sm_inbound_ctr = state.inbound_ctr
+        self._sm_unacked_list = collections.deque()
+        self._sm_unrequested_stanzas = 0
+        self._sm_unrequested_bytes = 0
+        self._sm_enabled = True
+        self._sm_id = state.id_
+        self._sm_resumable = True
+        self._sm_max = state.max_
+        self._sm_location = state.location
+
+        def with_priorities(stanzas, priorities):
+            if priorities is None:
+                priorities = itertools.repeat(StanzaPriority.INTERACTIVE)
+            return zip(stanzas, priorities)
+
+        tokens = []
+        for stanza_obj, priority in with_priorities(
+                state.unacked_stanzas,
+                state.unacked_priorities):
+            token = StanzaToken(stanza_obj, priority=priority)
+            token._set_state(StanzaState.SENT)
+            self._sm_unacked_list.append(token)
+            tokens.append(token)
+
+        for stanza_obj, priority in with_priorities(
+                state.queued_stanzas,
+                state.queued_priorities):
+            token = StanzaToken(stanza_obj, priority=priority)
+            self._active_queue.put_nowait(token)
+            tokens.append(token)
+
+        self._logger.info(
+            "SM state imported: stream id=%r, %d unacked, %d queued",
+            self._sm_id,
+            len(state.unacked_stanzas),
+            len(state.queued_stanzas),
+        )
+
+        return tokens
+
     def stop_sm(self):
         """
         Disable stream management on the stream.
@@ -2385,8 +3333,8 @@ class StanzaStream:
                 )
             )
 
-        acked = self._sm_unacked_list[:to_drop]
-        del self._sm_unacked_list[:to_drop]
+        unacked = self._sm_unacked_list
+        acked = [unacked.popleft() for _ in range(to_drop)]
         self._sm_outbound_base = remote_ctr
 
         if acked:
@@ -2447,7 +3395,8 @@ class StanzaStream:
         yield from self._enqueue(stanza)
 
     @asyncio.coroutine
-    def _send_immediately(self, stanza, *, timeout=None, cb=None):
+    def _send_immediately(self, stanza, *, timeout=None, cb=None,
+                          priority=StanzaPriority.INTERACTIVE):
         """
         Send a stanza without waiting for the stream to be ready to send
         stanzas.
@@ -2455,6 +3404,10 @@ class StanzaStream:
         This is only useful from within :class:`aioxmpp.node.Client` before
         the stream is fully established.
         """
+        if not self._outbound_open.is_set():
+            self._logger.debug("outbound queue is full, waiting")
+            yield from self._outbound_open.wait()
+
         stanza.autoset_id()
         self._logger.debug("sending %r and waiting for it to be sent",
                            stanza)
@@ -2464,7 +3417,7 @@ class StanzaStream:
                 raise ValueError(
                     "cb not supported with non-IQ non-request stanzas"
                 )
-            yield from self._enqueue(stanza)
+            yield from self._enqueue(stanza, priority=priority)
             return
 
         # we use the long way with a custom listener instead of a future here
@@ -2474,17 +3427,34 @@ class StanzaStream:
         # `cb` function.
 
         fut = asyncio.Future()
+        deadline = None
+        nested_pending = False
 
         def nested_cb(task):
             """
             This callback is used to handle awaitables returned by the `cb`.
             """
             nonlocal fut
-            if task.exception() is None:
+            if fut.done():
+                return
+            if task.cancelled():
+                fut.cancel()
+            elif task.exception() is None:
                 fut.set_result(task.result())
             else:
                 fut.set_exception(task.exception())
 
+        def nested_timed_out():
+            if not fut.done():
+                fut.set_exception(TimeoutError())
+
+        def cover_nested():
+            # the timer in the response table is discarded once the response
+            # has been received; the timeout also applies to the awaitable
+            # returned by the `cb`, so it needs a timer of its own
+            handle = self._loop.call_at(deadline, nested_timed_out)
+            fut.add_done_callback(lambda fut: handle.cancel())
+
         def handler_ok(stanza):
             """
             This handler is invoked synchronously by
@@ -2492,7 +3462,7 @@ class StanzaStream:
             :class:`aioxmpp.callbacks.TagDispatcher`) for response stanzas
             (including error stanzas).
             """
-            nonlocal fut
+            nonlocal fut, nested_pending
             if fut.cancelled():
                 return
 
@@ -2504,6 +3474,9 @@ class StanzaStream:
                 else:
                     if nested_fut is not None:
                         nested_fut.add_done_callback(nested_cb)
+                        nested_pending = True
+                        if deadline is not None:
+                            cover_nested()
                         return
 
             # we can’t even use StanzaErrorAwareListener because we want to
@@ -2536,22 +3509,29 @@ class StanzaStream:
         )
 
         try:
-            yield from self._enqueue(stanza)
+            yield from self._enqueue(stanza, priority=priority)
         except Exception:
             listener.cancel()
             raise
 
-        if not timeout:
-            reply = yield from fut
-        else:
-            try:
-                reply = yield from asyncio.wait_for(
-                    fut,
-                    timeout=timeout
+        if timeout:
+            deadline = self._loop.time() + timeout
+            if nested_pending:
+                # the response arrived while the stanza was being enqueued
+                cover_nested()
+            else:
+                # the timer is shared with all other pending IQs; on expiry,
+                # handler_error receives a TimeoutError
+                self._iq_response_map.set_timeout(
+                    (stanza.to, stanza.id_),
+                    timeout,
                 )
-            except asyncio.TimeoutError:
-                raise TimeoutError
-        return reply
+
+        try:
+            return (yield from fut)
+        except asyncio.CancelledError:
+            listener.cancel()
+            raise
 
     @asyncio.coroutine
     def send(self, stanza, timeout=None, *, cb=None):
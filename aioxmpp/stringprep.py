@@ -36,6 +36,7 @@ This module implements the Nodeprep (`RFC 6122`_) and Resourceprep (`RFC 6122`_)
 
 """
 
+import re
 import stringprep
 import unicodedata
 
@@ -144,13 +145,7 @@ def _nodeprep_do_mapping(chars):
             i += len(replacement)
 
 
-def nodeprep(string, allow_unassigned=False):
-    """
-    Process the given `string` using the Nodeprep (`RFC 6122`_) profile. In the
-    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
-    raised.
-    """
-
+def _nodeprep_full(string, allow_unassigned=False):
     chars = list(string)
     _nodeprep_do_mapping(chars)
     do_normalization(chars)
@@ -193,13 +188,7 @@ def _resourceprep_do_mapping(chars):
         i += 1
 
 
-def resourceprep(string, allow_unassigned=False):
-    """
-    Process the given `string` using the Resourceprep (`RFC 6122`_) profile. In
-    the error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError`
-    is raised.
-    """
-
+def _resourceprep_full(string, allow_unassigned=False):
     chars = list(string)
     _resourceprep_do_mapping(chars)
     do_normalization(chars)
@@ -230,13 +219,7 @@ def resourceprep(string, allow_unassigned=False):
     return "".join(chars)
 
 
-def nameprep(string, allow_unassigned=False):
-    """
-    Process the given `string` using the Nameprep (`RFC 3491`_) profile. In the
-    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
-    raised.
-    """
-
+def _nameprep_full(string, allow_unassigned=False):
     chars = list(string)
     _nodeprep_do_mapping(chars)
     do_normalization(chars)
@@ -264,3 +247,78 @@ def nameprep(string, allow_unassigned=False):
         )
 
     return "".join(chars)
+
+
+def _compile_ascii_fast_path(prep, mapping):
+    """
+    Build a regular expression which fully matches exactly those ASCII strings
+    for which `prep` is equivalent to applying `mapping`.
+
+    The set of allowed characters is derived by running the full `prep`
+    algorithm on each ASCII character. For ASCII input, NFKC normalization is
+    the identity, no character has a R or AL bidirectional category and no
+    code point is unassigned, so a string consisting only of allowed
+    characters is prepared by mapping each character on its own.
+    """
+    allowed = []
+    for c in map(chr, range(128)):
+        try:
+            result = prep(c)
+        except ValueError:
+            continue
+        if result == mapping(c):
+            allowed.append(c)
+    return re.compile("[{}]*".format(re.escape("".join(allowed))))
+
+
+_nodeprep_ascii = _compile_ascii_fast_path(_nodeprep_full, str.lower)
+_resourceprep_ascii = _compile_ascii_fast_path(_resourceprep_full, str)
+_nameprep_ascii = _compile_ascii_fast_path(_nameprep_full, str.lower)
+
+
+def nodeprep(string, allow_unassigned=False):
+    """
+    Process the given `string` using the Nodeprep (`RFC 6122`_) profile. In the
+    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
+    raised.
+
+    .. versionchanged:: 0.10
+
+       Strings consisting only of ASCII characters which are valid in the
+       profile take a fast path which skips the unicode table lookups.
+    """
+    if _nodeprep_ascii.fullmatch(string):
+        return string.lower()
+    return _nodeprep_full(string, allow_unassigned=allow_unassigned)
+
+
+def resourceprep(string, allow_unassigned=False):
+    """
+    Process the given `string` using the Resourceprep (`RFC 6122`_) profile. In
+    the error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError`
+    is raised.
+
+    .. versionchanged:: 0.10
+
+       Strings consisting only of ASCII characters which are valid in the
+       profile take a fast path which skips the unicode table lookups.
+    """
+    if _resourceprep_ascii.fullmatch(string):
+        return string
+    return _resourceprep_full(string, allow_unassigned=allow_unassigned)
+
+
+def nameprep(string, allow_unassigned=False):
+    """
+    Process the given `string` using the Nameprep (`RFC 3491`_) profile. In the
+    error cases defined in `RFC 3454`_ (stringprep), a :class:`ValueError` is
+    raised.
+
+    .. versionchanged:: 0.10
+
+       Strings consisting only of ASCII characters which are valid in the
+       profile take a fast path which skips the unicode table lookups.
+    """
+    if _nameprep_ascii.fullmatch(string):
+        return string.lower()
+    return _nameprep_full(string, allow_unassigned=allow_unassigned)
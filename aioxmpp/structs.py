@@ -74,8 +74,10 @@ Functions for working with language tags
 import collections
 import enum
 import functools
+import threading
 import warnings
 
+from . import cache
 from .stringprep import nodeprep, resourceprep, nameprep
 
 
@@ -589,6 +591,55 @@ class IQType(CompatibilityMixin, enum.Enum):
         return self == IQType.RESULT or self == IQType.ERROR
 
 
+def _make_prep_cache(maxsize):
+    result = cache.LRUDict()
+    result.maxsize = maxsize
+    return result
+
+
+# the results of the stringprep profiles only depend on the input string and
+# on whether unassigned codepoints are allowed, so they can be memoized; we
+# only ever store successful results, failures are re-evaluated (and raise
+# again) on each call
+#
+# the LRUDict is not thread-safe and JIDs may be constructed outside the
+# event loop thread (for example when stanzas are parsed in an executor), so
+# all accesses are guarded by a lock
+_cache_lock = threading.Lock()
+_nodeprep_cache = _make_prep_cache(4096)
+_nameprep_cache = _make_prep_cache(1024)
+_resourceprep_cache = _make_prep_cache(4096)
+_fromstr_cache = _make_prep_cache(4096)
+
+# the string and bare forms of JIDs are kept in side tables keyed by the JID,
+# so that JID instances stay as small as plain tuples. These are plain dicts
+# which are emptied when they are full: a lookup must be cheaper than building
+# the string, which rules out the LRUDict and the lock. Single dict
+# operations are atomic, so this is safe to use from multiple threads.
+_JID_FORM_CACHE_SIZE = 4096
+_jid_str_cache = {}
+_jid_bare_cache = {}
+
+
+def _store_jid_form(form_cache, jid, value):
+    if len(form_cache) >= _JID_FORM_CACHE_SIZE:
+        form_cache.clear()
+    form_cache[jid] = value
+
+
+def _cached_prep(prep_cache, prep, string, strict):
+    key = string, strict
+    with _cache_lock:
+        try:
+            return prep_cache[key]
+        except KeyError:
+            pass
+    result = prep(string, allow_unassigned=not strict)
+    with _cache_lock:
+        prep_cache[key] = result
+    return result
+
+
 class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
     """
     A Jabber ID (JID). To construct a JID, either use the actual constructor,
@@ -629,25 +680,34 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
     .. automethod:: bare
 
     .. automethod:: replace(*, [localpart], [domain], [resource])
+
+    .. versionchanged:: 0.10
+
+       The results of the stringprep profiles and of :meth:`fromstr` are kept
+       in bounded LRU caches, so that constructing the same JIDs over and over
+       does not run the (expensive) preparation each time. :meth:`bare` no
+       longer re-applies stringprep to the already prepared parts.
+
+    .. versionchanged:: 0.10
+
+       The string forms and the bare forms of recently used JIDs are kept in
+       bounded caches, so that they are not rebuilt on each use.
     """
 
     __slots__ = []
 
     def __new__(cls, localpart, domain, resource, *, strict=True):
         if localpart:
-            localpart = nodeprep(
-                localpart,
-                allow_unassigned=not strict
+            localpart = _cached_prep(
+                _nodeprep_cache, nodeprep, localpart, strict
             )
         if domain is not None:
-            domain = nameprep(
-                domain,
-                allow_unassigned=not strict
+            domain = _cached_prep(
+                _nameprep_cache, nameprep, domain, strict
             )
         if resource:
-            resource = resourceprep(
-                resource,
-                allow_unassigned=not strict
+            resource = _cached_prep(
+                _resourceprep_cache, resourceprep, resource, strict
             )
 
         if not domain:
@@ -684,9 +744,8 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
             pass
         else:
             if localpart:
-                localpart = nodeprep(
-                    localpart,
-                    allow_unassigned=not strict
+                localpart = _cached_prep(
+                    _nodeprep_cache, nodeprep, localpart, strict
                 )
             new_kwargs["localpart"] = localpart
 
@@ -697,9 +756,8 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         else:
             if not domain:
                 raise ValueError("domain must not be empty or None")
-            new_kwargs["domain"] = nameprep(
-                domain,
-                allow_unassigned=not strict
+            new_kwargs["domain"] = _cached_prep(
+                _nameprep_cache, nameprep, domain, strict
             )
 
         try:
@@ -708,9 +766,8 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
             pass
         else:
             if resource:
-                resource = resourceprep(
-                    resource,
-                    allow_unassigned=not strict
+                resource = _cached_prep(
+                    _resourceprep_cache, resourceprep, resource, strict
                 )
             new_kwargs["resource"] = resource
 
@@ -722,18 +779,40 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         return super()._replace(**new_kwargs)
 
     def __str__(self):
+        try:
+            return _jid_str_cache[self]
+        except KeyError:
+            pass
+
         result = self.domain
         if self.localpart:
             result = self.localpart + "@" + result
         if self.resource:
             result += "/" + self.resource
+        _store_jid_form(_jid_str_cache, self, result)
         return result
 
     def bare(self):
         """
-        Return the bare version of this JID as new :class:`JID` object.
+        Return the bare version of this JID as :class:`JID` object.
+
+        If the JID is already bare, it is returned unchanged.
         """
-        return self.replace(resource=None)
+        if self.resource is None:
+            return self
+
+        if type(self) is not JID:
+            return super()._replace(resource=None)
+
+        try:
+            return _jid_bare_cache[self]
+        except KeyError:
+            pass
+
+        # the parts are already prepared, no need to run stringprep again
+        result = super()._replace(resource=None)
+        _store_jid_form(_jid_bare_cache, self, result)
+        return result
 
     @property
     def is_bare(self):
@@ -757,6 +836,13 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         Obtain a :class:`JID` object by parsing a JID from the given string
         `s`.
         """
+        if cls is JID:
+            with _cache_lock:
+                try:
+                    return _fromstr_cache[s, strict]
+                except KeyError:
+                    pass
+
         localpart, sep, domain = s.partition("@")
         if not sep:
             domain = localpart
@@ -765,7 +851,11 @@ class JID(collections.namedtuple("JID", ["localpart", "domain", "resource"])):
         domain, sep, resource = domain.partition("/")
         if not sep:
             resource = None
-        return cls(localpart, domain, resource, strict=strict)
+        result = cls(localpart, domain, resource, strict=strict)
+        if cls is JID:
+            with _cache_lock:
+                _fromstr_cache[s, strict] = result
+        return result
 
 
 @functools.total_ordering
@@ -35,6 +35,9 @@ class TaskPool:
 
     :param max_tasks: Maximum number of total coroutines running in the pool.
     :type max_tasks: positive :class:`int` or :data:`None`
+    :param default_limit: Limit for groups (other than ``()``) on which no
+                          limit has been set explicitly.
+    :type default_limit: positive :class:`int` or :data:`None`
     :param logger: Logger to use for diagnostics, defaults to a module-wide
                    logger
 
@@ -142,7 +145,37 @@ class TaskPool:
         :return: Number of currently running tasks
         :rtype: :class:`int`
         """
-        return 0
+        return len(self._group_tasks.get(group, ()))
+
+    def _effective_limit(self, group):
+        try:
+            return self._group_limits[group]
+        except KeyError:
+            if group == ():
+                return None
+            return self.default_limit
+
+    def _check_limits(self, groups):
+        for group in groups:
+            limit = self._effective_limit(group)
+            if limit is not None and self.get_task_count(group) >= limit:
+                raise RuntimeError("limit on group {!r} exhausted".format(
+                    group
+                ))
+
+    def _remove_task(self, groups, task):
+        for group in groups:
+            tasks = self._group_tasks[group]
+            tasks.discard(task)
+            if not tasks:
+                del self._group_tasks[group]
+
+    def _add_task(self, groups, task):
+        for group in groups:
+            self._group_tasks.setdefault(group, set()).add(task)
+        task.add_done_callback(
+            lambda task: self._remove_task(groups, task)
+        )
 
     def add(self, groups, coro):
         """
@@ -159,8 +192,18 @@ class TaskPool:
         Every group must have at least one free slot available for `coro` to be
         spawned; if any groups capacity (or the total limit) is exhausted, the
         coroutine is not accepted into the pool and :class:`RuntimeError` is
-        raised.
+        raised. In that case, `coro` is closed, so that it does not trigger a
+        warning about never having been awaited.
         """
+        groups = set(groups) | {()}
+        try:
+            self._check_limits(groups)
+        except RuntimeError:
+            coro.close()
+            raise
+        task = asyncio.async(coro)
+        self._add_task(groups, task)
+        return task
 
     def spawn(self, __groups, __coro_fun, *args, **kwargs):
         """
@@ -196,7 +239,7 @@ class TaskPool:
         """
         # ensure the implicit group is included
         __groups = set(__groups) | {()}
-
-
-
-        return asyncio.async(__coro_fun(*args, **kwargs))
+        self._check_limits(__groups)
+        task = asyncio.async(__coro_fun(*args, **kwargs))
+        self._add_task(__groups, task)
+        return task
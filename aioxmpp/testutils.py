@@ -617,6 +617,8 @@ class XMLStreamMock(InteractivityMock):
                                    response)
 
     on_closing = callbacks.Signal()
+    on_writing_paused = callbacks.Signal()
+    on_writing_resumed = callbacks.Signal()
 
     def __init__(self, tester, *, loop=None):
         super().__init__(tester, loop=loop)
@@ -47,6 +47,8 @@ instances, the following classes and functions can be used:
 
 .. autofunction:: make_parser
 
+.. autoclass:: BatchingExpatReader
+
 Utility functions
 =================
 
@@ -60,18 +62,20 @@ Utility functions
 
 """
 
-import copy
 import ctypes
 import ctypes.util
 import contextlib
 import io
+import itertools
 
+import xml.parsers.expat as pyexpat
 import xml.sax
 import xml.sax.saxutils
 
 from enum import Enum
 
 from . import errors, structs, xso
+from .xso import model as xso_model
 from .utils import namespaces
 
 
@@ -193,7 +197,33 @@ class XMPPXMLGenerator:
 
     .. automethod:: buffer
 
+    .. autoattribute:: last_buffer_size
+
+    The generator keeps a cache of start tag templates. When an element is
+    started without any pending namespace declarations, the serialised form
+    of the start tag, including the namespace declarations generated for it,
+    depends only on the namespaces in scope, the element name and the names
+    of the attributes. The bytes for the tag, the namespace declarations and
+    the attribute names are thus only generated once for each combination;
+    afterwards, only the attribute values need to be escaped. This is
+    transparent and produces the same output as without the cache.
+
+    .. autoattribute:: START_TAG_CACHE_SIZE
+
+    .. autoattribute:: CHARACTERS_CHUNK_SIZE
+
+    .. versionchanged:: 0.10
+
+       The start tag template cache was added.
     """
+
+    #: Maximum number of start tag templates kept by a generator.
+    START_TAG_CACHE_SIZE = 256
+
+    #: Character data longer than this many characters is escaped and
+    #: encoded in slices of this size by :meth:`characters`.
+    CHARACTERS_CHUNK_SIZE = 65536
+
     def __init__(self, out,
                  short_empty_elements=True,
                  sorted_attributes=False,
@@ -214,8 +244,12 @@ class XMPPXMLGenerator:
 
         # NOTE: when adding state, make sure to handle it in buffer() and to
         # add tests that buffer() handles it correctly
-        self._ns_map_stack = [({}, set(), 0)]
+        # namespace maps are never modified after they have been installed
+        # as _curr_ns_map, so that they can be shared between the stack and
+        # the start tag templates
+        self._ns_map_stack = [({}, set(), 0, None, (None, None))]
         self._curr_ns_map = {}
+        self._curr_ns_key = None
         self._pending_start_element = False
         self._ns_prefixes_floating_in = {}
         self._ns_prefixes_floating_out = set()
@@ -226,6 +260,11 @@ class XMPPXMLGenerator:
         # for buffer()
         self._buf = None
         self._buf_in_use = False
+        self._last_buffer_size = 0
+
+        # does not need to be saved by buffer(): the templates only depend on
+        # their key
+        self._start_tag_templates = {}
 
     def _roll_prefix(self, attr):
         if not attr and None not in self._ns_prefixes_floating_in:
@@ -238,6 +277,7 @@ class XMPPXMLGenerator:
                 break
             prefix_number += 1
         self._ns_counter = prefix_number
+        self._curr_ns_key = None
         return prefix
 
     def _qname(self, name, attr=False):
@@ -283,7 +323,14 @@ class XMPPXMLGenerator:
         self._pending_start_element = False
         self._write(b">")
 
-    def _pin_floating_ns_decls(self, old_counter):
+    def _get_ns_key(self):
+        key = self._curr_ns_key
+        if key is None:
+            key = (frozenset(self._curr_ns_map.items()), self._ns_counter)
+            self._curr_ns_key = key
+        return key
+
+    def _pin_floating_ns_decls(self, old_counter, old_key, name, qname):
         if self._ns_prefixes_floating_out:
             raise RuntimeError("namespace prefix has not been closed")
 
@@ -291,9 +338,11 @@ class XMPPXMLGenerator:
         new_prefixes = self._ns_prefixes_floating_in
         self._ns_map_stack.append(
             (
-                self._curr_ns_map.copy(),
+                self._curr_ns_map,
                 set(new_prefixes) - self._ns_auto_prefixes_floating_in,
-                old_counter
+                old_counter,
+                old_key,
+                (name, qname),
             )
         )
 
@@ -307,7 +356,10 @@ class XMPPXMLGenerator:
                 if new_uri == uri:
                     del cleared_new_prefixes[prefix]
 
-        self._curr_ns_map.update(new_decls)
+        if new_decls:
+            self._curr_ns_map = dict(self._curr_ns_map)
+            self._curr_ns_map.update(new_decls)
+            self._curr_ns_key = None
         self._ns_decls_floating_in = {}
         self._ns_prefixes_floating_in = {}
         self._ns_auto_prefixes_floating_in.clear()
@@ -382,47 +434,74 @@ class XMPPXMLGenerator:
         Attribute values are of course automatically escaped.
         """
         self._finish_pending_start_element()
+
+        template_key = None
+        if (not self._ns_prefixes_floating_in and
+                not self._ns_prefixes_floating_out):
+            template_key = (
+                self._get_ns_key(),
+                name,
+                tuple(attributes.keys()) if attributes else (),
+            )
+            try:
+                template = self._start_tag_templates[template_key]
+            except KeyError:
+                pass
+            else:
+                self._start_element_from_template(name, attributes, template)
+                return
+
         old_counter = self._ns_counter
+        old_key = self._curr_ns_key
 
         qname = self._qname(name)
         if attributes:
             attrib = [
-                (self._qname(attrname, attr=True), value)
+                (self._qname(attrname, attr=True), value, attrname)
                 for attrname, value in attributes.items()
             ]
-            for attrqname, _ in attrib:
+            for attrqname, _, _ in attrib:
                 if attrqname == "xmlns":
                     raise ValueError("xmlns not allowed as attribute name")
         else:
             attrib = []
 
-        pending_prefixes = self._pin_floating_ns_decls(old_counter)
+        qname = qname.encode("utf-8")
+        pending_prefixes = self._pin_floating_ns_decls(
+            old_counter,
+            old_key,
+            name,
+            qname,
+        )
 
-        self._write(b"<")
-        self._write(qname.encode("utf-8"))
+        head = [b"<", qname]
 
         if None in pending_prefixes:
             uri = pending_prefixes.pop(None)
-            self._write(b" xmlns=")
-            self._write(xml.sax.saxutils.quoteattr(uri).encode("utf-8"))
+            head.append(b" xmlns=")
+            head.append(xml.sax.saxutils.quoteattr(uri).encode("utf-8"))
 
         for prefix, uri in sorted(pending_prefixes.items()):
-            self._write(b" xmlns")
+            head.append(b" xmlns")
             if prefix:
-                self._write(b":")
-                self._write(prefix.encode("utf-8"))
-            self._write(b"=")
-            self._write(
+                head.append(b":")
+                head.append(prefix.encode("utf-8"))
+            head.append(b"=")
+            head.append(
                 xml.sax.saxutils.quoteattr(uri).encode("utf-8")
             )
 
+        head = b"".join(head)
+        self._write(head)
+
         if self._sorted_attributes:
             attrib.sort()
 
-        for attrname, value in attrib:
-            self._write(b" ")
-            self._write(attrname.encode("utf-8"))
-            self._write(b"=")
+        attr_heads = []
+        for attrqname, value, attrname in attrib:
+            attr_head = b"".join((b" ", attrqname.encode("utf-8"), b"="))
+            attr_heads.append((attrname, attr_head))
+            self._write(attr_head)
             self._write(
                 xml.sax.saxutils.quoteattr(
                     value,
@@ -430,6 +509,50 @@ class XMPPXMLGenerator:
                 ).encode("utf-8")
             )
 
+        if template_key is not None:
+            templates = self._start_tag_templates
+            if len(templates) >= self.START_TAG_CACHE_SIZE:
+                templates.clear()
+            templates[template_key] = (
+                qname,
+                head,
+                attr_heads,
+                self._curr_ns_map,
+                self._ns_counter,
+                self._get_ns_key(),
+            )
+
+        if self._short_empty_elements:
+            self._pending_start_element = name
+        else:
+            self._write(b">")
+
+    def _start_element_from_template(self, name, attributes, template):
+        qname, head, attr_heads, ns_map, ns_counter, ns_key = template
+
+        self._ns_map_stack.append(
+            (
+                self._curr_ns_map,
+                set(),
+                self._ns_counter,
+                self._curr_ns_key,
+                (name, qname),
+            )
+        )
+        self._curr_ns_map = ns_map
+        self._ns_counter = ns_counter
+        self._curr_ns_key = ns_key
+
+        self._write(head)
+        for attrname, attr_head in attr_heads:
+            self._write(attr_head)
+            self._write(
+                xml.sax.saxutils.quoteattr(
+                    attributes[attrname],
+                    self._additional_escapes,
+                ).encode("utf-8")
+            )
+
         if self._short_empty_elements:
             self._pending_start_element = name
         else:
@@ -447,12 +570,23 @@ class XMPPXMLGenerator:
             self._pending_start_element = False
             self._write(b"/>")
         else:
+            started_name, qname = self._ns_map_stack[-1][4]
+            if started_name != name or self._ns_prefixes_floating_in:
+                qname = self._qname(name).encode("utf-8")
             self._write(b"</")
-            self._write(self._qname(name).encode("utf-8"))
+            self._write(qname)
             self._write(b">")
 
-        self._curr_ns_map, self._ns_prefixes_floating_out, self._ns_counter = \
-            self._ns_map_stack.pop()
+        (self._curr_ns_map,
+         prefixes_floating_out,
+         self._ns_counter,
+         self._curr_ns_key,
+         _) = self._ns_map_stack.pop()
+        # the set is still referenced by snapshots taken by buffer(), so we
+        # must not modify it in endPrefixMapping
+        if prefixes_floating_out:
+            prefixes_floating_out = set(prefixes_floating_out)
+        self._ns_prefixes_floating_out = prefixes_floating_out
 
     def endPrefixMapping(self, prefix):
         """
@@ -476,15 +610,32 @@ class XMPPXMLGenerator:
 
         If `chars` contains any ASCII control character, :class:`ValueError` is
         raised.
+
+        Long character data is escaped and written in slices of
+        :attr:`CHARACTERS_CHUNK_SIZE` characters, so that no escaped and
+        encoded copy of the whole string is created.
+
+        .. versionchanged:: 0.10
+
+           Long character data is written in slices.
         """
         self._finish_pending_start_element()
         if not is_valid_cdata_str(chars):
             raise ValueError("control characters are not allowed in "
                              "well-formed XML")
-        self._write(xml.sax.saxutils.escape(
-            chars,
-            self._additional_escapes,
-        ).encode("utf-8"))
+        chunk_size = self.CHARACTERS_CHUNK_SIZE
+        if len(chars) <= chunk_size:
+            self._write(xml.sax.saxutils.escape(
+                chars,
+                self._additional_escapes,
+            ).encode("utf-8"))
+            return
+
+        for i in range(0, len(chars), chunk_size):
+            self._write(xml.sax.saxutils.escape(
+                chars[i:i+chunk_size],
+                self._additional_escapes,
+            ).encode("utf-8"))
 
     def processingInstruction(self, target, data):
         """
@@ -537,37 +688,70 @@ class XMPPXMLGenerator:
         if self._flush:
             self._flush()
 
-    @contextlib.contextmanager
     def _save_state(self):
         """
-        Helper context manager for :meth:`buffer` which saves the whole state.
+        Helper for :meth:`buffer` which takes a snapshot of the whole state.
+
+        The snapshot can be restored with :meth:`_restore_state`. This is
+        broken out in a separate method for readability and tested indirectly
+        by testing :meth:`buffer`.
 
-        This is broken out in a separate method for readability and tested
-        indirectly by testing :meth:`buffer`.
+        Namespace maps are never modified after they have become the current
+        map, so a reference to the current map is enough. The containers for
+        floating prefixes are only copied if they are non-empty, which is not
+        the case between top-level elements. This keeps the snapshot cheap
+        for the common case of sending a stanza.
         """
-        ns_prefixes_floating_in = copy.copy(self._ns_prefixes_floating_in)
-        ns_prefixes_floating_out = copy.copy(self._ns_prefixes_floating_out)
-        ns_decls_floating_in = copy.copy(self._ns_decls_floating_in)
-        curr_ns_map = copy.copy(self._curr_ns_map)
-        ns_map_stack = copy.copy(self._ns_map_stack)
-        pending_start_element = self._pending_start_element
-        ns_counter = self._ns_counter
-        # XXX: I have been unable to find a test justifying copying this :/
-        # for completeness, I’m still doing it
-        ns_auto_prefixes_floating_in = \
-            copy.copy(self._ns_auto_prefixes_floating_in)
-        try:
-            yield
-        except:
-            self._ns_prefixes_floating_in = ns_prefixes_floating_in
-            self._ns_prefixes_floating_out = ns_prefixes_floating_out
-            self._ns_decls_floating_in = ns_decls_floating_in
-            self._pending_start_element = pending_start_element
-            self._curr_ns_map = curr_ns_map
-            self._ns_map_stack = ns_map_stack
-            self._ns_counter = ns_counter
-            self._ns_auto_prefixes_floating_in = ns_auto_prefixes_floating_in
-            raise
+        return (
+            (self._ns_prefixes_floating_in.copy()
+             if self._ns_prefixes_floating_in else None),
+            (self._ns_prefixes_floating_out.copy()
+             if self._ns_prefixes_floating_out else None),
+            (self._ns_decls_floating_in.copy()
+             if self._ns_decls_floating_in else None),
+            # XXX: I have been unable to find a test justifying copying this
+            # :/ for completeness, I’m still doing it
+            (self._ns_auto_prefixes_floating_in.copy()
+             if self._ns_auto_prefixes_floating_in else None),
+            self._curr_ns_map,
+            self._curr_ns_key,
+            self._ns_map_stack[:],
+            self._pending_start_element,
+            self._ns_counter,
+        )
+
+    def _restore_state(self, state):
+        """
+        Restore a snapshot taken with :meth:`_save_state`.
+        """
+        (ns_prefixes_floating_in,
+         ns_prefixes_floating_out,
+         ns_decls_floating_in,
+         ns_auto_prefixes_floating_in,
+         self._curr_ns_map,
+         self._curr_ns_key,
+         self._ns_map_stack,
+         self._pending_start_element,
+         self._ns_counter) = state
+
+        self._ns_prefixes_floating_in = ns_prefixes_floating_in or {}
+        self._ns_prefixes_floating_out = ns_prefixes_floating_out or set()
+        self._ns_decls_floating_in = ns_decls_floating_in or {}
+        self._ns_auto_prefixes_floating_in = \
+            ns_auto_prefixes_floating_in or set()
+
+    @property
+    def last_buffer_size(self):
+        """
+        The number of bytes which were sent to the sink when the most recent
+        :meth:`buffer` context manager was left.
+
+        This is zero if the context manager was left with an exception or if
+        :meth:`buffer` has not been used yet.
+
+        .. versionadded:: 0.10
+        """
+        return self._last_buffer_size
 
     @contextlib.contextmanager
     def buffer(self):
@@ -596,6 +780,7 @@ class XMPPXMLGenerator:
         if self._buf_in_use:
             raise RuntimeError("nested use of buffer() is not supported")
         self._buf_in_use = True
+        self._last_buffer_size = 0
         old_write = self._write
         old_flush = self._flush
 
@@ -611,9 +796,14 @@ class XMPPXMLGenerator:
 
         self._write = self._buf.write
         self._flush = None
+        state = self._save_state()
         try:
-            with self._save_state():
+            try:
                 yield
+            except:
+                self._restore_state(state)
+                raise
+            self._last_buffer_size = self._buf.tell()
             old_write(self._buf.getbuffer())
             if old_flush:
                 old_flush()
@@ -722,6 +912,8 @@ class XMLStreamWriter:
         :type xso: :class:`aioxmpp.xso.XSO`
         :raises Exception: from any serialisation errors, usually
                            :class:`ValueError`.
+        :return: The number of bytes written.
+        :rtype: :class:`int`
 
         Serialise the `xso` and send it over the stream. If any serialisation
         error occurs, no data is sent over the stream and the exception is
@@ -733,9 +925,14 @@ class XMLStreamWriter:
            The behaviour of :meth:`send` after :meth:`abort` or :meth:`close`
            and before :meth:`start` is undefined.
 
+        .. versionchanged:: 0.10
+
+           The number of bytes written is returned.
+
         """
         with self._writer.buffer():
             xso.unparse_to_sax(self._writer)
+        return self._writer.last_buffer_size
 
     def abort(self):
         """
@@ -825,7 +1022,23 @@ class XMPPXMLProcessor:
        May be a callable or :data:`None`. If not false, the value will get
        called whenever a stream header is processed.
 
+    .. attribute:: offload
+
+       May be a callable or :data:`None`. If not false, the value is called
+       by :meth:`process_events` with the events of each stream-level element.
+       If it returns true, the element is not processed; the callable has
+       taken over the responsibility to process it later, usually with
+       :meth:`parse_detached` and :meth:`process_detached`.
+
+       .. versionadded:: 0.10
+
     .. autoattribute:: stanza_parser
+
+    .. automethod:: process_events
+
+    .. automethod:: parse_detached
+
+    .. automethod:: process_detached
     """
 
     def __init__(self):
@@ -836,6 +1049,7 @@ class XMPPXMLProcessor:
         self.on_stream_header = None
         self.on_stream_footer = None
         self.on_exception = None
+        self.offload = None
 
         self.remote_version = None
         self.remote_from = None
@@ -973,6 +1187,100 @@ class XMPPXMLProcessor:
         self._state = ProcessorState.STREAM_HEADER_PROCESSED
         self._depth += 1
 
+    def process_events(self, events, *, allow_offload=True):
+        """
+        Process all `events` of a complete stream-level element at once.
+
+        :param events: The events of the element.
+        :type events: :class:`list` of event tuples
+        :param allow_offload: Whether :attr:`offload` is consulted.
+        :type allow_offload: :class:`bool`
+
+        `events` must be in the event format used by :mod:`aioxmpp.xso` and
+        must start with the ``"start"`` event of the stream-level element and
+        end with its matching ``"end"`` event.
+
+        The outcome is the same as if the equivalent SAX events had been
+        passed to :meth:`startElementNS`, :meth:`characters` and
+        :meth:`endElementNS`, including the exception handling. This is used
+        by :class:`BatchingExpatReader`.
+
+        .. versionadded:: 0.10
+        """
+        if self._state != ProcessorState.STREAM_HEADER_PROCESSED:
+            raise RuntimeError("invalid state: {}".format(self._state))
+
+        if allow_offload and self.offload and self.offload(events):
+            return
+
+        try:
+            self._driver.send_events(events)
+        except Exception as exc:
+            self._stored_exception = exc
+            self._end_element_exception_handling()
+
+    def parse_detached(self, events):
+        """
+        Parse the `events` of a complete stream-level element into an XSO,
+        without calling the callback registered at the :attr:`stanza_parser`.
+
+        :param events: The events of the element, as for
+                       :meth:`process_events`.
+        :type events: :class:`list` of event tuples
+        :return: The callback and the parsed object, to be passed to
+                 :meth:`process_detached`.
+        :raises Exception: Any exception raised while parsing.
+
+        This neither touches the state of the processor nor the state of the
+        :attr:`stanza_parser` and may thus be called from another thread while
+        the processor continues to be used.
+
+        .. versionadded:: 0.10
+        """
+        _, *ev_args = events[0]
+        try:
+            cls, cb = self._stanza_parser.get_tag_map()[
+                ev_args[0], ev_args[1]
+            ]
+        except KeyError:
+            raise xso.UnknownTopLevelTag(
+                "unhandled top-level element",
+                ev_args)
+
+        ctx = xso_model.Context()
+        ctx.lang = self._stanza_parser.lang
+        parser = cls.parse_events(ev_args, ctx)
+        next(parser)
+        try:
+            for ev in itertools.islice(events, 1, None):
+                parser.send(ev)
+        except StopIteration as exc:
+            return cb, exc.value
+        raise ValueError("incomplete stream-level element")
+
+    def process_detached(self, result=None, exc=None):
+        """
+        Complete the processing of an element parsed with
+        :meth:`parse_detached`.
+
+        :param result: The return value of :meth:`parse_detached`.
+        :param exc: The exception raised by :meth:`parse_detached`.
+
+        If `exc` is :data:`None`, the callback is called with the object.
+        Otherwise, `exc` is handled like an exception raised while processing
+        a stream-level element (see :attr:`on_exception`).
+
+        .. versionadded:: 0.10
+        """
+        if exc is not None:
+            if self.on_exception:
+                self.on_exception(exc)
+                return
+            raise exc
+
+        cb, obj = result
+        cb(obj)
+
     def _end_element_exception_handling(self):
         self._state = ProcessorState.STREAM_HEADER_PROCESSED
         exc = self._stored_exception
@@ -1074,6 +1382,204 @@ def make_parser():
     return p
 
 
+class BatchingExpatReader:
+    """
+    An incremental XML reader for XMPP streams which hands each stream-level
+    element to the content handler as a whole.
+
+    The reader uses :mod:`pyexpat` directly instead of going through
+    :mod:`xml.sax` and is a drop-in replacement for the reader returned by
+    :func:`make_parser`, as far as :class:`~.protocol.XMLStream` is
+    concerned. The content handler must be a :class:`XMPPXMLProcessor`.
+
+    The stream header, the stream footer and character data between
+    stream-level elements are passed to the content handler as SAX events.
+    The events of stream-level elements (such as stanzas) are collected in the
+    event format used by :mod:`aioxmpp.xso` while the element is received.
+    When the element is complete, the events are passed to
+    :meth:`XMPPXMLProcessor.process_events` in one call.
+
+    Compared to :func:`make_parser`, this avoids the :mod:`xml.sax` adaption
+    layer and the state handling in :class:`XMPPXMLProcessor` for each event.
+    In addition, expat is configured to not split character data into many
+    small chunks within one piece of data passed to :meth:`feed`.
+
+    Restricted XML (comments, processing instructions and DTD declarations)
+    is rejected with the same :class:`~.errors.StreamError` as with
+    :func:`make_parser`. Since DTDs are rejected, non-predefined entities can
+    only occur undefined, which is reported by expat. Errors reported by expat
+    are raised as :class:`xml.sax.SAXParseException`, just like with the
+    :mod:`xml.sax` readers.
+
+    .. automethod:: setContentHandler
+
+    .. automethod:: feed
+
+    .. automethod:: close
+
+    .. versionadded:: 0.10
+    """
+
+    #: Maximum number of split names kept in the cache of a reader.
+    NAME_CACHE_SIZE = 1024
+
+    def __init__(self):
+        super().__init__()
+        self._handler = None
+        self._parser = None
+        self._depth = 0
+        self._events = None
+        self._names = {}
+
+    def getContentHandler(self):
+        return self._handler
+
+    def setContentHandler(self, handler):
+        """
+        Set the content handler which receives the events.
+        """
+        self._handler = handler
+
+    def _create_parser(self):
+        parser = pyexpat.ParserCreate(namespace_separator=" ")
+        parser.buffer_text = True
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._characters
+        parser.ProcessingInstructionHandler = self._processing_instruction
+        parser.CommentHandler = XMPPLexicalHandler.comment
+        parser.StartDoctypeDeclHandler = self._start_doctype_decl
+        return parser
+
+    def _split_name(self, name):
+        try:
+            return self._names[name]
+        except KeyError:
+            pass
+
+        uri, _, localname = name.rpartition(" ")
+        result = uri or None, localname
+        if len(self._names) >= self.NAME_CACHE_SIZE:
+            self._names.clear()
+        self._names[name] = result
+        return result
+
+    def _convert_attributes(self, attributes):
+        split_name = self._split_name
+        return {
+            split_name(name): value
+            for name, value in attributes.items()
+        }
+
+    def _start_element(self, name, attributes):
+        if attributes:
+            attributes = self._convert_attributes(attributes)
+
+        depth = self._depth
+        self._depth = depth + 1
+        if depth > 1:
+            self._events.append(
+                ("start",) + self._split_name(name) + (attributes,)
+            )
+        elif depth == 1:
+            self._events = [
+                ("start",) + self._split_name(name) + (attributes,)
+            ]
+        else:
+            self._handler.startElementNS(
+                self._split_name(name),
+                None,
+                attributes,
+            )
+
+    def _end_element(self, name):
+        self._depth -= 1
+        depth = self._depth
+        if depth > 1:
+            self._events.append(("end",))
+        elif depth == 1:
+            events = self._events
+            self._events = None
+            events.append(("end",))
+            self._handler.process_events(events)
+        else:
+            self._handler.endElementNS(self._split_name(name), None)
+
+    def _characters(self, data):
+        if self._events is not None:
+            self._events.append(("text", data))
+        else:
+            self._handler.characters(data)
+
+    def _processing_instruction(self, target, data):
+        self._handler.processingInstruction(target, data)
+
+    def _start_doctype_decl(self, name, system_id, public_id,
+                            has_internal_subset):
+        XMPPLexicalHandler.startDTD(name, public_id, system_id)
+
+    def _parse(self, data, is_final):
+        try:
+            self._parser.Parse(data, is_final)
+        except pyexpat.ExpatError as exc:
+            raise xml.sax.SAXParseException(
+                pyexpat.ErrorString(exc.code),
+                exc,
+                self,
+            )
+
+    def feed(self, data):
+        """
+        Feed `data` into the reader.
+
+        :param data: Data to parse.
+        :type data: :class:`bytes` or :class:`str`
+        :raises xml.sax.SAXParseException: if the data is not well-formed
+        :raises aioxmpp.errors.StreamError: if restricted XML is encountered
+
+        Exceptions raised by the content handler are propagated.
+        """
+        if self._parser is None:
+            self._parser = self._create_parser()
+            self._handler.startDocument()
+        self._parse(data, False)
+
+    def close(self):
+        """
+        Signal the end of the document to the reader.
+
+        The content handler receives the ``endDocument`` event and the reader
+        can be used for a new document afterwards.
+        """
+        if self._parser is None:
+            return
+        try:
+            self._parse(b"", True)
+            self._handler.endDocument()
+        finally:
+            self._parser = None
+            self._depth = 0
+            self._events = None
+
+    # locator interface for SAXParseException
+
+    def getColumnNumber(self):
+        if self._parser is None:
+            return None
+        return self._parser.ErrorColumnNumber
+
+    def getLineNumber(self):
+        if self._parser is None:
+            return 1
+        return self._parser.ErrorLineNumber
+
+    def getPublicId(self):
+        return None
+
+    def getSystemId(self):
+        return None
+
+
 def serialize_single_xso(x):
     """
     Serialize a single XSO `x` to a string. This is potentially very slow and
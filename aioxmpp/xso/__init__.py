@@ -259,6 +259,8 @@ vice versa. These types inherit from :class:`AbstractCDataType`.
 
 .. autoclass:: Base64Binary
 
+.. autoclass:: IncrementalBase64Decoder
+
 .. autoclass:: HexBinary
 
 .. autoclass:: JID
@@ -497,6 +499,7 @@ from .types import (  # NOQA
     Date,
     Time,
     Base64Binary,
+    IncrementalBase64Decoder,
     HexBinary,
     JID,
     ConnectionLocation,
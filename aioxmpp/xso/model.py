@@ -27,6 +27,7 @@ See :mod:`aioxmpp.xso` for documentation.
 """
 import abc
 import collections
+import collections.abc
 import copy
 import enum
 import logging
@@ -380,6 +381,24 @@ class _TypedPropBase(_PropBase):
             value = self.type_.coerce(value)
         super().__set__(instance, value)
 
+    def _make_incremental_parser(self):
+        if not isinstance(self.type_, xso_types.AbstractCDataType):
+            return None
+        return self.type_.incremental_parser()
+
+    def _iter_format(self, value):
+        if not isinstance(self.type_, xso_types.AbstractCDataType):
+            return (self.type_.format(value),)
+        return self.type_.iter_format(value)
+
+    def _parse_incremental(self, parser):
+        try:
+            return parser.close()
+        except (TypeError, ValueError):
+            if self.erroneous_as_absent:
+                return self.NO_DEFAULT
+            raise
+
 
 class Text(_TypedPropBase):
     """
@@ -394,10 +413,20 @@ class Text(_TypedPropBase):
     The `type_`, `validator`, `validate`, `default` and `erroneous_as_absent`
     arguments behave like in :class:`Attr`.
 
+    If `type_` provides an incremental parser (such as
+    :class:`~.xso.Base64Binary`), the character data is fed to it piece by
+    piece while it is received, instead of being joined first.
+
     .. automethod:: from_value
 
+    .. automethod:: from_incremental_parser
+
     .. automethod:: to_sax
 
+    .. versionchanged:: 0.10
+
+       Support for incremental parsers was added.
+
     """
 
     def from_value(self, instance, value):
@@ -414,17 +443,34 @@ class Text(_TypedPropBase):
         self._set_from_recv(instance, parsed)
         return True
 
+    def from_incremental_parser(self, instance, parser):
+        """
+        Obtain the value from an incremental `parser` created from `type_`
+        and store it into `instance`’ attribute, like :meth:`from_value`.
+
+        .. versionadded:: 0.10
+        """
+        parsed = self._parse_incremental(parser)
+        if parsed is self.NO_DEFAULT:
+            return False
+        self._set_from_recv(instance, parsed)
+        return True
+
     def to_sax(self, instance, dest):
         """
         Assign the formatted value stored at `instance`’ attribute to the text
         of `el`.
 
         If the `value` is :data:`None`, no text is generated.
+
+        The text is emitted in the pieces returned by
+        :meth:`~.xso.AbstractCDataType.iter_format` of `type_`.
         """
         value = self.__get__(instance, type(instance))
         if value is None:
             return
-        dest.characters(self.type_.format(value))
+        for piece in self._iter_format(value):
+            dest.characters(piece)
 
 
 class _ChildPropBase(_PropBase):
@@ -465,6 +511,51 @@ class _ChildPropBase(_PropBase):
         self._classes.add(cls)
 
 
+def _record_events(ev_args):
+    """
+    Collect the events of the element whose ``"start"`` event arguments are
+    `ev_args` into a list, up to and including the matching ``"end"`` event.
+
+    This is a suspendable function; the list is returned.
+    """
+    events = [("start",) + tuple(ev_args)]
+    depth = 1
+    while depth:
+        ev = yield
+        if ev[0] == "start":
+            depth += 1
+        elif ev[0] == "end":
+            depth -= 1
+        events.append(ev)
+    return events
+
+
+class _LazyChild:
+    """
+    Placeholder for a child which has not been parsed yet. See the `lazy`
+    argument of :class:`Child`.
+    """
+
+    __slots__ = ("cls", "events", "ctx")
+
+    def __init__(self, cls, events, ctx):
+        self.cls = cls
+        self.events = events
+        self.ctx = ctx
+
+    def parse(self):
+        events = iter(self.events)
+        _, *ev_args = next(events)
+        gen = self.cls.parse_events(ev_args, self.ctx)
+        next(gen)
+        try:
+            for ev in events:
+                gen.send(ev)
+        except StopIteration as exc:
+            return exc.value
+        raise ValueError("incomplete event sequence")
+
+
 class Child(_ChildPropBase):
     """
     When assigned to a class’ attribute, it collects any child which matches
@@ -486,6 +577,29 @@ class Child(_ChildPropBase):
     the descriptor can be assigned to it. Subclasses of the registered classes
     also need to be registered explicitly to be allowed as types for values.
 
+    :param lazy: Defer parsing of the child until it is accessed.
+    :type lazy: :class:`bool`
+
+    If `lazy` is true, the events of a matching child are only recorded while
+    the parent is parsed. The child object is created from the recorded events
+    when the attribute is read (or the parent is serialised) for the first
+    time. This saves the work for children which are never looked at, such as
+    extension payloads on stanzas no handler cares about.
+
+    The following differences to eager parsing apply in lazy mode:
+
+    * Errors in the child are only detected when it is accessed. They do not
+      reach the :meth:`~.XSO.xso_error_handler` of the parent, but the
+      exception is raised from the attribute access instead. Afterwards, the
+      attribute value is considered incomplete.
+
+    * The child is validated when it is parsed, not when the parent is
+      validated.
+
+    .. versionadded:: 0.10
+
+       The `lazy` argument.
+
     .. automethod:: get_tag_map
 
     .. automethod:: from_events
@@ -493,12 +607,13 @@ class Child(_ChildPropBase):
     .. automethod:: to_sax
     """
 
-    def __init__(self, classes, required=False, strict=False):
+    def __init__(self, classes, required=False, strict=False, lazy=False):
         super().__init__(
             classes,
             default=_PropBase.NO_DEFAULT if required else None
         )
         self.__strict = strict
+        self.__lazy = lazy
 
     @property
     def required(self):
@@ -508,6 +623,25 @@ class Child(_ChildPropBase):
     def strict(self):
         return self.__strict
 
+    @property
+    def lazy(self):
+        return self.__lazy
+
+    def __get__(self, instance, type_):
+        value = super().__get__(instance, type_)
+        if type(value) is _LazyChild:
+            value = self._materialize(instance, value)
+        return value
+
+    def _materialize(self, instance, lazy_child):
+        try:
+            obj = lazy_child.parse()
+        except:
+            self.mark_incomplete(instance)
+            raise
+        self.__set__(instance, obj)
+        return obj
+
     def __set__(self, instance, value):
         if value is None and self.required:
             raise ValueError("cannot set required member to None")
@@ -533,13 +667,25 @@ class Child(_ChildPropBase):
         ``"start"`` event. The new object is stored at the corresponding
         descriptor attribute on `instance`.
 
+        If the descriptor is :attr:`lazy`, the events are only recorded and
+        :data:`None` is returned.
+
         This method is suspendable.
         """
+        if self.__lazy:
+            cls = self._tag_map[ev_args[0], ev_args[1]]
+            events = yield from _record_events(ev_args)
+            self._set(instance, _LazyChild(cls, events, copy.copy(ctx)))
+            return None
+
         obj = yield from self._process(instance, ev_args, ctx)
         self.__set__(instance, obj)
         return obj
 
     def validate_contents(self, instance):
+        if type(instance._xso_contents.get(self)) is _LazyChild:
+            # the child is validated when it is parsed
+            return
         try:
             obj = self.__get__(instance, type(instance))
         except AttributeError:
@@ -886,6 +1032,13 @@ class ChildText(_TypedPropBase):
     :class:`UnknownChildPolicy` and :class:`UnknownAttrPolicy` for the possible
     behaviours.
 
+    Like :class:`Text`, the character data is fed to the incremental parser of
+    `type_` while it is received, if the type provides one.
+
+    .. versionchanged:: 0.10
+
+       Support for incremental parsers was added.
+
     .. automethod:: get_tag_map
 
     .. automethod:: from_events
@@ -936,12 +1089,17 @@ class ChildText(_TypedPropBase):
         attrs = ev_args[2]
         if attrs and self.attr_policy == UnknownAttrPolicy.FAIL:
             raise ValueError("unexpected attribute (at text only node)")
-        parts = []
+        parser = self._make_incremental_parser()
+        if parser is not None:
+            collect = parser.feed
+        else:
+            parts = []
+            collect = parts.append
         while True:
             ev_type, *ev_args = yield
             if ev_type == "text":
                 # collect ALL TEH TEXT!
-                parts.append(ev_args[0])
+                collect(ev_args[0])
             elif ev_type == "start":
                 # ok, a child inside the child was found, we look at our policy
                 # to see what to do
@@ -952,13 +1110,18 @@ class ChildText(_TypedPropBase):
                 # end of our element, return
                 break
 
-        joined = "".join(parts)
-        try:
-            parsed = self.type_.parse(joined)
-        except (ValueError, TypeError):
-            if self.erroneous_as_absent:
+        if parser is not None:
+            parsed = self._parse_incremental(parser)
+            if parsed is self.NO_DEFAULT:
                 return
-            raise
+        else:
+            joined = "".join(parts)
+            try:
+                parsed = self.type_.parse(joined)
+            except (ValueError, TypeError):
+                if self.erroneous_as_absent:
+                    return
+                raise
         self._set_from_recv(instance, parsed)
 
     def to_sax(self, instance, dest):
@@ -978,7 +1141,8 @@ class ChildText(_TypedPropBase):
             dest.startPrefixMapping(self.declare_prefix, self.tag[0])
         dest.startElementNS(self.tag, None, {})
         try:
-            dest.characters(self.type_.format(value))
+            for piece in self._iter_format(value):
+                dest.characters(piece)
         finally:
             dest.endElementNS(self.tag, None)
             if self.declare_prefix is not False and self.tag[0]:
@@ -1494,6 +1658,305 @@ def _mark_attributes_incomplete(attrs, obj):
         attr.mark_incomplete(obj)
 
 
+def _unprocessed_attributes(attr_items, attrs, current_key, failed):
+    processed = set()
+    for key in attrs:
+        processed.add(key)
+        if key == current_key:
+            break
+
+    result = [prop for key, prop in attr_items if key not in processed]
+    result.extend(failed)
+    return result
+
+
+def _compile_parse_events(cls):
+    """
+    Build a parser for `cls` which behaves like
+    :meth:`XMLStreamClass.parse_events`, but has all class-level lookups
+    resolved in advance.
+
+    The result must be discarded when the class is modified; see
+    :meth:`XMLStreamClass.compile_parser`.
+    """
+    attr_items = tuple(cls.ATTR_MAP.items())
+    attr_get = cls.ATTR_MAP.get
+    child_get = cls.CHILD_MAP.get
+    drop_unknown_attrs = cls.UNKNOWN_ATTR_POLICY == UnknownAttrPolicy.DROP
+    unknown_child_policy = cls.UNKNOWN_CHILD_POLICY
+    lang_prop = cls.ATTR_MAP.get((namespaces.xml, "lang"))
+    if cls.TEXT_PROPERTY:
+        text_prop = cls.TEXT_PROPERTY.xq_descriptor
+    else:
+        text_prop = None
+    if cls.COLLECTOR_PROPERTY:
+        collector_prop = cls.COLLECTOR_PROPERTY.xq_descriptor
+    else:
+        collector_prop = None
+
+    def parse_events(ev_args, parent_ctx):
+        if lang_prop is not None:
+            # only xml:lang modifies the context, so we only need a copy if
+            # the attribute exists
+            ctx = parent_ctx.__enter__()
+        else:
+            ctx = parent_ctx
+
+        obj = cls.__new__(cls)
+        attrs = ev_args[2]
+        failed = []
+        nmatched = 0
+        for key, value in attrs.items():
+            prop = attr_get(key)
+            if prop is None:
+                if drop_unknown_attrs:
+                    continue
+                raise ValueError(
+                    "unexpected attribute {!r} on {}".format(
+                        key,
+                        tag_to_str((ev_args[0], ev_args[1]))
+                    ))
+            nmatched += 1
+            try:
+                if not prop.from_value(obj, value):
+                    # assignment failed due to recoverable error, treat as
+                    # absent
+                    failed.append(prop)
+            except:
+                prop.mark_incomplete(obj)
+                _mark_attributes_incomplete(
+                    _unprocessed_attributes(attr_items, attrs, key, failed),
+                    obj
+                )
+                logger.debug("while parsing XSO", exc_info=True)
+                # true means suppress
+                if not obj.xso_error_handler(
+                        prop,
+                        value,
+                        sys.exc_info()):
+                    raise
+
+        if nmatched != len(attr_items) or failed:
+            for key, prop in attr_items:
+                if key in attrs:
+                    continue
+                try:
+                    prop.handle_missing(obj, ctx)
+                except:
+                    logger.debug("while parsing XSO", exc_info=True)
+                    # true means suppress
+                    if not obj.xso_error_handler(
+                            prop,
+                            None,
+                            sys.exc_info()):
+                        raise
+
+            for prop in failed:
+                try:
+                    prop.handle_missing(obj, ctx)
+                except:
+                    logger.debug("while parsing XSO", exc_info=True)
+                    # true means suppress
+                    if not obj.xso_error_handler(
+                            prop,
+                            None,
+                            sys.exc_info()):
+                        raise
+
+        if lang_prop is not None:
+            lang = lang_prop.__get__(obj, cls)
+            if lang is not None:
+                ctx.lang = lang
+
+        collected_text = []
+        text_parser = None
+        while True:
+            ev_type, *ev_args = yield
+            if ev_type == "end":
+                break
+            elif ev_type == "text":
+                if text_prop is None:
+                    if ev_args[0].strip():
+                        # true means suppress
+                        if not obj.xso_error_handler(
+                                None,
+                                ev_args[0],
+                                None):
+                            raise ValueError("unexpected text")
+                else:
+                    if text_parser is None and not collected_text:
+                        text_parser = text_prop._make_incremental_parser()
+                    if text_parser is not None:
+                        text_parser.feed(ev_args[0])
+                    else:
+                        collected_text.append(ev_args[0])
+            elif ev_type == "start":
+                handler = child_get((ev_args[0], ev_args[1]))
+                if handler is None:
+                    if collector_prop is not None:
+                        handler = collector_prop
+                    else:
+                        yield from enforce_unknown_child_policy(
+                            unknown_child_policy,
+                            ev_args,
+                            obj.xso_error_handler)
+                        continue
+                try:
+                    yield from guard(
+                        handler.from_events(obj, ev_args, ctx),
+                        ev_args
+                    )
+                except:
+                    logger.debug("while parsing XSO", exc_info=True)
+                    # true means suppress
+                    if not obj.xso_error_handler(
+                            handler,
+                            ev_args,
+                            sys.exc_info()):
+                        raise
+
+        if text_parser is not None:
+            try:
+                text_prop.from_incremental_parser(obj, text_parser)
+            except:
+                logger.debug("while parsing XSO", exc_info=True)
+                # true means suppress
+                if not obj.xso_error_handler(
+                        text_prop,
+                        None,
+                        sys.exc_info()):
+                    raise
+        elif collected_text:
+            collected_text = "".join(collected_text)
+            try:
+                text_prop.from_value(obj, collected_text)
+            except:
+                logger.debug("while parsing XSO", exc_info=True)
+                # true means suppress
+                if not obj.xso_error_handler(
+                        text_prop,
+                        collected_text,
+                        sys.exc_info()):
+                    raise
+
+        obj.validate()
+
+        obj.xso_after_load()
+
+        return obj
+
+    return parse_events
+
+
+class _CompactContents(collections.abc.MutableMapping):
+    """
+    Mapping from descriptors to values which stores the values in slots.
+
+    Subclasses are created by :func:`_make_compact_contents_type` for each
+    :class:`XSO` class with :attr:`~.XSO.COMPACT_STORAGE`. Values for
+    descriptors which are not known to the subclass (for example because they
+    were added to the class after the subclass was created) are stored in a
+    dictionary which is only created when needed.
+    """
+
+    __slots__ = ("_extra",)
+
+    #: Maps the descriptors to the member descriptors of their slot.
+    _slot_of = {}
+
+    def _get_extra(self):
+        try:
+            return self._extra
+        except AttributeError:
+            self._extra = {}
+            return self._extra
+
+    def __getitem__(self, key):
+        try:
+            slot = self._slot_of[key]
+        except KeyError:
+            return self._get_extra()[key]
+        try:
+            return slot.__get__(self)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            slot = self._slot_of[key]
+        except KeyError:
+            self._get_extra()[key] = value
+            return
+        slot.__set__(self, value)
+
+    def __delitem__(self, key):
+        try:
+            slot = self._slot_of[key]
+        except KeyError:
+            del self._get_extra()[key]
+            return
+        try:
+            slot.__delete__(self)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for key, slot in self._slot_of.items():
+            try:
+                slot.__get__(self)
+            except AttributeError:
+                continue
+            yield key
+        try:
+            extra = self._extra
+        except AttributeError:
+            return
+        yield from extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__qualname__, dict(self.items()))
+
+
+def _make_compact_contents_type(cls):
+    descriptors = list(cls.ATTR_MAP.values())
+    descriptors.extend(cls.CHILD_PROPS)
+    if cls.TEXT_PROPERTY is not None:
+        descriptors.append(cls.TEXT_PROPERTY.xq_descriptor)
+    if cls.COLLECTOR_PROPERTY is not None:
+        descriptors.append(cls.COLLECTOR_PROPERTY.xq_descriptor)
+
+    slot_names = tuple("_v{}".format(i) for i in range(len(descriptors)))
+    result = type(
+        "{}.Contents".format(cls.__name__),
+        (_CompactContents,),
+        {
+            "__slots__": slot_names,
+            "__qualname__": "{}.Contents".format(cls.__qualname__),
+        }
+    )
+    result._slot_of = {
+        descriptor: result.__dict__[slot_name]
+        for descriptor, slot_name in zip(descriptors, slot_names)
+    }
+    return result
+
+
 class XMLStreamClass(xso_query.Class, abc.ABCMeta):
     """
     This metaclass is used to implement the fancy features of :class:`.XSO`
@@ -1805,6 +2268,7 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
             super().__setattr__("COLLECTOR_PROPERTY", value)
 
         super().__setattr__(name, value)
+        cls._invalidate_caches()
 
     def __delattr__(cls, name):
         try:
@@ -1816,6 +2280,7 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
                 raise AttributeError("cannot unbind XSO descriptors")
 
         super().__delattr__(name)
+        cls._invalidate_caches()
 
     def __prepare__(name, bases, **kwargs):
         return collections.OrderedDict()
@@ -1836,8 +2301,77 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
            While this method creates an instance of the class, ``__init__`` is
            not called. See the documentation of :meth:`.xso.XSO` for details.
 
+        If :attr:`COMPILED_PARSER` is true on the class, the parser
+        specialised for this class by :meth:`compile_parser` is used instead
+        of the generic implementation. The observable behaviour is the same.
+
         This method is suspendable.
+
+        .. versionchanged:: 0.10
+
+           Support for :attr:`COMPILED_PARSER` was added.
+        """
+        if getattr(cls, "COMPILED_PARSER", False):
+            return cls.compile_parser()(ev_args, parent_ctx)
+        return cls._parse_events_generic(ev_args, parent_ctx)
+
+    def compile_parser(cls):
+        """
+        Return a suspendable function specialised for parsing elements of this
+        class.
+
+        The function takes the same arguments as :meth:`parse_events` and has
+        the same semantics. It is built from the descriptors of the class on
+        first use and cached on the class; modifying the class (by adding
+        descriptors, changing policies or using :meth:`register_child`)
+        discards the cached function of the class and all of its subclasses.
+
+        Compared to the generic implementation, the specialised parser does
+        not copy :attr:`ATTR_MAP` for each element, resolves the policies,
+        the text, collector and ``xml:lang`` descriptors only once and only
+        copies the parsing context if the class has an ``xml:lang``
+        attribute which may modify it.
+
+        .. versionadded:: 0.10
         """
+        try:
+            return cls.__dict__["_xso_compiled_parser"]
+        except KeyError:
+            pass
+        parser = _compile_parse_events(cls)
+        super().__setattr__("_xso_compiled_parser", parser)
+        return parser
+
+    def compact_contents_type(cls):
+        """
+        Return the type used to store the descriptor values of instances of
+        this class if :attr:`~.XSO.COMPACT_STORAGE` is true.
+
+        The type is created from the descriptors of the class on first use and
+        cached on the class; like with :meth:`compile_parser`, modifying the
+        class discards the cached type. Existing instances keep their storage.
+
+        .. versionadded:: 0.10
+        """
+        try:
+            return cls.__dict__["_xso_compact_contents_type"]
+        except KeyError:
+            pass
+        type_ = _make_compact_contents_type(cls)
+        super().__setattr__("_xso_compact_contents_type", type_)
+        return type_
+
+    def _invalidate_caches(cls):
+        pending = [cls]
+        while pending:
+            current = pending.pop()
+            for name in ("_xso_compiled_parser",
+                         "_xso_compact_contents_type"):
+                if name in current.__dict__:
+                    type.__delattr__(current, name)
+            pending.extend(current.__subclasses__())
+
+    def _parse_events_generic(cls, ev_args, parent_ctx):
         with parent_ctx as ctx:
             obj = cls.__new__(cls)
             attrs = ev_args[2]
@@ -1892,6 +2426,7 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
                     ctx.lang = lang
 
             collected_text = []
+            text_parser = None
             while True:
                 ev_type, *ev_args = yield
                 if ev_type == "end":
@@ -1906,7 +2441,13 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
                                     None):
                                 raise ValueError("unexpected text")
                     else:
-                        collected_text.append(ev_args[0])
+                        if text_parser is None and not collected_text:
+                            text_parser = cls.TEXT_PROPERTY.xq_descriptor.\
+                                _make_incremental_parser()
+                        if text_parser is not None:
+                            text_parser.feed(ev_args[0])
+                        else:
+                            collected_text.append(ev_args[0])
                 elif ev_type == "start":
                     try:
                         handler = cls.CHILD_MAP[ev_args[0], ev_args[1]]
@@ -1933,7 +2474,21 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
                                 sys.exc_info()):
                             raise
 
-            if collected_text:
+            if text_parser is not None:
+                try:
+                    cls.TEXT_PROPERTY.xq_descriptor.from_incremental_parser(
+                        obj,
+                        text_parser
+                    )
+                except:
+                    logger.debug("while parsing XSO", exc_info=True)
+                    # true means suppress
+                    if not obj.xso_error_handler(
+                            cls.TEXT_PROPERTY.xq_descriptor,
+                            None,
+                            sys.exc_info()):
+                        raise
+            elif collected_text:
                 collected_text = "".join(collected_text)
                 try:
                     cls.TEXT_PROPERTY.xq_descriptor.from_value(
@@ -2000,6 +2555,7 @@ class XMLStreamClass(xso_query.Class, abc.ABCMeta):
 
         prop.xq_descriptor._register(child_cls)
         cls.CHILD_MAP[child_cls.TAG] = prop.xq_descriptor
+        cls._invalidate_caches()
 
 
 # I know it makes only partially sense to have a separate metasubclass for
@@ -2122,6 +2678,34 @@ class XSO(metaclass=XMLStreamClass):
        behaviour if an attribute is encountered for which no matching
        descriptor is found.
 
+    The parser implementation can be selected per class:
+
+    .. attribute:: COMPILED_PARSER = False
+
+       If true, :meth:`parse_events` uses a parser which is specialised for
+       the class (see :meth:`~.xso.model.XMLStreamClass.compile_parser`)
+       instead of the generic implementation. The semantics are identical,
+       but the per-element overhead is lower. The attribute is inherited, so
+       setting it on a common base class enables the specialised parser for
+       all derived classes.
+
+       .. versionadded:: 0.10
+
+    .. attribute:: COMPACT_STORAGE = False
+
+       If true, the values of the descriptors of an instance are stored in an
+       object with one slot per descriptor (see
+       :meth:`~.xso.model.XMLStreamClass.compact_contents_type`) instead of a
+       dictionary. This reduces the memory used per instance considerably,
+       which matters if many instances are kept around, at the cost of slightly
+       slower attribute access. Like :attr:`COMPILED_PARSER`, the attribute is
+       inherited.
+
+       Copying, validation and the handling of incomplete values are not
+       affected.
+
+       .. versionadded:: 0.10
+
     Example::
 
         class Body(aioxmpp.xso.XSO):
@@ -2156,6 +2740,10 @@ class XSO(metaclass=XMLStreamClass):
 
     .. automethod:: register_child(prop, child_cls)
 
+    .. automethod:: compile_parser()
+
+    .. automethod:: compact_contents_type()
+
     To customize behaviour of deserialization, these methods are provided which
     can be re-implemented by subclasses:
 
@@ -2166,6 +2754,8 @@ class XSO(metaclass=XMLStreamClass):
     """
     UNKNOWN_CHILD_POLICY = UnknownChildPolicy.DROP
     UNKNOWN_ATTR_POLICY = UnknownAttrPolicy.DROP
+    COMPILED_PARSER = False
+    COMPACT_STORAGE = False
 
     __slots__ = ("_xso_contents", "__weakref__")
 
@@ -2173,7 +2763,10 @@ class XSO(metaclass=XMLStreamClass):
         # XXX: is it always correct to omit the arguments here?
         # the semantics of the __new__ arguments are odd to say the least
         result = super().__new__(cls)
-        result._xso_contents = dict()
+        if cls.COMPACT_STORAGE:
+            result._xso_contents = cls.compact_contents_type()()
+        else:
+            result._xso_contents = dict()
         return result
 
     def __init__(self, *args, **kwargs):
@@ -2186,10 +2779,9 @@ class XSO(metaclass=XMLStreamClass):
 
     def __deepcopy__(self, memo):
         result = type(self).__new__(type(self))
-        result._xso_contents = {
-            k: copy.deepcopy(v, memo)
-            for k, v in self._xso_contents.items()
-        }
+        contents = result._xso_contents
+        for k, v in self._xso_contents.items():
+            contents[k] = copy.deepcopy(v, memo)
         return result
 
     def validate(self):
@@ -2344,6 +2936,8 @@ class SAXDriver(xml.sax.handler.ContentHandler):
     When you are done with a :class:`SAXDriver`, you should call :meth:`close`
     to clean up internal parser state.
 
+    .. automethod:: send_events
+
     .. automethod:: close
     """
 
@@ -2379,6 +2973,19 @@ class SAXDriver(xml.sax.handler.ContentHandler):
     def endElementNS(self, name, qname):
         self._send(("end",))
 
+    def send_events(self, events):
+        """
+        Send an iterable of `events` in the internal event format (as
+        produced for example by :func:`capture_events`) to the destination.
+
+        This is equivalent to calling the SAX methods for each of the events,
+        but avoids the conversion.
+
+        .. versionadded:: 0.10
+        """
+        for ev in events:
+            self._send(ev)
+
     def close(self):
         """
         Clean up all internal state.
@@ -102,6 +102,10 @@ class AbstractCDataType(metaclass=abc.ABCMeta):
     .. automethod:: parse
 
     .. automethod:: format
+
+    .. automethod:: incremental_parser
+
+    .. automethod:: iter_format
     """
 
     def coerce(self, v):
@@ -153,6 +157,41 @@ class AbstractCDataType(metaclass=abc.ABCMeta):
         """
         return str(v)
 
+    def incremental_parser(self):
+        """
+        Return an object which parses character data piece by piece, or
+        :data:`None` if the type does not support this.
+
+        The returned object must have a ``feed(v)`` method which accepts the
+        pieces of character data in order and a ``close()`` method which
+        returns the same value (or raises the same exception) as :meth:`parse`
+        would for the concatenation of all pieces. :class:`Text` and
+        :class:`ChildText` use it to avoid joining large character data
+        before parsing it.
+
+        The default implementation returns :data:`None`.
+
+        .. versionadded:: 0.10
+        """
+        return None
+
+    def iter_format(self, v):
+        """
+        Convert the value `v` like :meth:`format`, but return an iterable of
+        :class:`str` pieces whose concatenation is the result of
+        :meth:`format`.
+
+        :class:`Text` and :class:`ChildText` emit the pieces as separate
+        character data events, so that large values do not need to be held
+        in memory as a single string.
+
+        The default implementation returns a tuple containing only the result
+        of :meth:`format`.
+
+        .. versionadded:: 0.10
+        """
+        return (self.format(v),)
+
 
 class AbstractElementType(metaclass=abc.ABCMeta):
     """
@@ -507,6 +546,75 @@ class _BinaryType(AbstractCDataType):
         raise TypeError("must be convertible to bytes")
 
 
+class IncrementalBase64Decoder:
+    """
+    Decode base64 character data which is received in arbitrarily split
+    pieces.
+
+    Complete groups of four characters are decoded as soon as they are
+    passed to :meth:`feed`, so that only the decoded bytes need to be held in
+    memory. The result is the same as passing the concatenation of all pieces
+    to :func:`base64.b64decode`.
+
+    .. automethod:: feed
+
+    .. automethod:: close
+
+    .. versionadded:: 0.10
+    """
+
+    _NON_ALPHABET = re.compile(rb"[^A-Za-z0-9+/=]")
+
+    def __init__(self):
+        super().__init__()
+        self._decoded = bytearray()
+        self._pending = b""
+        self._error = None
+
+    def feed(self, data):
+        """
+        Decode the :class:`str` `data`, which follows any data passed
+        previously.
+
+        Characters outside of the base64 alphabet are ignored, like
+        :func:`base64.b64decode` does.
+        """
+        if self._error is not None:
+            return
+        try:
+            data = data.encode("ascii")
+        except UnicodeEncodeError as exc:
+            # defer the error to close(), so that the caller sees it where it
+            # would see the error of a one-shot parse
+            self._error = exc
+            return
+        data = self._pending + self._NON_ALPHABET.sub(b"", data)
+        end = len(data) - len(data) % 4
+        padding = data.find(b"=", 0, end)
+        if padding >= 0:
+            # everything from the first padded group on is left to the
+            # one-shot decoder in close(), which knows how to handle it
+            end = padding - padding % 4
+        self._decoded += binascii.a2b_base64(data[:end])
+        self._pending = data[end:]
+
+    def close(self):
+        """
+        Decode any remaining data and return the result as :class:`bytes`.
+
+        :raises ValueError: if the data contains non-ASCII characters.
+        :raises binascii.Error: if the data is not correctly padded.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._pending:
+            self._decoded += base64.b64decode(self._pending)
+            self._pending = b""
+        result = bytes(self._decoded)
+        self._decoded = bytearray()
+        return result
+
+
 class Base64Binary(_BinaryType):
     """
     Parse the value as base64 and return the :class:`bytes` object obtained
@@ -514,8 +622,16 @@ class Base64Binary(_BinaryType):
 
     If `empty_as_equal` is :data:`True`, an empty value is represented using a
     single equal sign. This is used in the SASL protocol.
+
+    .. automethod:: incremental_parser
+
+    .. automethod:: iter_format
     """
 
+    #: Number of bytes encoded per piece by :meth:`iter_format`; a multiple
+    #: of three, so that the pieces do not contain padding.
+    FORMAT_CHUNK_SIZE = 3 * 16384
+
     def __init__(self, *, empty_as_equal=False):
         super().__init__()
         self._empty_as_equal = empty_as_equal
@@ -523,11 +639,39 @@ class Base64Binary(_BinaryType):
     def parse(self, v):
         return base64.b64decode(v)
 
+    def incremental_parser(self):
+        """
+        Return a fresh :class:`IncrementalBase64Decoder`.
+
+        :class:`~.xso.Text` and :class:`~.xso.ChildText` use this to decode
+        the character data piece by piece as it is received, instead of
+        joining it into one large string first.
+
+        .. versionadded:: 0.10
+        """
+        return IncrementalBase64Decoder()
+
     def format(self, v):
         if self._empty_as_equal and not v:
             return "="
         return base64.b64encode(v).decode("ascii")
 
+    def iter_format(self, v):
+        """
+        Encode `v` in pieces of at most 64 KiB of base64 text each.
+
+        .. versionadded:: 0.10
+        """
+        if not v:
+            yield self.format(v)
+            return
+
+        v = memoryview(v)
+        for i in range(0, len(v), self.FORMAT_CHUNK_SIZE):
+            yield base64.b64encode(
+                v[i:i+self.FORMAT_CHUNK_SIZE]
+            ).decode("ascii")
+
 
 class HexBinary(_BinaryType):
     """
@@ -0,0 +1,133 @@
+########################################################################
+# File name: test_dispatcher.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import random
+import unittest
+
+import aioxmpp
+import aioxmpp.dispatcher
+
+from aioxmpp.benchtest import times, timed, record
+
+
+LOCAL_JID = aioxmpp.JID.fromstr("bot@local.example/bot")
+
+
+class Stanza:
+    def __init__(self, from_, type_):
+        self.from_ = from_
+        self.type_ = type_
+
+
+class Dispatcher(aioxmpp.dispatcher.SimpleStanzaDispatcher):
+    @property
+    def local_jid(self):
+        return LOCAL_JID
+
+
+def _noop(stanza):
+    pass
+
+
+class TestSimpleStanzaDispatcher(unittest.TestCase):
+    KEY = "aioxmpp.dispatcher", "SimpleStanzaDispatcher"
+
+    NHANDLERS = 10000
+    NSTANZAS = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(1)
+        jids = [
+            aioxmpp.JID.fromstr(
+                "room{}@muc.example/nick{}".format(i // 10, i % 10)
+            )
+            for i in range(cls.NHANDLERS)
+        ]
+
+        def stanzas(jids, type_):
+            return [
+                Stanza(rng.choice(jids), type_)
+                for i in range(cls.NSTANZAS)
+            ]
+
+        # handlers for full JIDs
+        cls.full_d = Dispatcher()
+        for jid in jids:
+            cls.full_d.register_callback(
+                aioxmpp.PresenceType.AVAILABLE,
+                jid,
+                _noop,
+            )
+        cls.full_stanzas = stanzas(jids, aioxmpp.PresenceType.AVAILABLE)
+
+        # handlers for bare JIDs with wildcard resource
+        bare_jids = [
+            jid.replace(localpart="{}-{}".format(jid.localpart, jid.resource))
+            for jid in jids
+        ]
+        cls.bare_d = Dispatcher()
+        for jid in bare_jids:
+            cls.bare_d.register_callback(
+                aioxmpp.PresenceType.AVAILABLE,
+                jid.bare(),
+                _noop,
+            )
+        cls.bare_stanzas = stanzas(bare_jids,
+                                   aioxmpp.PresenceType.AVAILABLE)
+
+        # stanzas which only match the full wildcard
+        cls.wildcard_d = Dispatcher()
+        for jid in jids:
+            cls.wildcard_d.register_callback(
+                aioxmpp.PresenceType.AVAILABLE,
+                jid,
+                _noop,
+            )
+        cls.wildcard_d.register_callback(None, None, _noop)
+        cls.wildcard_stanzas = stanzas(
+            [jid.replace(domain="other.example") for jid in jids],
+            aioxmpp.PresenceType.UNAVAILABLE,
+        )
+
+    def _run(self, name, d, stanzas):
+        key = self.KEY + (name,)
+
+        with timed() as t:
+            for stanza in stanzas:
+                d._feed(stanza)
+
+        record(key, t.elapsed, "s")
+
+    @times(100)
+    def test_dispatch_full_jid_10k(self):
+        self._run("dispatch_full_jid_10k",
+                  self.full_d, self.full_stanzas)
+
+    @times(100)
+    def test_dispatch_bare_wildcard_10k(self):
+        self._run("dispatch_bare_wildcard_10k",
+                  self.bare_d, self.bare_stanzas)
+
+    @times(100)
+    def test_dispatch_to_type_wildcard_10k(self):
+        self._run("dispatch_to_type_wildcard_10k",
+                  self.wildcard_d, self.wildcard_stanzas)
@@ -24,6 +24,7 @@ import unittest
 import random
 
 import aioxmpp.xso as xso
+import aioxmpp.structs
 import aioxmpp.xml
 
 from aioxmpp.benchtest import times, timed, record
@@ -138,3 +139,87 @@ class Testwrite_single_xso(unittest.TestCase):
             aioxmpp.xml.write_single_xso(item, self.buf)
         record(key+("sz",), self.buf.tell(), "B")
         record(key+("rate",), self.buf.tell() / t.elapsed, "B/s")
+
+
+class TestXMLStreamWriter(unittest.TestCase):
+    KEY = "aioxmpp.xml", "XMLStreamWriter"
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(1)
+        cls.deep_samples = [
+            DeepRoot()
+            for i in range(10)
+        ]
+        for sample in cls.deep_samples:
+            sample.generate(rng)
+
+    def setUp(self):
+        self.buf = io.BytesIO()
+        self.writer = aioxmpp.xml.XMLStreamWriter(
+            self.buf,
+            aioxmpp.structs.JID.fromstr("example.com"),
+            nsmap={None: "uri:test"},
+        )
+        self.writer.start()
+
+    def tearDown(self):
+        self.writer.abort()
+        del self.writer
+        del self.buf
+
+    def _reset_buffer(self):
+        self.buf.seek(0)
+        self.buf.truncate()
+
+    @times(1000)
+    def test_send_shallow_and_small(self):
+        key = self.KEY + ("send", "shallow+small")
+        items = [ShallowRoot() for i in range(100)]
+        self._reset_buffer()
+        with timed() as t:
+            for item in items:
+                self.writer.send(item)
+        record(key+("sz",), self.buf.tell(), "B")
+        record(key+("rate",), len(items) / t.elapsed, "1/s")
+
+    @times(100, pass_iteration=True)
+    def test_send_deep(self, iteration=None):
+        key = self.KEY + ("send", "deep")
+        item = self.deep_samples[iteration % len(self.deep_samples)]
+        self._reset_buffer()
+        with timed() as t:
+            for i in range(10):
+                self.writer.send(item)
+        record(key+("sz",), self.buf.tell(), "B")
+        record(key+("rate",), self.buf.tell() / t.elapsed, "B/s")
+
+    @times(1000)
+    def test_buffer_overhead(self):
+        key = self.KEY + ("buffer", "overhead")
+        gen = self.writer._writer
+        with timed() as t:
+            for i in range(100):
+                with gen.buffer():
+                    pass
+        record(key+("per_stanza",), t.elapsed / 100, "s")
+
+    @times(1000)
+    def test_send_vs_unbuffered_shallow_and_small(self):
+        key = self.KEY + ("send", "buffer_overhead")
+        items = [ShallowRoot() for i in range(100)]
+        gen = self.writer._writer
+
+        self._reset_buffer()
+        with timed() as unbuffered:
+            for item in items:
+                item.unparse_to_sax(gen)
+
+        self._reset_buffer()
+        with timed() as buffered:
+            for item in items:
+                self.writer.send(item)
+
+        record(key+("per_stanza",),
+               (buffered.elapsed - unbuffered.elapsed) / len(items),
+               "s")
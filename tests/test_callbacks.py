@@ -37,6 +37,7 @@ from aioxmpp.callbacks import (
     SyncAdHocSignal,
     SyncSignal,
     Filter,
+    TimerWheel,
     first_signal,
 )
 
@@ -589,6 +590,142 @@ class TestFutureListener(unittest.TestCase):
         self.assertTrue(tl.error(obj))
 
 
+class TestTimerWheel(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.loop = unittest.mock.Mock()
+        self.loop.time.side_effect = lambda: self.now
+        self.on_expire = unittest.mock.Mock()
+        self.wheel = TimerWheel(
+            self.on_expire,
+            resolution=1.0,
+            loop=self.loop,
+        )
+
+    def _fire(self):
+        (when, cb), _ = self.loop.call_at.call_args
+        self.now = max(self.now, when)
+        cb()
+
+    def test_add_schedules_single_handle(self):
+        self.wheel.add("a", 2.5)
+        self.wheel.add("b", 3)
+
+        self.loop.call_at.assert_called_once_with(103.0, unittest.mock.ANY)
+        self.assertEqual(len(self.wheel), 2)
+        self.assertIn("a", self.wheel)
+
+    def test_expires_timers_not_early(self):
+        self.wheel.add("a", 2.5)
+        self.wheel.add("b", 5)
+
+        self.now = 102.9
+        self.loop.call_at.call_args[0][1]()
+        self.on_expire.assert_not_called()
+
+        self._fire()
+        self.on_expire.assert_called_once_with("a")
+        self.assertNotIn("a", self.wheel)
+        self.assertIn("b", self.wheel)
+
+        self.on_expire.reset_mock()
+        while not self.on_expire.mock_calls:
+            self._fire()
+        self.on_expire.assert_called_once_with("b")
+        self.assertEqual(self.now, 105.0)
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_rearms_at_earliest_pending_tick(self):
+        self.wheel.add("a", 1)
+        self.wheel.add("b", 50)
+
+        self._fire()
+        self.on_expire.assert_called_once_with("a")
+        self.on_expire.reset_mock()
+
+        # no wakeups between the two timers
+        self.loop.call_at.assert_called_with(150.0, unittest.mock.ANY)
+        self._fire()
+        self.on_expire.assert_called_once_with("b")
+        self.assertEqual(len(self.loop.call_at.mock_calls), 2)
+
+    def test_slots_are_created_on_demand(self):
+        self.assertFalse(self.wheel._slots)
+
+        self.wheel.add("a", 1)
+        self.wheel.add("b", 1)
+        self.wheel.add("c", 2)
+        self.assertEqual(len(self.wheel._slots), 2)
+
+        self.wheel.discard("c")
+        self.assertEqual(len(self.wheel._slots), 1)
+
+        self._fire()
+        self.assertFalse(self.wheel._slots)
+        self.assertFalse(self.wheel._heap)
+
+    def test_heap_of_dropped_slots_is_bounded(self):
+        self.wheel.add("x", 1000)
+        for i in range(1000):
+            self.wheel.add(i, i % 100 + 1)
+            self.wheel.discard(i)
+
+        self.assertLessEqual(len(self.wheel._heap), 2 * 1 + 17)
+        self.assertEqual(len(self.wheel), 1)
+
+    def test_late_tick_expires_everything_due(self):
+        for i in range(10):
+            self.wheel.add(i, i + 1)
+
+        self.now = 200.0
+        self.loop.call_at.call_args[0][1]()
+
+        self.assertCountEqual(
+            [call[1][0] for call in self.on_expire.mock_calls],
+            range(10),
+        )
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_add_replaces_timer(self):
+        self.wheel.add("a", 1)
+        self.wheel.add("a", 3)
+        self.assertEqual(len(self.wheel), 1)
+
+        self.now = 101.0
+        self.loop.call_at.call_args[0][1]()
+        self.on_expire.assert_not_called()
+
+        self._fire()
+        self.on_expire.assert_called_once_with("a")
+        self.assertEqual(self.now, 103.0)
+
+    def test_earlier_timer_reschedules_handle(self):
+        self.wheel.add("a", 3)
+        handle = self.loop.call_at.return_value
+        self.wheel.add("b", 1)
+
+        handle.cancel.assert_called_once_with()
+        self.loop.call_at.assert_called_with(101.0, unittest.mock.ANY)
+
+    def test_discard(self):
+        self.wheel.add("a", 1)
+        handle = self.loop.call_at.return_value
+        self.wheel.discard("a")
+        self.wheel.discard("b")
+
+        self.assertEqual(len(self.wheel), 0)
+        handle.cancel.assert_called_once_with()
+
+    def test_clear(self):
+        self.wheel.add("a", 1)
+        self.wheel.add("b", 2)
+        handle = self.loop.call_at.return_value
+        self.wheel.clear()
+
+        self.assertEqual(len(self.wheel), 0)
+        handle.cancel.assert_called_once_with()
+
+
 class TestAdHocSignal(unittest.TestCase):
     def test_STRONG_rejects_non_callable(self):
         signal = AdHocSignal()
@@ -1549,6 +1686,81 @@ class TestFilter(unittest.TestCase):
         )
 
 
+class TestFilterWithKey(unittest.TestCase):
+    def setUp(self):
+        self.key = unittest.mock.Mock()
+        self.key.side_effect = lambda obj: obj[0]
+        self.f = Filter(key=self.key)
+
+    def test_empty_filter_returns_object_without_calling_key(self):
+        self.assertEqual(self.f.filter(("a", 1)), ("a", 1))
+        self.key.assert_not_called()
+
+    def test_key_not_used_without_keyed_registrations(self):
+        func = unittest.mock.Mock()
+        func.return_value = unittest.mock.sentinel.result
+        self.f.register(func, 0)
+
+        self.assertEqual(
+            self.f.filter(("a", 1), unittest.mock.sentinel.arg),
+            unittest.mock.sentinel.result,
+        )
+        func.assert_called_once_with(("a", 1), unittest.mock.sentinel.arg)
+        self.key.assert_not_called()
+
+    def test_keyed_functions_only_called_for_their_keys(self):
+        mock = unittest.mock.Mock()
+        mock.all_.side_effect = lambda obj: obj
+        mock.only_a.side_effect = lambda obj: obj
+        mock.only_b.side_effect = lambda obj: obj
+
+        self.f.register(mock.all_, 0)
+        self.f.register(mock.only_a, 1, keys={"a"})
+        self.f.register(mock.only_b, -1, keys=["b", "c"])
+
+        self.f.filter(("a", 1))
+        self.f.filter(("b", 2))
+        self.f.filter(("d", 3))
+
+        self.assertSequenceEqual(
+            mock.mock_calls,
+            [
+                unittest.mock.call.all_(("a", 1)),
+                unittest.mock.call.only_a(("a", 1)),
+                unittest.mock.call.only_b(("b", 2)),
+                unittest.mock.call.all_(("b", 2)),
+                unittest.mock.call.all_(("d", 3)),
+            ]
+        )
+
+    def test_unregister_recompiles_chains(self):
+        func = unittest.mock.Mock()
+        func.return_value = None
+
+        token = self.f.register(func, 0, keys={"a"})
+        self.assertIsNone(self.f.filter(("a", 1)))
+
+        self.f.unregister(token)
+        self.assertEqual(self.f.filter(("a", 1)), ("a", 1))
+        func.assert_called_once_with(("a", 1))
+
+    def test_context_register_passes_keys(self):
+        func = unittest.mock.Mock()
+        func.return_value = None
+
+        with self.f.context_register(func, 0, keys={"a"}):
+            self.assertEqual(self.f.filter(("b", 1)), ("b", 1))
+            self.assertIsNone(self.f.filter(("a", 1)))
+
+        self.assertEqual(self.f.filter(("a", 1)), ("a", 1))
+        func.assert_called_once_with(("a", 1))
+
+    def test_keys_require_key_function(self):
+        f = Filter()
+        with self.assertRaisesRegex(ValueError, "no key function"):
+            f.register(unittest.mock.Mock(), 0, keys={"a"})
+
+
 class Testfirst_signal(unittest.TestCase):
     def test_connects_future_to_both_and_returns_future(self):
         s1 = unittest.mock.Mock()
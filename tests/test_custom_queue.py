@@ -175,6 +175,183 @@ class TestAsyncDeque(unittest.TestCase):
         with self.assertRaises(asyncio.QueueEmpty):
             self.q.get_nowait()
 
+    def test_put_nowait_sets_wakeup(self):
+        wakeup = asyncio.Event(loop=self.loop)
+        q = custom_queue.AsyncDeque(loop=self.loop, wakeup=wakeup)
+        q.put_nowait(1)
+        self.assertTrue(wakeup.is_set())
+
+    def test_putleft_nowait_sets_wakeup(self):
+        wakeup = asyncio.Event(loop=self.loop)
+        q = custom_queue.AsyncDeque(loop=self.loop, wakeup=wakeup)
+        q.putleft_nowait(1)
+        self.assertTrue(wakeup.is_set())
+
+    def test_get_does_not_clear_wakeup(self):
+        wakeup = asyncio.Event(loop=self.loop)
+        q = custom_queue.AsyncDeque(loop=self.loop, wakeup=wakeup)
+        q.put_nowait(1)
+        q.get_nowait()
+        self.assertTrue(wakeup.is_set())
+
+    def test_wakeup_shared_between_queues(self):
+        wakeup = asyncio.Event(loop=self.loop)
+        q1 = custom_queue.AsyncDeque(loop=self.loop, wakeup=wakeup)
+        q2 = custom_queue.AsyncDeque(loop=self.loop, wakeup=wakeup)
+
+        task = asyncio.async(wakeup.wait(), loop=self.loop)
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(task.done())
+
+        q2.put_nowait(1)
+        run_coroutine(task)
+        self.assertTrue(q1.empty())
+        self.assertFalse(q2.empty())
+
+    def tearDown(self):
+        del self.q
+        del self.loop
+
+
+class TestWeightedFairQueue(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.get_event_loop()
+        self.q = custom_queue.WeightedFairQueue(
+            [("a", 2), ("b", 1)],
+            key=lambda item: item[0],
+            loop=self.loop,
+        )
+
+    def _drain(self):
+        result = []
+        while not self.q.empty():
+            result.append(self.q.get_nowait())
+        return result
+
+    def test_rejects_non_positive_weights(self):
+        with self.assertRaisesRegex(ValueError, "must be positive"):
+            custom_queue.WeightedFairQueue(
+                [("a", 1), ("b", 0)],
+                key=lambda item: item[0],
+            )
+
+    def test_items(self):
+        self.q.put_nowait(("b", 1))
+        self.q.put_nowait(("a", 2))
+        self.q.put_nowait(("b", 3))
+
+        self.assertSequenceEqual(
+            self.q.items(),
+            [("a", 2), ("b", 1), ("b", 3)],
+        )
+        self.assertEqual(len(self._drain()), 3)
+
+    def test_fifo_within_lane(self):
+        self.q.put_nowait(("b", 1))
+        self.q.put_nowait(("b", 2))
+        self.q.put_nowait(("b", 3))
+
+        self.assertSequenceEqual(
+            self._drain(),
+            [("b", 1), ("b", 2), ("b", 3)],
+        )
+
+    def test_weighted_round_robin(self):
+        for i in range(5):
+            self.q.put_nowait(("b", i))
+        for i in range(5):
+            self.q.put_nowait(("a", i))
+
+        self.assertSequenceEqual(
+            self._drain(),
+            [
+                ("a", 0), ("a", 1), ("b", 0),
+                ("a", 2), ("a", 3), ("b", 1),
+                ("a", 4), ("b", 2),
+                ("b", 3),
+                ("b", 4),
+            ]
+        )
+
+    def test_new_round_after_running_dry(self):
+        self.q.put_nowait(("a", 0))
+        self.q.put_nowait(("a", 1))
+        self.q.put_nowait(("b", 0))
+        self.assertSequenceEqual(
+            self._drain(),
+            [("a", 0), ("a", 1), ("b", 0)],
+        )
+
+        self.q.put_nowait(("b", 1))
+        self.q.put_nowait(("a", 2))
+        self.assertSequenceEqual(
+            self._drain(),
+            [("a", 2), ("b", 1)],
+        )
+
+    def test_putleft_nowait_puts_at_front_of_lane(self):
+        self.q.put_nowait(("a", 1))
+        self.q.put_nowait(("b", 1))
+        self.q.putleft_nowait(("b", 0))
+
+        self.assertSequenceEqual(
+            self._drain(),
+            [("a", 1), ("b", 0), ("b", 1)],
+        )
+
+    def test_len_and_lane_depths(self):
+        self.assertEqual(len(self.q), 0)
+        self.assertDictEqual(self.q.lane_depths(), {"a": 0, "b": 0})
+
+        self.q.put_nowait(("a", 1))
+        self.q.put_nowait(("b", 1))
+        self.q.put_nowait(("b", 2))
+
+        self.assertEqual(len(self.q), 3)
+        self.assertDictEqual(self.q.lane_depths(), {"a": 1, "b": 2})
+
+    def test_contains(self):
+        self.q.put_nowait(("a", 1))
+        self.assertIn(("a", 1), self.q)
+        self.assertNotIn(("b", 1), self.q)
+
+    def test_empty(self):
+        self.assertTrue(self.q.empty())
+        self.q.put_nowait(("a", 1))
+        self.assertFalse(self.q.empty())
+        self.q.get_nowait()
+        self.assertTrue(self.q.empty())
+
+    def test_raise_asyncio_QueueEmpty_on_empty_get(self):
+        with self.assertRaises(asyncio.QueueEmpty):
+            self.q.get_nowait()
+
+    def test_get(self):
+        task = asyncio.async(self.q.get(), loop=self.loop)
+        run_coroutine(asyncio.sleep(0))
+        self.assertFalse(task.done())
+
+        self.q.put_nowait(("b", 1))
+        self.assertEqual(run_coroutine(task), ("b", 1))
+
+    def test_clear(self):
+        self.q.put_nowait(("a", 1))
+        self.q.put_nowait(("b", 1))
+        self.q.clear()
+        self.assertTrue(self.q.empty())
+        self.assertEqual(len(self.q), 0)
+
+    def test_put_nowait_sets_wakeup(self):
+        wakeup = asyncio.Event(loop=self.loop)
+        q = custom_queue.WeightedFairQueue(
+            [("a", 1)],
+            key=lambda item: item[0],
+            loop=self.loop,
+            wakeup=wakeup,
+        )
+        q.put_nowait(("a", 1))
+        self.assertTrue(wakeup.is_set())
+
     def tearDown(self):
         del self.q
         del self.loop
@@ -399,6 +399,67 @@ class TestSimpleStanzaDispatcher(unittest.TestCase):
             ]
         )
 
+    def test_dispatch_returns_whether_stanza_was_dispatched(self):
+        stanza = FooStanza(TEST_JID, unittest.mock.sentinel.type_)
+        self.assertTrue(self.d._feed(stanza))
+
+        self.d.unregister_callback(None, None)
+        stanza = FooStanza(TEST_JID.replace(localpart="fnord"),
+                           unittest.mock.sentinel.othertype)
+        self.assertFalse(self.d._feed(stanza))
+
+    def test_dispatch_does_not_compute_bare_jid(self):
+        stanza = FooStanza(TEST_JID, unittest.mock.sentinel.type_)
+        with unittest.mock.patch.object(aioxmpp.JID, "bare") as bare:
+            self.d._feed(stanza)
+        bare.assert_not_called()
+
+    def test_dispatch_other_resource_to_bare_wildcard(self):
+        stanza = FooStanza(TEST_JID.replace(resource="other"),
+                           unittest.mock.sentinel.type_)
+        self.d._feed(stanza)
+        self.assertCountEqual(
+            self.handlers.mock_calls,
+            [
+                unittest.mock.call.type_barejid_wildcard(stanza),
+            ]
+        )
+
+    def test_dispatch_after_unregistering_everything(self):
+        for type_ in [unittest.mock.sentinel.type_, None]:
+            self.d.unregister_callback(type_, TEST_JID)
+            self.d.unregister_callback(type_, TEST_JID.bare(),
+                                       wildcard_resource=False)
+            self.d.unregister_callback(type_, TEST_JID.bare())
+            self.d.unregister_callback(type_, None)
+
+        self.assertFalse(self.d._feed(
+            FooStanza(TEST_JID, unittest.mock.sentinel.type_)
+        ))
+        self.assertFalse(self.d._feed(
+            FooStanza(TEST_JID.bare(), None)
+        ))
+        self.assertSequenceEqual(self.handlers.mock_calls, [])
+
+    def test_dispatch_with_many_registrations(self):
+        handlers = unittest.mock.Mock()
+        for i in range(100):
+            self.d.register_callback(
+                unittest.mock.sentinel.type_,
+                TEST_JID.replace(localpart="user{}".format(i)),
+                getattr(handlers, "h{}".format(i)),
+            )
+
+        stanza = FooStanza(TEST_JID.replace(localpart="user42"),
+                           unittest.mock.sentinel.type_)
+        self.d._feed(stanza)
+        self.assertSequenceEqual(
+            handlers.mock_calls,
+            [
+                unittest.mock.call.h42(stanza),
+            ]
+        )
+
     def test_does_not_connect_to_on_message_received(self):
         self.assertFalse(
             aioxmpp.service.is_depsignal_handler(
@@ -45,6 +45,7 @@ import aioxmpp.stanza as stanza
 import aioxmpp.rfc3921 as rfc3921
 import aioxmpp.rfc6120 as rfc6120
 import aioxmpp.service as service
+import aioxmpp.stream as stream
 
 from aioxmpp.utils import namespaces
 
@@ -1920,13 +1921,43 @@ class TestClient(xmltestutils.XMLTestCase):
             stream_send.assert_called_once_with(
                 unittest.mock.sentinel.stanza,
                 timeout=unittest.mock.sentinel.timeout,
-                cb=unittest.mock.sentinel.cb
+                cb=unittest.mock.sentinel.cb,
+                priority=aioxmpp.stream.StanzaPriority.INTERACTIVE,
             )
 
         # ensure that the "main task" we faked above gets cancelled before the
         # tearDown runs (which would otherwise try to shut down the stream)
         run_coroutine(asyncio.sleep(0))
 
+    def test_send_forwards_priority(self):
+        with contextlib.ExitStack() as stack:
+            # client needs to be running; fake it here (to avoid interference)
+            self.client._main_task = asyncio.ensure_future(asyncio.sleep(1))
+            stack.callback(self.client._main_task.cancel)
+
+            stream_send = stack.enter_context(unittest.mock.patch.object(
+                self.client.stream,
+                "_send_immediately",
+                new=CoroutineMock()
+            ))
+            stream_send.return_value = unittest.mock.sentinel.result
+
+            self.client.established_event.set()
+
+            result = run_coroutine(
+                self.client.send(unittest.mock.sentinel.stanza,
+                                 priority=aioxmpp.stream.StanzaPriority.BULK)
+            )
+            self.assertEqual(result, unittest.mock.sentinel.result)
+            stream_send.assert_called_once_with(
+                unittest.mock.sentinel.stanza,
+                timeout=None,
+                cb=None,
+                priority=aioxmpp.stream.StanzaPriority.BULK,
+            )
+
+        run_coroutine(asyncio.sleep(0))
+
     def test_start(self):
         self.assertFalse(self.client.established)
         run_coroutine(asyncio.sleep(0))
@@ -2914,6 +2945,156 @@ class TestClient(xmltestutils.XMLTestCase):
             XMLStreamMock.Close()
         ]))
 
+    def test_suspend_saves_sm_state_to_store(self):
+        self.features[...] = nonza.StreamManagementFeature()
+
+        store = unittest.mock.Mock()
+        store.load.return_value = None
+        self.client.sm_state_store = store
+        self.client.start()
+
+        run_coroutine(self.xmlstream.run_test(
+            self.resource_binding + self.sm_negotiation_exchange
+        ))
+
+        self.client.suspend()
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Abort(),
+        ]))
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertFalse(self.client.running)
+        self.assertTrue(self.client.stream.sm_enabled)
+
+        store.save.assert_called_once_with(self.test_jid, unittest.mock.ANY)
+        _, (_, state), _ = store.save.mock_calls[0]
+        self.assertEqual(state.id_, "foobar")
+        self.assertEqual(state.outbound_base, 0)
+        self.assertEqual(state.inbound_ctr, 0)
+
+    def test_suspend_without_store_does_not_close_stream(self):
+        self.features[...] = nonza.StreamManagementFeature()
+
+        self.client.start()
+
+        run_coroutine(self.xmlstream.run_test(
+            self.resource_binding + self.sm_negotiation_exchange
+        ))
+
+        self.client.suspend()
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Abort(),
+        ]))
+
+        self.assertFalse(self.client.running)
+        self.assertTrue(self.client.stream.sm_enabled)
+
+    def test_start_resumes_from_sm_state_store(self):
+        self.features[...] = nonza.StreamManagementFeature()
+
+        other_jid = structs.JID.fromstr("foo@bar.example/other")
+        message = stanza.Message(
+            type_=structs.MessageType.CHAT,
+            to=structs.JID.fromstr("fnord@bar.example"),
+        )
+        state = stream.SMState(
+            id_="foobar",
+            location=None,
+            max_=None,
+            outbound_base=2,
+            inbound_ctr=3,
+            unacked_stanzas=[message],
+            queued_stanzas=[],
+        )
+
+        store = unittest.mock.Mock()
+        store.load.return_value = other_jid, state
+        self.client.sm_state_store = store
+        self.client.start()
+
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(
+                nonza.SMResume(counter=3, previd="foobar"),
+                response=[
+                    XMLStreamMock.Receive(
+                        nonza.SMResumed(counter=2, previd="foobar")
+                    )
+                ]
+            ),
+            XMLStreamMock.Send(message),
+            XMLStreamMock.Send(nonza.SMRequest()),
+        ]))
+        run_coroutine(asyncio.sleep(0))
+
+        store.load.assert_called_once_with()
+        store.clear.assert_called_once_with()
+
+        self.assertEqual(self.client.local_jid, other_jid)
+        self.assertTrue(self.client.established)
+        self.established_rec.assert_called_once_with()
+
+        self.client.stop()
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(
+                nonza.SMAcknowledgement(counter=3)
+            ),
+            XMLStreamMock.Close()
+        ]))
+
+    def test_start_discards_sm_state_of_other_account(self):
+        state = stream.SMState(
+            id_="foobar",
+            location=None,
+            max_=None,
+            outbound_base=2,
+            inbound_ctr=3,
+            unacked_stanzas=[],
+            queued_stanzas=[],
+        )
+
+        store = unittest.mock.Mock()
+        store.load.return_value = (
+            structs.JID.fromstr("other@bar.example/baz"),
+            state,
+        )
+        self.client.sm_state_store = store
+        self.client.start()
+
+        run_coroutine(self.xmlstream.run_test(self.resource_binding))
+        run_coroutine(asyncio.sleep(0))
+
+        store.clear.assert_called_once_with()
+        self.assertEqual(self.client.local_jid, self.test_jid)
+        self.assertTrue(self.client.established)
+        self.assertFalse(self.client.stream.sm_enabled)
+
+    def test_restore_sm_state_clears_store_if_sm_enabled(self):
+        store = unittest.mock.Mock()
+        self.client.sm_state_store = store
+
+        with unittest.mock.patch.object(
+                type(self.client.stream),
+                "sm_enabled",
+                new_callable=unittest.mock.PropertyMock) as sm_enabled:
+            sm_enabled.return_value = True
+            self.client._restore_sm_state()
+
+        store.load.assert_not_called()
+        store.clear.assert_called_once_with()
+
+    def test_start_discards_broken_sm_state(self):
+        store = unittest.mock.Mock()
+        store.load.side_effect = ValueError()
+        self.client.sm_state_store = store
+        self.client.start()
+
+        run_coroutine(self.xmlstream.run_test(self.resource_binding))
+        run_coroutine(asyncio.sleep(0))
+
+        store.clear.assert_called_once_with()
+        self.assertTrue(self.client.established)
+        self.assertFalse(self.client.stream.sm_enabled)
+
     def test_stop_stream_management_if_remote_stops_providing_support(self):
         self.features[...] = nonza.StreamManagementFeature()
 
@@ -4141,6 +4322,167 @@ class TestPresenceManagedClient(xmltestutils.XMLTestCase):
         ]))
 
 
+class TestSendMany(unittest.TestCase):
+    def setUp(self):
+        self.futures = {}
+        self.sent = []
+        self.client = unittest.mock.Mock(["send"])
+        self.client.send.side_effect = self._send
+
+    @asyncio.coroutine
+    def _send(self, stanza, **kwargs):
+        self.sent.append((stanza, kwargs))
+        fut = asyncio.Future()
+        self.futures[stanza] = fut
+        return (yield from fut)
+
+    def _collect(self, it, n):
+        @asyncio.coroutine
+        def collect():
+            result = []
+            for i in range(n):
+                result.append((yield from it.__anext__()))
+            return result
+        return run_coroutine(collect())
+
+    def test_client_send_many_creates_iterator(self):
+        client = node.Client(
+            structs.JID.fromstr("foo@bar.example/baz"),
+            object(),
+        )
+        it = client.send_many([], max_in_flight=3, timeout=10)
+        self.assertIsInstance(it, node.SendMany)
+        self.assertIs(it.__aiter__(), it)
+
+    def test_rejects_non_positive_limit(self):
+        with self.assertRaisesRegex(ValueError, "must be positive"):
+            node.SendMany(self.client, [], max_in_flight=0)
+
+    def test_limits_stanzas_in_flight(self):
+        stanzas = [unittest.mock.sentinel.s1,
+                   unittest.mock.sentinel.s2,
+                   unittest.mock.sentinel.s3]
+        it = node.SendMany(
+            self.client,
+            stanzas,
+            max_in_flight=2,
+            timeout=10,
+            priority=stream.StanzaPriority.BULK,
+        )
+
+        task = asyncio.async(it.__anext__())
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(
+            self.sent,
+            [
+                (unittest.mock.sentinel.s1,
+                 {"timeout": 10, "priority": stream.StanzaPriority.BULK}),
+                (unittest.mock.sentinel.s2,
+                 {"timeout": 10, "priority": stream.StanzaPriority.BULK}),
+            ]
+        )
+        self.assertEqual(it.in_flight, 2)
+
+        self.futures[unittest.mock.sentinel.s2].set_result("r2")
+        stanza, fut = run_coroutine(task)
+        self.assertIs(stanza, unittest.mock.sentinel.s2)
+        self.assertEqual(fut.result(), "r2")
+
+        run_coroutine(asyncio.sleep(0))
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(it.in_flight, 2)
+
+    def test_yields_in_completion_order_including_errors(self):
+        stanzas = [unittest.mock.sentinel.s1,
+                   unittest.mock.sentinel.s2,
+                   unittest.mock.sentinel.s3]
+        it = node.SendMany(self.client, stanzas)
+
+        task = asyncio.async(it.__anext__())
+        run_coroutine(asyncio.sleep(0))
+        self.assertEqual(len(self.sent), 3)
+
+        exc = errors.XMPPCancelError(
+            (namespaces.stanzas, "item-not-found")
+        )
+        self.futures[unittest.mock.sentinel.s3].set_exception(exc)
+        stanza, fut = run_coroutine(task)
+        self.assertIs(stanza, unittest.mock.sentinel.s3)
+        self.assertIs(fut.exception(), exc)
+
+        self.futures[unittest.mock.sentinel.s1].set_result("r1")
+        self.futures[unittest.mock.sentinel.s2].set_result("r2")
+
+        rest = self._collect(it, 2)
+        self.assertCountEqual(
+            [(stanza, fut.result()) for stanza, fut in rest],
+            [(unittest.mock.sentinel.s1, "r1"),
+             (unittest.mock.sentinel.s2, "r2")],
+        )
+
+        with self.assertRaises(StopAsyncIteration):
+            run_coroutine(it.__anext__())
+
+    def test_consumes_stanzas_lazily(self):
+        def generate():
+            for i in range(10):
+                yield i
+
+        gen = generate()
+        it = node.SendMany(self.client, gen, max_in_flight=1)
+
+        task = asyncio.async(it.__anext__())
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertEqual(next(gen), 1)
+        self.futures[0].set_result(None)
+        run_coroutine(task)
+
+    def test_waits_without_rescanning_tasks_in_flight(self):
+        it = node.SendMany(self.client, range(50), max_in_flight=10)
+
+        @asyncio.coroutine
+        def complete():
+            for i in range(50):
+                while i not in self.futures:
+                    yield from asyncio.sleep(0)
+                self.futures[i].set_result(i)
+
+        with unittest.mock.patch("asyncio.wait") as wait:
+            wait.side_effect = AssertionError("asyncio.wait used")
+            completer = asyncio.async(complete())
+            results = self._collect(it, 50)
+            run_coroutine(completer)
+
+        self.assertSequenceEqual(
+            [fut.result() for _, fut in results],
+            list(range(50)),
+        )
+        self.assertEqual(it.in_flight, 0)
+        with self.assertRaises(StopAsyncIteration):
+            run_coroutine(it.__anext__())
+
+    def test_cancel(self):
+        it = node.SendMany(self.client, range(5), max_in_flight=2)
+
+        task = asyncio.async(it.__anext__())
+        run_coroutine(asyncio.sleep(0))
+
+        it.cancel()
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertTrue(all(fut.cancelled()
+                            for fut in self.futures.values()))
+        self.assertEqual(it.in_flight, 0)
+        self.assertEqual(len(self.sent), 2)
+
+        with self.assertRaises(StopAsyncIteration):
+            run_coroutine(task)
+        with self.assertRaises(StopAsyncIteration):
+            run_coroutine(it.__anext__())
+
+
 class TestUseConnected(unittest.TestCase):
     def setUp(self):
         self.presence_server = unittest.mock.Mock()
@@ -4359,3 +4701,253 @@ class TestUseConnected(unittest.TestCase):
                 self.cm.presence,
                 aioxmpp.PresenceState(True)
             )
+
+
+class FakePoolClient:
+    on_stream_established = aioxmpp.callbacks.Signal()
+    on_failure = aioxmpp.callbacks.Signal()
+    on_stopped = aioxmpp.callbacks.Signal()
+
+    def __init__(self):
+        self.running = False
+        self.summon = unittest.mock.Mock()
+        self.stop = unittest.mock.Mock()
+        self._services = {}
+
+    def start(self):
+        self.running = True
+
+
+class TestClientPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = node.ClientPool()
+        self.clients = [FakePoolClient() for i in range(3)]
+
+    def tearDown(self):
+        self.pool.stop()
+        run_coroutine(asyncio.sleep(0))
+
+    def _run(self):
+        for i in range(3):
+            run_coroutine(asyncio.sleep(0))
+
+    def test_container(self):
+        self.assertEqual(len(self.pool), 0)
+        for client in self.clients:
+            self.pool.add(client)
+        self.assertEqual(len(self.pool), 3)
+        self.assertSequenceEqual(list(self.pool), self.clients)
+        self.assertIn(self.clients[0], self.pool)
+
+        self.pool.remove(self.clients[0])
+        self.assertNotIn(self.clients[0], self.pool)
+
+        with self.assertRaises(KeyError):
+            self.pool.remove(self.clients[0])
+
+    def test_add_rejects_duplicates(self):
+        self.pool.add(self.clients[0])
+        with self.assertRaisesRegex(ValueError, "already in the pool"):
+            self.pool.add(self.clients[0])
+
+    def test_rejects_non_positive_max_connecting(self):
+        with self.assertRaises(ValueError):
+            node.ClientPool(max_connecting=0)
+
+    def test_create_shares_iq_timer_wheel(self):
+        jid = structs.JID.fromstr("foo@bar.example/baz")
+        c1 = self.pool.create(jid, object())
+        c2 = self.pool.create(jid.replace(localpart="bar"), object())
+
+        self.assertIsInstance(c1, node.Client)
+        self.assertSequenceEqual(list(self.pool), [c1, c2])
+        self.assertIs(
+            c1.stream._iq_response_map._timers,
+            c2.stream._iq_response_map._timers,
+        )
+
+    def test_create_uses_client_class(self):
+        jid = structs.JID.fromstr("foo@bar.example/baz")
+        client_class = unittest.mock.Mock()
+        client_class.return_value = self.clients[0]
+
+        result = self.pool.create(
+            jid,
+            unittest.mock.sentinel.security_layer,
+            client_class=client_class,
+            max_initial_attempts=1,
+        )
+
+        self.assertIs(result, self.clients[0])
+        client_class.assert_called_once_with(
+            jid,
+            unittest.mock.sentinel.security_layer,
+            loop=asyncio.get_event_loop(),
+            iq_timers=unittest.mock.ANY,
+            max_initial_attempts=1,
+        )
+        self.assertIn(result, self.pool)
+
+    def test_summon_on_existing_and_added_clients(self):
+        self.pool.add(self.clients[0])
+        self.pool.summon(unittest.mock.sentinel.svc)
+        self.clients[0].summon.assert_called_once_with(
+            unittest.mock.sentinel.svc
+        )
+
+        self.pool.add(self.clients[1])
+        self.clients[1].summon.assert_called_once_with(
+            unittest.mock.sentinel.svc
+        )
+
+    def test_summon_shares_entitycaps_cache(self):
+        jid = structs.JID.fromstr("foo@bar.example/baz")
+        c1 = self.pool.create(jid, object())
+        c2 = self.pool.create(jid.replace(localpart="bar"), object())
+
+        self.pool.summon(aioxmpp.EntityCapsService)
+
+        self.assertIs(c1.summon(aioxmpp.EntityCapsService).cache,
+                      self.pool.entitycaps_cache)
+        self.assertIs(c2.summon(aioxmpp.EntityCapsService).cache,
+                      self.pool.entitycaps_cache)
+
+    def test_create_shares_timer_wheel_for_pings(self):
+        jid = structs.JID.fromstr("foo@bar.example/baz")
+        c1 = self.pool.create(jid, object())
+
+        self.assertIs(
+            c1.stream._shared_timers,
+            c1.stream._iq_response_map._timers,
+        )
+
+    def test_mount_disco_node_on_existing_and_added_clients(self):
+        jid = structs.JID.fromstr("foo@bar.example/baz")
+        c1 = self.pool.create(jid, object())
+        node_ = aioxmpp.disco.StaticNode()
+
+        self.pool.mount_disco_node("urn:example:node", node_)
+
+        c2 = self.pool.create(jid.replace(localpart="bar"), object())
+
+        for client in [c1, c2]:
+            disco = client.summon(aioxmpp.DiscoServer)
+            self.assertIs(disco._node_mounts["urn:example:node"], node_)
+
+        self.assertIsNot(c1.summon(aioxmpp.DiscoServer),
+                         c2.summon(aioxmpp.DiscoServer))
+
+    def test_start_starts_all_clients(self):
+        for client in self.clients:
+            self.pool.add(client)
+        self.assertFalse(self.pool.running)
+
+        self.pool.start()
+        self.assertTrue(self.pool.running)
+        self._run()
+
+        for client in self.clients:
+            self.assertTrue(client.running)
+
+        with self.assertRaisesRegex(RuntimeError, "already running"):
+            self.pool.start()
+
+    def test_start_skips_running_clients(self):
+        self.clients[0].running = True
+        self.clients[0].start = unittest.mock.Mock()
+        self.pool.add(self.clients[0])
+
+        self.pool.start()
+        self._run()
+
+        self.clients[0].start.assert_not_called()
+
+    def test_max_connecting(self):
+        self.pool = node.ClientPool(max_connecting=1)
+        for client in self.clients:
+            self.pool.add(client)
+
+        self.pool.start()
+        self._run()
+        self.assertSequenceEqual(
+            [client.running for client in self.clients],
+            [True, False, False],
+        )
+
+        self.clients[0].on_stream_established()
+        self._run()
+        self.assertSequenceEqual(
+            [client.running for client in self.clients],
+            [True, True, False],
+        )
+
+        self.clients[1].on_failure(Exception())
+        self._run()
+        self.assertTrue(self.clients[2].running)
+
+        # a slot is only released once per start
+        self.clients[0].on_stream_established()
+        self.assertFalse(self.pool._connecting.get(self.clients[0]))
+
+    def test_stopped_client_releases_slot(self):
+        self.pool = node.ClientPool(max_connecting=1)
+        for client in self.clients[:2]:
+            self.pool.add(client)
+
+        self.pool.start()
+        self._run()
+        self.clients[0].on_stopped()
+        self._run()
+
+        self.assertTrue(self.clients[1].running)
+
+    def test_remove_drops_queued_client(self):
+        self.pool = node.ClientPool(max_connecting=1)
+        for client in self.clients[:2]:
+            self.pool.add(client)
+
+        self.pool.start()
+        self._run()
+        self.pool.remove(self.clients[1])
+        self.clients[0].on_stream_established()
+        self._run()
+
+        self.assertFalse(self.clients[1].running)
+
+    def test_connect_interval(self):
+        self.pool = node.ClientPool(
+            connect_interval=timedelta(seconds=0.05),
+        )
+        for client in self.clients[:2]:
+            self.pool.add(client)
+
+        self.pool.start()
+        self._run()
+
+        self.assertTrue(self.clients[0].running)
+        self.assertFalse(self.clients[1].running)
+
+        run_coroutine(asyncio.sleep(0.1))
+
+        self.assertTrue(self.clients[1].running)
+
+    def test_add_while_running_starts_client(self):
+        self.pool.start()
+        self._run()
+
+        self.pool.add(self.clients[0])
+        self._run()
+
+        self.assertTrue(self.clients[0].running)
+
+    def test_stop_stops_clients(self):
+        for client in self.clients:
+            self.pool.add(client)
+        self.pool.start()
+        self._run()
+
+        self.pool.stop()
+
+        self.assertFalse(self.pool.running)
+        for client in self.clients:
+            client.stop.assert_called_once_with()
@@ -23,6 +23,7 @@ import asyncio
 import contextlib
 import io
 import logging
+import threading
 import unittest
 import unittest.mock
 
@@ -45,6 +46,7 @@ from aioxmpp.structs import JID
 from aioxmpp.utils import namespaces
 
 import aioxmpp.protocol as protocol
+import aioxmpp.xml as xml
 
 TEST_FROM = JID.fromstr("foo@bar.example")
 TEST_PEER = JID.fromstr("bar.example")
@@ -293,6 +295,102 @@ class TestDebugWrapper(unittest.TestCase):
         )
 
 
+class TestWriteCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.transport = unittest.mock.Mock([
+            "writelines",
+        ])
+        self.loop = unittest.mock.Mock([
+            "call_soon",
+            "call_later",
+        ])
+        self.wc = protocol.WriteCoalescer(self.transport, self.loop)
+
+    def tearDown(self):
+        del self.wc
+        del self.loop
+        del self.transport
+
+    def test_write_schedules_flush_in_next_iteration(self):
+        self.wc.write(b"foo")
+        self.loop.call_soon.assert_called_once_with(self.wc.flush_buffer)
+        self.loop.call_later.assert_not_called()
+        self.transport.writelines.assert_not_called()
+        self.assertEqual(self.wc.buffered_bytes, 3)
+
+    def test_write_schedules_flush_only_once(self):
+        self.wc.write(b"foo")
+        self.wc.write(b"bar")
+        self.loop.call_soon.assert_called_once_with(self.wc.flush_buffer)
+        self.assertEqual(self.wc.buffered_bytes, 6)
+
+    def test_write_uses_call_later_with_max_delay(self):
+        wc = protocol.WriteCoalescer(self.transport, self.loop,
+                                     max_delay=0.1)
+        wc.write(b"foo")
+        self.loop.call_later.assert_called_once_with(0.1, wc.flush_buffer)
+        self.loop.call_soon.assert_not_called()
+
+    def test_flush_buffer_writes_all_pieces_at_once(self):
+        self.wc.write(b"foo")
+        self.wc.write(memoryview(b"bar"))
+        self.wc.write(bytearray(b"baz"))
+
+        self.wc.flush_buffer()
+
+        self.transport.writelines.assert_called_once_with(
+            [b"foo", b"bar", b"baz"]
+        )
+        self.loop.call_soon().cancel.assert_called_once_with()
+        self.assertEqual(self.wc.buffered_bytes, 0)
+
+    def test_write_copies_data(self):
+        data = bytearray(b"foo")
+        self.wc.write(data)
+        data[:] = b"bar"
+
+        self.wc.flush_buffer()
+
+        self.transport.writelines.assert_called_once_with([b"foo"])
+
+    def test_flush_buffer_without_data_does_not_write(self):
+        self.wc.flush_buffer()
+        self.transport.writelines.assert_not_called()
+
+    def test_write_reschedules_after_flush(self):
+        self.wc.write(b"foo")
+        self.wc.flush_buffer()
+        self.loop.call_soon.reset_mock()
+
+        self.wc.write(b"bar")
+        self.loop.call_soon.assert_called_once_with(self.wc.flush_buffer)
+
+    def test_write_flushes_immediately_at_max_bytes(self):
+        wc = protocol.WriteCoalescer(self.transport, self.loop,
+                                     max_bytes=6)
+        wc.write(b"foo")
+        self.transport.writelines.assert_not_called()
+        wc.write(b"barbaz")
+        self.transport.writelines.assert_called_once_with(
+            [b"foo", b"barbaz"]
+        )
+        self.loop.call_soon().cancel.assert_called_once_with()
+        self.assertEqual(wc.buffered_bytes, 0)
+
+    def test_discard_drops_data(self):
+        self.wc.write(b"foo")
+        self.wc.discard()
+
+        self.loop.call_soon().cancel.assert_called_once_with()
+        self.assertEqual(self.wc.buffered_bytes, 0)
+
+        self.wc.flush_buffer()
+        self.transport.writelines.assert_not_called()
+
+    def test_has_no_flush(self):
+        self.assertFalse(hasattr(self.wc, "flush"))
+
+
 class TestXMLStream(unittest.TestCase):
     def setUp(self):
         self.maxDiff = None
@@ -769,19 +867,20 @@ class TestXMLStream(unittest.TestCase):
                 partial=True
             )
         )
-        p.send_xso(st)
+        result = p.send_xso(st)
+        expected = (b'<iq from="u1@foo.example/test" id="id"'
+                    b' to="u2@foo.example/test" type="get">'
+                    b'<payload xmlns="uri:foo" a="foo"/>'
+                    b'</iq>')
         run_coroutine(
             t.run_test(
                 [
-                    TransportMock.Write(
-                        b'<iq from="u1@foo.example/test" id="id"'
-                        b' to="u2@foo.example/test" type="get">'
-                        b'<payload xmlns="uri:foo" a="foo"/>'
-                        b'</iq>'),
+                    TransportMock.Write(expected),
                 ],
                 partial=True
             )
         )
+        self.assertEqual(result, len(expected))
 
     def test_send_xso_reraises_error_from_writer(self):
         st = FakeIQ(structs.IQType.GET)
@@ -1918,6 +2017,587 @@ class TestXMLStream(unittest.TestCase):
             pass
 
 
+    def test_batched_parsing_defaults_to_false(self):
+        self.assertFalse(XMLStream.batched_parsing)
+
+    def test_reset_state_uses_parser_according_to_batched_parsing(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+
+        self.assertNotIsInstance(p._parser, xml.BatchingExpatReader)
+
+        p.batched_parsing = True
+        p.reset()
+
+        self.assertIsInstance(p._parser, xml.BatchingExpatReader)
+        self.assertIs(p._parser.getContentHandler(), p._processor)
+
+    def test_offload_defaults(self):
+        self.assertIsNone(XMLStream.offload_threshold)
+        self.assertIsNone(XMLStream.offload_executor)
+
+    def test_reset_state_installs_offload_hook(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+
+        p.batched_parsing = False
+        p.offload_threshold = 10
+        p._reset_state()
+        self.assertIsNone(p._processor.offload)
+
+        p.batched_parsing = True
+        p.offload_threshold = None
+        p._reset_state()
+        self.assertIsNone(p._processor.offload)
+
+        p.offload_threshold = 10
+        p._reset_state()
+        self.assertEqual(p._processor.offload, p._rx_offload)
+
+        p.offload_threshold = None
+        p._reset_state()
+        self.assertIsNone(p._processor.offload)
+        # takes effect immediately
+        p.offload_handler = unittest.mock.Mock()
+        self.assertEqual(p._processor.offload, p._rx_offload)
+        p._reset_state()
+        self.assertEqual(p._processor.offload, p._rx_offload)
+
+        p.offload_handler = None
+        self.assertIsNone(p._processor.offload)
+
+        p.batched_parsing = False
+        p._reset_state()
+        p.offload_handler = unittest.mock.Mock()
+        self.assertIsNone(p._processor.offload)
+
+    def _wait_for(self, predicate):
+        @asyncio.coroutine
+        def wait():
+            while not predicate():
+                yield from asyncio.sleep(0.001)
+        run_coroutine(wait())
+
+    def test_offloaded_parsing_keeps_order(self):
+        class Foo(xso.XSO):
+            TAG = ("uri:test", "foo")
+
+            text = xso.Text()
+
+        received = []
+        threads = []
+
+        def parse_detached(events):
+            threads.append(threading.current_thread())
+            return type(p._processor).parse_detached(p._processor, events)
+
+        t, p = self._make_stream(to=TEST_PEER)
+        p.batched_parsing = True
+        p.offload_threshold = 10
+        p.stanza_parser.add_class(Foo, received.append)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(self._make_peer_header()),
+                    ]),
+            ],
+            partial=True
+        ))
+
+        with unittest.mock.patch.object(p._processor, "parse_detached",
+                                        new=parse_detached):
+            p.data_received(
+                b"<foo xmlns='uri:test'>" + b"x" * 100 + b"</foo>"
+                b"<foo xmlns='uri:test'>small</foo>"
+            )
+
+            # the small element is held back until the large one is done
+            self.assertSequenceEqual(received, [])
+
+            self._wait_for(lambda: len(received) == 2)
+
+        self.assertSequenceEqual(
+            [obj.text for obj in received],
+            ["x" * 100, "small"],
+        )
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertFalse(p._rx_pending)
+
+        p.data_received(b"<foo xmlns='uri:test'>tiny</foo>")
+        self.assertEqual(received[-1].text, "tiny")
+
+    def test_offload_handler_takes_over_elements(self):
+        class Foo(xso.XSO):
+            TAG = ("uri:test", "foo")
+
+            text = xso.Text()
+
+        received = []
+        taken = []
+
+        def offload_handler(events, lang):
+            if events[0][3].get((None, "take")):
+                taken.append((events, lang))
+                return True
+            return False
+
+        t, p = self._make_stream(to=TEST_PEER)
+        p.batched_parsing = True
+        p.stanza_parser.add_class(Foo, received.append)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(self._make_peer_header()),
+                    ]),
+            ],
+            partial=True
+        ))
+        p.offload_handler = offload_handler
+
+        p.data_received(
+            b"<foo xmlns='uri:test' take='1'>a</foo>"
+            b"<foo xmlns='uri:test'>b</foo>"
+        )
+
+        self.assertSequenceEqual([obj.text for obj in received], ["b"])
+        self.assertSequenceEqual(
+            taken,
+            [
+                ([("start", "uri:test", "foo", {(None, "take"): "1"}),
+                  ("text", "a"),
+                  ("end",)],
+                 p._processor.remote_lang),
+            ]
+        )
+
+    def test_offloaded_parsing_error_fails_stream(self):
+        class Foo(xso.XSO):
+            TAG = ("uri:test", "foo")
+
+            text = xso.Text()
+
+        t, p = self._make_stream(to=TEST_PEER)
+        p.batched_parsing = True
+        p.offload_threshold = 10
+        p.stanza_parser.add_class(Foo, unittest.mock.Mock())
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(self._make_peer_header()),
+                    ]),
+            ],
+            partial=True
+        ))
+
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_ERROR_TEMPLATE_WITH_TEXT.format(
+                        condition="unsupported-stanza-type",
+                        text="unsupported stanza: {uri:test}bar",
+                    ).encode("utf-8")),
+                TransportMock.Write(b"</stream:stream>"),
+                TransportMock.WriteEof(),
+                TransportMock.Close()
+            ],
+            stimulus=TransportMock.Receive(
+                b"<bar xmlns='uri:test'>" + b"x" * 100 + b"</bar>"
+            ),
+        ))
+
+    def _offload_blocked_stream(self, received, release):
+        class Foo(xso.XSO):
+            TAG = ("uri:test", "foo")
+
+            text = xso.Text()
+
+        def parse_detached(events):
+            release.wait()
+            return type(p._processor).parse_detached(p._processor, events)
+
+        t, p = self._make_stream(to=TEST_PEER)
+        p.batched_parsing = True
+        p.offload_threshold = 10
+        p.stanza_parser.add_class(Foo, received.append)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(self._make_peer_header()),
+                    ]),
+            ],
+            partial=True
+        ))
+        p._processor.parse_detached = parse_detached
+        return t, p
+
+    def test_stream_footer_waits_for_offloaded_parsing(self):
+        received = []
+        release = threading.Event()
+        t, p = self._offload_blocked_stream(received, release)
+
+        try:
+            p.data_received(
+                b"<foo xmlns='uri:test'>" + b"x" * 100 + b"</foo>"
+                b"<foo xmlns='uri:test'>small</foo>"
+                b"</stream:stream>"
+            )
+
+            self.assertSequenceEqual(received, [])
+            self.assertEqual(p.state, protocol.State.OPEN)
+        finally:
+            release.set()
+
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(b"</stream:stream>"),
+                TransportMock.WriteEof(),
+                TransportMock.Close(),
+            ],
+        ))
+
+        self.assertSequenceEqual(
+            [obj.text for obj in received],
+            ["x" * 100, "small"],
+        )
+        self.assertEqual(p.state, protocol.State.CLOSED)
+        self.assertFalse(p._rx_pending)
+
+    def test_eof_waits_for_offloaded_parsing(self):
+        received = []
+        release = threading.Event()
+        t, p = self._offload_blocked_stream(received, release)
+
+        try:
+            p.data_received(
+                b"<foo xmlns='uri:test'>" + b"x" * 100 + b"</foo>"
+            )
+            self.assertTrue(p.eof_received())
+            self.assertEqual(p.state, protocol.State.OPEN)
+        finally:
+            release.set()
+
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(b"</stream:stream>"),
+                TransportMock.WriteEof(),
+                TransportMock.Close(),
+            ],
+        ))
+
+        self.assertSequenceEqual(
+            [obj.text for obj in received],
+            ["x" * 100],
+        )
+        self.assertEqual(p.state, protocol.State.CLOSED)
+
+    def test_kill_state_cancels_offloaded_parsing(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+        fut = asyncio.Future()
+        p._rx_pending.append(fut)
+        p._rx_pending.append([])
+
+        p._kill_state()
+
+        self.assertTrue(fut.cancelled())
+        self.assertFalse(p._rx_pending)
+
+    def test_coalesce_writes_defaults(self):
+        self.assertFalse(XMLStream.coalesce_writes)
+        self.assertEqual(XMLStream.coalesce_max_bytes, 65536)
+        self.assertEqual(XMLStream.coalesce_max_delay, 0)
+
+    def test_reset_state_creates_coalescer_according_to_coalesce_writes(
+            self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+
+        self.assertIsNone(p._coalescer)
+
+        p.coalesce_writes = True
+        p.coalesce_max_bytes = unittest.mock.sentinel.max_bytes
+        p.coalesce_max_delay = unittest.mock.sentinel.max_delay
+
+        with unittest.mock.patch(
+                "aioxmpp.protocol.WriteCoalescer") as WriteCoalescer:
+            p._reset_state()
+
+        WriteCoalescer.assert_called_once_with(
+            t,
+            p._loop,
+            max_bytes=unittest.mock.sentinel.max_bytes,
+            max_delay=unittest.mock.sentinel.max_delay,
+        )
+        self.assertEqual(p._coalescer, WriteCoalescer())
+
+    def test_coalesced_writes_are_sent_in_one_chunk(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        p.coalesce_writes = True
+
+        with unittest.mock.patch.object(t, "write",
+                                        wraps=t.write) as write:
+            run_coroutine(t.run_test(
+                [
+                    TransportMock.Write(
+                        STREAM_HEADER,
+                        response=[
+                            TransportMock.Receive(
+                                PEER_STREAM_HEADER_TEMPLATE.format(
+                                    minor=0, major=1).encode("utf-8")),
+                        ]
+                    ),
+                ],
+                partial=True
+            ))
+
+            write.reset_mock()
+
+            for i in range(3):
+                msg = stanza.Message(type_=structs.MessageType.CHAT)
+                msg.id_ = str(i)
+                p.send_xso(msg)
+
+            write.assert_not_called()
+
+            run_coroutine(t.run_test(
+                [
+                    TransportMock.Write(
+                        b'<message id="0" type="chat"/>'
+                        b'<message id="1" type="chat"/>'
+                        b'<message id="2" type="chat"/>'
+                    ),
+                ],
+                partial=True
+            ))
+
+        write.assert_called_once_with(
+            b'<message id="0" type="chat"/>'
+            b'<message id="1" type="chat"/>'
+            b'<message id="2" type="chat"/>'
+        )
+
+    def test_close_flushes_coalesced_writes_before_eof(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        p.coalesce_writes = True
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(
+                            PEER_STREAM_HEADER_TEMPLATE.format(
+                                minor=0, major=1).encode("utf-8")),
+                    ]
+                ),
+            ],
+            partial=True
+        ))
+
+        msg = stanza.Message(type_=structs.MessageType.CHAT)
+        msg.id_ = "foo"
+        p.send_xso(msg)
+        p.close()
+
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    b'<message id="foo" type="chat"/>'
+                    b'</stream:stream>'
+                ),
+                TransportMock.WriteEof(),
+            ],
+            partial=True
+        ))
+
+    def test_abort_flushes_coalesced_writes_before_eof(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        p.coalesce_writes = True
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(
+                            PEER_STREAM_HEADER_TEMPLATE.format(
+                                minor=0, major=1).encode("utf-8")),
+                    ]
+                ),
+            ],
+            partial=True
+        ))
+
+        msg = stanza.Message(type_=structs.MessageType.CHAT)
+        msg.id_ = "foo"
+        p.send_xso(msg)
+        p.abort()
+
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    b'<message id="foo" type="chat"/>'
+                ),
+                TransportMock.WriteEof(),
+                TransportMock.Close(),
+            ],
+        ))
+
+    def test_connection_lost_discards_coalesced_writes(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        p.coalesce_writes = True
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(
+                    STREAM_HEADER,
+                    response=[
+                        TransportMock.Receive(
+                            PEER_STREAM_HEADER_TEMPLATE.format(
+                                minor=0, major=1).encode("utf-8")),
+                    ]
+                ),
+            ],
+            partial=True
+        ))
+
+        coalescer = p._coalescer
+        p.send_xso(stanza.Message(type_=structs.MessageType.CHAT))
+        self.assertTrue(coalescer.buffered_bytes)
+
+        p.connection_lost(None)
+
+        self.assertEqual(coalescer.buffered_bytes, 0)
+        self.assertIsNone(p._coalescer)
+
+        run_coroutine(asyncio.sleep(0))
+
+    def test_pause_and_resume_writing(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        paused = unittest.mock.Mock()
+        resumed = unittest.mock.Mock()
+        p.on_writing_paused.connect(paused)
+        p.on_writing_resumed.connect(resumed)
+
+        self.assertFalse(p.writing_paused)
+
+        p.pause_writing()
+        self.assertTrue(p.writing_paused)
+        paused.assert_called_once_with()
+        resumed.assert_not_called()
+
+        p.resume_writing()
+        self.assertFalse(p.writing_paused)
+        resumed.assert_called_once_with()
+
+    def test_connection_lost_resumes_paused_writing(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+
+        resumed = unittest.mock.Mock()
+        p.on_writing_resumed.connect(resumed)
+        p.pause_writing()
+
+        p.connection_lost(None)
+
+        self.assertFalse(p.writing_paused)
+        resumed.assert_called_once_with()
+
+        run_coroutine(asyncio.sleep(0))
+
+    def test_pause_and_resume_reading_forward_to_transport(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+
+        with contextlib.ExitStack() as stack:
+            pause_reading = stack.enter_context(unittest.mock.patch.object(
+                t, "pause_reading",
+            ))
+            resume_reading = stack.enter_context(unittest.mock.patch.object(
+                t, "resume_reading",
+            ))
+
+            self.assertTrue(p.pause_reading())
+            pause_reading.assert_called_once_with()
+
+            p.resume_reading()
+            resume_reading.assert_called_once_with()
+
+    def test_pause_reading_without_transport_support(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        run_coroutine(t.run_test(
+            [
+                TransportMock.Write(STREAM_HEADER),
+            ],
+            partial=True
+        ))
+
+        # the asyncio base classes raise NotImplementedError
+        self.assertFalse(p.pause_reading())
+        p.resume_reading()
+
+    def test_pause_reading_without_transport(self):
+        t, p = self._make_stream(to=TEST_PEER)
+        self.assertFalse(p.pause_reading())
+        p.resume_reading()
+
+
+class TestXMLStreamWithBatchedParsing(TestXMLStream):
+    def setUp(self):
+        super().setUp()
+        self.batched_parsing_patch = unittest.mock.patch.object(
+            XMLStream,
+            "batched_parsing",
+            new=True,
+        )
+        self.batched_parsing_patch.start()
+
+    def tearDown(self):
+        self.batched_parsing_patch.stop()
+        super().tearDown()
+
+    def test_batched_parsing_defaults_to_false(self):
+        pass
+
+    def test_reset_state_uses_parser_according_to_batched_parsing(self):
+        pass
+
+
 class Testsend_and_wait_for(xmltestutils.XMLTestCase):
     def setUp(self):
         self.loop = asyncio.get_event_loop()
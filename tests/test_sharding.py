@@ -0,0 +1,278 @@
+########################################################################
+# File name: test_sharding.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import asyncio
+import concurrent.futures
+import unittest
+import unittest.mock
+
+import aioxmpp.nonza as nonza
+import aioxmpp.sharding as sharding
+import aioxmpp.stanza as stanza
+import aioxmpp.structs as structs
+
+from aioxmpp.testutils import run_coroutine
+
+
+TEST_FROM = structs.JID.fromstr("juliet@capulet.lit/balcony")
+TEST_TO = structs.JID.fromstr("romeo@montague.lit/orchard")
+
+
+def echo(msg):
+    reply = msg.make_reply()
+    reply.body[None] = "re: " + msg.body[None]
+    return [reply]
+
+
+def echo_languages(msg):
+    reply = msg.make_reply()
+    reply.body[None] = ",".join(sorted(str(lang) for lang in msg.body))
+    return [reply]
+
+
+def ignore(msg):
+    return None
+
+
+def fail(msg):
+    raise RuntimeError("handler failed")
+
+
+def reply_with_nonza(msg):
+    return [msg.make_reply(), nonza.SMRequest()]
+
+
+def make_message(from_=TEST_FROM, body="hello"):
+    msg = stanza.Message(
+        type_=structs.MessageType.CHAT,
+        from_=from_,
+        to=TEST_TO,
+    )
+    msg.body[None] = body
+    return msg
+
+
+def make_presence(from_=TEST_FROM):
+    return stanza.Presence(
+        type_=structs.PresenceType.AVAILABLE,
+        from_=from_,
+        to=TEST_TO,
+    )
+
+
+def events_of(stanza_obj):
+    return sharding._capture(stanza_obj)
+
+
+def thread_executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+
+class TestShardedStanzaProcessor(unittest.TestCase):
+    def setUp(self):
+        self.client = unittest.mock.Mock(["enqueue", "stream"])
+        self.client.stream.detached_stanza_handler = None
+        self.processor = sharding.ShardedStanzaProcessor(
+            self.client,
+            echo,
+            nshards=4,
+            executor_factory=thread_executor,
+        )
+
+    def tearDown(self):
+        self.processor.shutdown()
+
+    def _make_processor(self, handler, **kwargs):
+        self.client.stream.detached_stanza_handler = None
+        kwargs.setdefault("nshards", 1)
+        kwargs.setdefault("executor_factory", thread_executor)
+        return sharding.ShardedStanzaProcessor(
+            self.client,
+            handler,
+            **kwargs
+        )
+
+    def test_nshards(self):
+        self.assertEqual(self.processor.nshards, 4)
+
+    def test_nshards_defaults_to_cpu_count(self):
+        with unittest.mock.patch("os.cpu_count") as cpu_count:
+            cpu_count.return_value = 3
+            processor = self._make_processor(echo, nshards=None)
+        self.assertEqual(processor.nshards, 3)
+        processor.shutdown()
+
+    def test_rejects_non_positive_nshards(self):
+        with self.assertRaises(ValueError):
+            self._make_processor(echo, nshards=0)
+
+    def test_installs_detached_stanza_handler(self):
+        self.assertIsNotNone(self.client.stream.detached_stanza_handler)
+
+        with self.assertRaisesRegex(ValueError, "already has"):
+            sharding.ShardedStanzaProcessor(
+                self.client,
+                echo,
+                executor_factory=thread_executor,
+            )
+
+        self.processor.shutdown()
+        self.assertIsNone(self.client.stream.detached_stanza_handler)
+
+    def test_shard_of_uses_bare_sender(self):
+        a = events_of(make_message(from_=TEST_FROM))
+        b = events_of(make_message(from_=TEST_FROM.replace(resource="other")))
+        self.assertEqual(
+            self.processor.shard_of(a),
+            self.processor.shard_of(b),
+        )
+        self.assertEqual(
+            self.processor.shard_of(a),
+            hash(TEST_FROM.bare()) % 4,
+        )
+
+    def test_shard_of_with_custom_key(self):
+        key = unittest.mock.Mock()
+        key.return_value = 6
+        processor = self._make_processor(echo, nshards=4, key=key)
+
+        self.assertEqual(processor.shard_of(events_of(make_message())), 2)
+        key.assert_called_once_with(
+            stanza.Message.TAG,
+            unittest.mock.ANY,
+        )
+        _, (_, attributes), _ = key.mock_calls[0]
+        self.assertEqual(attributes[None, "from"], str(TEST_FROM))
+        processor.shutdown()
+
+    def test_takes_over_accepted_stanzas(self):
+        handler = self.client.stream.detached_stanza_handler
+
+        self.assertTrue(handler(events_of(make_message()), None))
+        self.assertFalse(handler(events_of(make_presence()), None))
+
+        @asyncio.coroutine
+        def wait_for_reply():
+            while not self.client.enqueue.mock_calls:
+                yield from asyncio.sleep(0.001)
+
+        run_coroutine(wait_for_reply())
+
+        self.assertEqual(len(self.client.enqueue.mock_calls), 1)
+        _, (reply,), _ = self.client.enqueue.mock_calls[0]
+        self.assertEqual(reply.body[None], "re: hello")
+
+    def test_custom_accept(self):
+        accept = unittest.mock.Mock()
+        accept.return_value = False
+        processor = self._make_processor(echo, accept=accept)
+        handler = self.client.stream.detached_stanza_handler
+
+        self.assertFalse(handler(events_of(make_message()), None))
+        accept.assert_called_once_with(stanza.Message.TAG, unittest.mock.ANY)
+        processor.shutdown()
+
+    def test_feed_enqueues_replies(self):
+        tokens = run_coroutine(self.processor.feed(events_of(make_message())))
+
+        self.assertEqual(len(self.client.enqueue.mock_calls), 1)
+        _, (reply,), _ = self.client.enqueue.mock_calls[0]
+        self.assertIsInstance(reply, stanza.Message)
+        self.assertEqual(reply.to, TEST_FROM)
+        self.assertEqual(reply.from_, TEST_TO)
+        self.assertEqual(reply.body[None], "re: hello")
+        self.assertSequenceEqual(tokens, [self.client.enqueue()])
+
+    def test_feed_keeps_order_within_shard(self):
+        futs = [
+            self.processor.feed(events_of(make_message(body=str(i))))
+            for i in range(10)
+        ]
+        run_coroutine(asyncio.gather(*futs))
+
+        self.assertSequenceEqual(
+            [call[1][0].body[None] for call in self.client.enqueue.mock_calls],
+            ["re: {}".format(i) for i in range(10)],
+        )
+
+    def test_feed_passes_language(self):
+        processor = self._make_processor(echo_languages)
+        run_coroutine(processor.feed(
+            events_of(make_message()),
+            structs.LanguageTag.fromstr("de"),
+        ))
+        processor.shutdown()
+
+        _, (reply,), _ = self.client.enqueue.mock_calls[0]
+        self.assertEqual(reply.body[None], "de")
+
+    def test_handler_returning_none(self):
+        processor = self._make_processor(ignore)
+        tokens = run_coroutine(processor.feed(events_of(make_message())))
+        processor.shutdown()
+
+        self.assertSequenceEqual(tokens, [])
+        self.client.enqueue.assert_not_called()
+
+    def test_handler_exception(self):
+        processor = self._make_processor(fail)
+        with self.assertLogs("aioxmpp.sharding", "ERROR"):
+            with self.assertRaisesRegex(RuntimeError, "handler failed"):
+                run_coroutine(processor.feed(events_of(make_message())))
+        processor.shutdown()
+
+        self.client.enqueue.assert_not_called()
+
+    def test_reply_after_disconnect(self):
+        self.client.enqueue.side_effect = ConnectionError(
+            "stream is not ready"
+        )
+
+        with self.assertLogs("aioxmpp.sharding", "ERROR"):
+            with self.assertRaisesRegex(ConnectionError, "not ready"):
+                run_coroutine(self.processor.feed(events_of(make_message())))
+
+        self.assertEqual(len(self.client.enqueue.mock_calls), 1)
+
+    def test_reply_which_is_not_a_stanza(self):
+        processor = self._make_processor(reply_with_nonza)
+        with self.assertLogs("aioxmpp.sharding", "ERROR"):
+            with self.assertRaisesRegex(ValueError, "not a stanza"):
+                run_coroutine(processor.feed(events_of(make_message())))
+        processor.shutdown()
+
+        self.client.enqueue.assert_not_called()
+
+    def test_process_pool(self):
+        self.client.stream.detached_stanza_handler = None
+        processor = sharding.ShardedStanzaProcessor(
+            self.client,
+            echo,
+            nshards=2,
+        )
+        try:
+            run_coroutine(processor.feed(events_of(make_message())),
+                          timeout=30)
+        finally:
+            processor.shutdown()
+
+        _, (reply,), _ = self.client.enqueue.mock_calls[0]
+        self.assertEqual(reply.body[None], "re: hello")
@@ -0,0 +1,218 @@
+########################################################################
+# File name: test_sm_store.py
+# This file is part of: aioxmpp
+#
+# LICENSE
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/>.
+#
+########################################################################
+import ipaddress
+import json
+import os.path
+import tempfile
+import unittest
+
+import aioxmpp.sm_store as sm_store
+import aioxmpp.stanza as stanza
+import aioxmpp.stream as stream
+import aioxmpp.structs as structs
+
+
+TEST_JID = structs.JID.fromstr("foo@bar.example/baz")
+
+
+def make_state():
+    msg = stanza.Message(
+        type_=structs.MessageType.CHAT,
+        to=structs.JID.fromstr("fnord@bar.example"),
+        id_="msg1",
+    )
+    msg.body[None] = "foo"
+
+    iq = stanza.IQ(
+        type_=structs.IQType.GET,
+        to=structs.JID.fromstr("bar.example"),
+        id_="iq1",
+    )
+
+    return stream.SMState(
+        id_="foobar",
+        location=(ipaddress.IPv6Address("fe80::"), 5222),
+        max_=1200,
+        outbound_base=10,
+        inbound_ctr=20,
+        unacked_stanzas=[msg],
+        queued_stanzas=[iq],
+        unacked_priorities=[stream.StanzaPriority.BULK],
+        queued_priorities=[stream.StanzaPriority.CONTROL],
+    )
+
+
+class Testdump_and_load_state(unittest.TestCase):
+    def test_roundtrip(self):
+        state = make_state()
+        local_jid, loaded = sm_store.load_state(
+            sm_store.dump_state(TEST_JID, state)
+        )
+
+        self.assertEqual(local_jid, TEST_JID)
+        self.assertEqual(loaded.id_, state.id_)
+        self.assertEqual(loaded.location, state.location)
+        self.assertEqual(loaded.max_, state.max_)
+        self.assertEqual(loaded.outbound_base, state.outbound_base)
+        self.assertEqual(loaded.inbound_ctr, state.inbound_ctr)
+
+        msg, = loaded.unacked_stanzas
+        self.assertIsInstance(msg, stanza.Message)
+        self.assertEqual(msg.id_, "msg1")
+        self.assertEqual(msg.type_, structs.MessageType.CHAT)
+        self.assertEqual(msg.body[None], "foo")
+
+        iq, = loaded.queued_stanzas
+        self.assertIsInstance(iq, stanza.IQ)
+        self.assertEqual(iq.id_, "iq1")
+        self.assertEqual(iq.to, structs.JID.fromstr("bar.example"))
+
+        self.assertSequenceEqual(loaded.unacked_priorities,
+                                 [stream.StanzaPriority.BULK])
+        self.assertSequenceEqual(loaded.queued_priorities,
+                                 [stream.StanzaPriority.CONTROL])
+
+    def test_roundtrip_without_priorities(self):
+        state = make_state()._replace(unacked_priorities=None,
+                                      queued_priorities=None)
+        _, loaded = sm_store.load_state(sm_store.dump_state(TEST_JID, state))
+        self.assertIsNone(loaded.unacked_priorities)
+        self.assertIsNone(loaded.queued_priorities)
+
+    def test_load_accepts_missing_priorities(self):
+        data = json.loads(sm_store.dump_state(TEST_JID, make_state()))
+        del data["unacked_priorities"]
+        del data["queued_priorities"]
+        _, loaded = sm_store.load_state(json.dumps(data))
+        self.assertIsNone(loaded.unacked_priorities)
+        self.assertIsNone(loaded.queued_priorities)
+
+    def test_load_rejects_mismatching_priorities(self):
+        data = json.loads(sm_store.dump_state(TEST_JID, make_state()))
+        data["queued_priorities"] = [0, 1]
+        with self.assertRaises(ValueError):
+            sm_store.load_state(json.dumps(data))
+
+        data["queued_priorities"] = [23]
+        with self.assertRaises(ValueError):
+            sm_store.load_state(json.dumps(data))
+
+    def test_roundtrip_without_location(self):
+        state = make_state()._replace(location=None)
+        _, loaded = sm_store.load_state(sm_store.dump_state(TEST_JID, state))
+        self.assertIsNone(loaded.location)
+
+    def test_load_rejects_unknown_version(self):
+        data = json.loads(sm_store.dump_state(TEST_JID, make_state()))
+        data["version"] = 2
+        with self.assertRaisesRegex(ValueError, "version"):
+            sm_store.load_state(json.dumps(data))
+
+    def test_load_rejects_missing_keys(self):
+        data = json.loads(sm_store.dump_state(TEST_JID, make_state()))
+        del data["id"]
+        with self.assertRaises(ValueError):
+            sm_store.load_state(json.dumps(data))
+
+    def test_load_rejects_broken_stanzas(self):
+        data = json.loads(sm_store.dump_state(TEST_JID, make_state()))
+        data["unacked"] = ["<message"]
+        with self.assertRaises(ValueError):
+            sm_store.load_state(json.dumps(data))
+
+
+class TestFileSMStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "sm.json")
+        self.store = sm_store.FileSMStateStore(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_is_store(self):
+        self.assertIsInstance(self.store, sm_store.AbstractSMStateStore)
+
+    def test_load_without_state(self):
+        self.assertIsNone(self.store.load())
+
+    def test_save_load_clear(self):
+        self.store.save(TEST_JID, make_state())
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+        local_jid, state = self.store.load()
+        self.assertEqual(local_jid, TEST_JID)
+        self.assertEqual(state.id_, "foobar")
+
+        self.store.clear()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(self.store.load())
+
+    def test_clear_without_state(self):
+        self.store.clear()
+
+
+class TestSQLiteSMStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "sm.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_is_store(self):
+        self.assertIsInstance(
+            sm_store.SQLiteSMStateStore(self.path, "foo"),
+            sm_store.AbstractSMStateStore,
+        )
+
+    def test_save_load_clear(self):
+        store = sm_store.SQLiteSMStateStore(self.path, "foo")
+        self.assertIsNone(store.load())
+
+        store.save(TEST_JID, make_state())
+        local_jid, state = store.load()
+        self.assertEqual(local_jid, TEST_JID)
+        self.assertEqual(state.outbound_base, 10)
+
+        store.save(TEST_JID, make_state()._replace(outbound_base=11))
+        _, state = store.load()
+        self.assertEqual(state.outbound_base, 11)
+
+        store.clear()
+        self.assertIsNone(store.load())
+
+    def test_keys_are_independent(self):
+        store1 = sm_store.SQLiteSMStateStore(self.path, "foo")
+        store2 = sm_store.SQLiteSMStateStore(self.path, "bar")
+
+        store1.save(TEST_JID, make_state())
+        self.assertIsNone(store2.load())
+
+        store2.save(TEST_JID, make_state()._replace(id_="other"))
+        self.assertEqual(store1.load()[1].id_, "foobar")
+        self.assertEqual(store2.load()[1].id_, "other")
+
+        store1.clear()
+        self.assertIsNone(store1.load())
+        self.assertIsNotNone(store2.load())
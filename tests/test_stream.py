@@ -98,6 +98,8 @@ def make_mocked_streams(loop):
     xmlstream = unittest.mock.Mock()
     xmlstream.send_xso = _on_send_xso
     xmlstream.on_closing = callbacks.AdHocSignal()
+    xmlstream.on_writing_paused = callbacks.AdHocSignal()
+    xmlstream.on_writing_resumed = callbacks.AdHocSignal()
     xmlstream.close_and_wait = CoroutineMock()
     stanzastream = stream.StanzaStream(
         TEST_FROM.bare(),
@@ -134,6 +136,16 @@ class TestAppFilter(unittest.TestCase):
             calls
         )
 
+    def test_register_passes_keys(self):
+        f = stream.AppFilter(key=lambda obj: obj)
+        func = unittest.mock.Mock()
+        func.return_value = None
+
+        f.register(func, keys={1})
+        self.assertEqual(f.filter(2), 2)
+        self.assertIsNone(f.filter(1))
+        func.assert_called_once_with(1)
+
 
 class StanzaStreamTestBase(xmltestutils.XMLTestCase):
     def setUp(self):
@@ -193,6 +205,75 @@ class TestStanzaStream(StanzaStreamTestBase):
         s = stream.StanzaStream()
         self.assertIsNone(s.local_jid)
 
+    def test_init_iq_timers(self):
+        timers = stream.make_iq_timer_wheel(loop=self.loop)
+        s = stream.StanzaStream(loop=self.loop, iq_timers=timers)
+        self.assertIs(s._iq_response_map._timers, timers)
+
+    def test_start_installs_offload_handler(self):
+        self.stream.start(self.xmlstream)
+        self.assertEqual(self.xmlstream.offload_handler,
+                         self.stream._recv_stanza_events)
+        run_coroutine(asyncio.sleep(0))
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+        self.assertIsNone(self.xmlstream.offload_handler)
+
+    def test_detached_stanza_handler(self):
+        message_events = [
+            ("start", namespaces.client, "message", {}),
+            ("end",),
+        ]
+        nonza_events = [
+            ("start", namespaces.stream_management, "r", {}),
+            ("end",),
+        ]
+        handler = unittest.mock.Mock()
+        lang = unittest.mock.sentinel.lang
+
+        self.assertIsNone(self.stream.detached_stanza_handler)
+        self.assertFalse(self.stream._recv_stanza_events(message_events,
+                                                         lang))
+
+        self.stream.detached_stanza_handler = handler
+        handler.return_value = True
+        self.assertTrue(self.stream._recv_stanza_events(message_events,
+                                                        lang))
+        handler.assert_called_once_with(message_events, lang)
+        handler.reset_mock()
+
+        self.assertFalse(self.stream._recv_stanza_events(nonza_events,
+                                                         lang))
+        handler.assert_not_called()
+
+        handler.return_value = False
+        self.assertFalse(self.stream._recv_stanza_events(message_events,
+                                                         lang))
+
+        handler.side_effect = RuntimeError()
+        with self.assertLogs("aioxmpp.StanzaStream", "ERROR"):
+            self.assertFalse(self.stream._recv_stanza_events(message_events,
+                                                             lang))
+
+    def test_detached_stanzas_count_for_sm(self):
+        events = [
+            ("start", namespaces.client, "presence", {}),
+            ("end",),
+        ]
+        self.stream.detached_stanza_handler = unittest.mock.Mock()
+        self.stream.detached_stanza_handler.return_value = True
+
+        self.stream._sm_enabled = True
+        self.stream._sm_inbound_ctr = 0xffffffff
+        try:
+            self.stream._recv_stanza_events(events, None)
+            self.assertEqual(self.stream._sm_inbound_ctr, 0)
+            self.stream._recv_stanza_events(events, None)
+            self.assertEqual(self.stream._sm_inbound_ctr, 1)
+        finally:
+            self.stream._sm_enabled = False
+
     def test_broker_iq_response(self):
         iq = make_test_iq(type_=structs.IQType.RESULT)
         iq.autoset_id()
@@ -812,6 +893,69 @@ class TestStanzaStream(StanzaStreamTestBase):
         run_coroutine(asyncio.sleep(0))
         self.assertFalse(self.stream.running)
 
+    def test_run_does_not_use_queue_get(self):
+        msg = make_test_message()
+
+        fut = asyncio.Future()
+
+        self.stream.register_message_callback(
+            structs.MessageType.CHAT,
+            TEST_FROM,
+            fut.set_result)
+
+        with contextlib.ExitStack() as stack:
+            for queue in [self.stream._incoming_queue,
+                          self.stream._active_queue]:
+                stack.enter_context(unittest.mock.patch.object(
+                    queue, "get",
+                    side_effect=AssertionError("get() called")
+                ))
+
+            self.stream.start(self.xmlstream)
+            run_coroutine(asyncio.sleep(0))
+            self.stream.recv_stanza(msg)
+            run_coroutine(fut)
+
+            self.stream.stop()
+            run_coroutine(asyncio.sleep(0))
+
+        self.assertIs(msg, fut.result())
+
+    def test_run_processes_incoming_stanzas_in_batches(self):
+        msgs = [make_test_message() for i in range(3)]
+        late_msg = make_test_message()
+        processed = []
+
+        def process_incoming(xmlstream, queue_entry):
+            stanza_obj, _ = queue_entry
+            if not processed:
+                self.stream.recv_stanza(late_msg)
+            processed.append((stanza_obj,
+                              len(self.stream._incoming_queue)))
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        with unittest.mock.patch.object(self.stream, "_process_incoming",
+                                        new=process_incoming):
+            for msg in msgs:
+                self.stream.recv_stanza(msg)
+            run_coroutine(asyncio.sleep(0))
+            run_coroutine(asyncio.sleep(0))
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(
+            [
+                (msgs[0], 3),
+                (msgs[1], 2),
+                (msgs[2], 1),
+                (late_msg, 0),
+            ],
+            processed,
+        )
+
     def test_run_message_callback(self):
         msg = make_test_message()
 
@@ -1548,14 +1692,14 @@ class TestStanzaStream(StanzaStreamTestBase):
         self.assertIsInstance(exc, asyncio.CancelledError)
 
     def test_close_sets_active_stanza_tokens_to_aborted(self):
-        get_mock = CoroutineMock()
-        get_mock.delay = 1000
+        wait_mock = CoroutineMock()
+        wait_mock.delay = 1000
         # let’s mess with the processor a bit ...
         # otherwise, the stanza is sent before the close can happen
         with unittest.mock.patch.object(
-                self.stream._active_queue,
-                "get",
-                new=get_mock):
+                self.stream._broker_wakeup,
+                "wait",
+                new=wait_mock):
 
             self.stream.start(self.xmlstream)
             run_coroutine(asyncio.sleep(0))
@@ -1716,6 +1860,52 @@ class TestStanzaStream(StanzaStreamTestBase):
             request.type_
         )
 
+    def test_nonsm_ping_on_shared_timers(self):
+        timers = stream.make_iq_timer_wheel(resolution=0.005, loop=self.loop)
+        self.stream._shared_timers = timers
+        self.stream.ping_interval = timedelta(seconds=0.01)
+        self.stream.ping_opportunistic_interval = timedelta(seconds=0.01)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+        self.assertIn((self.stream, "ping"), timers)
+
+        run_coroutine(asyncio.sleep(0.03))
+
+        request = self.sent_stanzas.get_nowait()
+        self.assertIsInstance(
+            request.payload,
+            ping.Ping,
+        )
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+        self.assertNotIn((self.stream, "ping"), timers)
+        self.assertEqual(len(timers), 0)
+
+    def test_nonsm_ping_timeout_on_shared_timers(self):
+        exc = None
+
+        def failure_handler(_exc):
+            nonlocal exc
+            exc = _exc
+
+        self.stream._shared_timers = stream.make_iq_timer_wheel(
+            resolution=0.005,
+            loop=self.loop,
+        )
+        self.stream.ping_interval = timedelta(seconds=0.01)
+        self.stream.ping_opportunistic_interval = timedelta(seconds=0.01)
+        self.stream.on_failure.connect(failure_handler)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0.06))
+
+        self.assertIsInstance(
+            exc,
+            ConnectionError
+        )
+
     def test_nonsm_ping_timeout(self):
         exc = None
 
@@ -1787,6 +1977,298 @@ class TestStanzaStream(StanzaStreamTestBase):
             token,
             stream.StanzaToken)
 
+    def test_enqueue_passes_priority_to_token(self):
+        token = self.stream._enqueue(
+            make_test_iq(),
+            priority=stream.StanzaPriority.BULK,
+        )
+        self.assertEqual(token.priority, stream.StanzaPriority.BULK)
+
+    def test_priority_weights(self):
+        self.assertDictEqual(
+            stream.StanzaStream.priority_weights,
+            {
+                stream.StanzaPriority.CONTROL: 8,
+                stream.StanzaPriority.INTERACTIVE: 4,
+                stream.StanzaPriority.BULK: 1,
+            }
+        )
+
+    def test_queue_depths(self):
+        self.assertDictEqual(
+            self.stream.queue_depths,
+            {
+                stream.StanzaPriority.CONTROL: 0,
+                stream.StanzaPriority.INTERACTIVE: 0,
+                stream.StanzaPriority.BULK: 0,
+            }
+        )
+
+        self.stream._enqueue(make_test_message())
+        self.stream._enqueue(make_test_message(),
+                             priority=stream.StanzaPriority.BULK)
+        self.stream._enqueue(make_test_message(),
+                             priority=stream.StanzaPriority.BULK)
+
+        self.assertDictEqual(
+            self.stream.queue_depths,
+            {
+                stream.StanzaPriority.CONTROL: 0,
+                stream.StanzaPriority.INTERACTIVE: 1,
+                stream.StanzaPriority.BULK: 2,
+            }
+        )
+
+    def test_control_stanzas_overtake_bulk_stanzas(self):
+        bulk = [make_test_message() for i in range(20)]
+        for msg in bulk:
+            self.stream._enqueue(msg, priority=stream.StanzaPriority.BULK)
+        iq = make_test_iq(type_=structs.IQType.RESULT)
+        self.stream._enqueue(iq, priority=stream.StanzaPriority.CONTROL)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        sent = []
+        while not self.sent_stanzas.empty():
+            sent.append(self.sent_stanzas.get_nowait())
+
+        self.assertSequenceEqual(sent, [iq] + bulk)
+
+    def test_bulk_stanzas_are_not_starved(self):
+        interactive = [make_test_message() for i in range(10)]
+        bulk = [make_test_message() for i in range(2)]
+        for msg in bulk:
+            self.stream._enqueue(msg, priority=stream.StanzaPriority.BULK)
+        for msg in interactive:
+            self.stream._enqueue(msg)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        sent = []
+        while not self.sent_stanzas.empty():
+            sent.append(self.sent_stanzas.get_nowait())
+
+        self.assertSequenceEqual(
+            sent,
+            interactive[:4] + bulk[:1] +
+            interactive[4:8] + bulk[1:] +
+            interactive[8:]
+        )
+
+    def test_shapers_default_to_None(self):
+        self.assertIsNone(self.stream.outbound_stanza_shaper)
+        self.assertIsNone(self.stream.outbound_byte_shaper)
+
+    def test_outbound_backlog(self):
+        self.assertEqual(self.stream.outbound_backlog, 0)
+        self.stream._enqueue(make_test_message())
+        self.stream._enqueue(make_test_message(),
+                             priority=stream.StanzaPriority.BULK)
+        self.assertEqual(self.stream.outbound_backlog, 2)
+
+    def test_stanza_shaper_paces_sending(self):
+        self.stream.outbound_stanza_shaper = stream.TokenBucket(20, 2)
+
+        msgs = [make_test_message() for i in range(5)]
+        tokens = [self.stream._enqueue(msg) for msg in msgs]
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertEqual(self.sent_stanzas.qsize(), 2)
+        self.assertEqual(self.stream.outbound_backlog, 3)
+        self.assertSequenceEqual(
+            [token.state for token in tokens],
+            [stream.StanzaState.SENT_WITHOUT_SM] * 2 +
+            [stream.StanzaState.ACTIVE] * 3
+        )
+
+        run_coroutine(asyncio.sleep(0.5))
+
+        sent = []
+        while not self.sent_stanzas.empty():
+            sent.append(self.sent_stanzas.get_nowait())
+        self.assertSequenceEqual(sent, msgs)
+        self.assertEqual(self.stream.outbound_backlog, 0)
+
+    def test_stanza_held_back_by_shaper_can_be_aborted(self):
+        self.stream.outbound_stanza_shaper = stream.TokenBucket(20, 1)
+
+        msgs = [make_test_message() for i in range(2)]
+        tokens = [self.stream._enqueue(msg) for msg in msgs]
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+        tokens[1].abort()
+        run_coroutine(asyncio.sleep(0.2))
+
+        self.assertIs(self.sent_stanzas.get_nowait(), msgs[0])
+        self.assertTrue(self.sent_stanzas.empty())
+        self.assertEqual(tokens[1].state, stream.StanzaState.ABORTED)
+
+    def test_byte_shaper_is_charged_with_serialised_size(self):
+        shaper = unittest.mock.Mock()
+        shaper.delay.return_value = 0
+        self.stream.outbound_byte_shaper = shaper
+
+        def send_xso(obj):
+            self.sent_stanzas.put_nowait(obj)
+            return 123
+
+        self.xmlstream.send_xso = send_xso
+
+        self.stream._enqueue(make_test_message())
+        self.stream._enqueue(make_test_message())
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertEqual(self.sent_stanzas.qsize(), 2)
+        self.assertSequenceEqual(
+            shaper.consume.mock_calls,
+            [
+                unittest.mock.call(123),
+                unittest.mock.call(123),
+            ]
+        )
+
+    def test_byte_shaper_in_debt_holds_back_stanzas(self):
+        self.stream.outbound_byte_shaper = stream.TokenBucket(1000, 100)
+        self.stream.outbound_byte_shaper.consume(150)
+
+        self.stream._enqueue(make_test_message())
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+        self.assertTrue(self.sent_stanzas.empty())
+
+        run_coroutine(asyncio.sleep(0.2))
+        self.assertEqual(self.sent_stanzas.qsize(), 1)
+
+    def test_watermarks_default_to_None(self):
+        self.assertIsNone(self.stream.outbound_high_watermark)
+        self.assertIsNone(self.stream.outbound_low_watermark)
+        self.assertIsNone(self.stream.inbound_high_watermark)
+        self.assertIsNone(self.stream.inbound_low_watermark)
+
+    def test_send_blocks_above_outbound_high_watermark(self):
+        self.stream.outbound_high_watermark = 2
+        self.stream.outbound_low_watermark = 0
+
+        msgs = [make_test_message() for i in range(3)]
+        self.stream._enqueue(msgs[0])
+        self.stream._enqueue(msgs[1])
+
+        task = asyncio.ensure_future(
+            self.stream._send_immediately(msgs[2])
+        )
+        run_coroutine(asyncio.sleep(0.01))
+        self.assertFalse(task.done())
+        self.assertEqual(self.stream.outbound_backlog, 2)
+
+        self.stream.start(self.xmlstream)
+        run_coroutine(task)
+
+        sent = []
+        while not self.sent_stanzas.empty():
+            sent.append(self.sent_stanzas.get_nowait())
+        self.assertSequenceEqual(sent, msgs)
+
+    def test_send_unblocks_at_default_low_watermark(self):
+        self.stream.outbound_high_watermark = 4
+
+        for i in range(4):
+            self.stream._enqueue(make_test_message())
+        self.assertFalse(self.stream._outbound_open.is_set())
+
+        self.stream._active_queue.get_nowait()
+        self.stream._update_outbound_flow_control()
+        self.assertFalse(self.stream._outbound_open.is_set())
+
+        self.stream._active_queue.get_nowait()
+        self.stream._update_outbound_flow_control()
+        self.assertTrue(self.stream._outbound_open.is_set())
+
+    def test_writing_paused_holds_back_stanzas_and_producers(self):
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        self.xmlstream.on_writing_paused()
+
+        msg1 = make_test_message()
+        token = self.stream._enqueue(msg1)
+        msg2 = make_test_message()
+        task = asyncio.ensure_future(
+            self.stream._send_immediately(msg2)
+        )
+        run_coroutine(asyncio.sleep(0.01))
+
+        self.assertTrue(self.sent_stanzas.empty())
+        self.assertEqual(token.state, stream.StanzaState.ACTIVE)
+        self.assertFalse(task.done())
+
+        self.xmlstream.on_writing_resumed()
+        run_coroutine(task)
+
+        self.assertIs(self.sent_stanzas.get_nowait(), msg1)
+        self.assertIs(self.sent_stanzas.get_nowait(), msg2)
+
+    def test_stop_releases_paused_writing(self):
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        self.xmlstream.on_writing_paused()
+        self.assertFalse(self.stream._outbound_open.is_set())
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertTrue(self.stream._outbound_open.is_set())
+
+    def test_inbound_high_watermark_pauses_reading(self):
+        self.stream.inbound_high_watermark = 2
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        self.stream.recv_stanza(make_test_message())
+        self.xmlstream.pause_reading.assert_not_called()
+        self.stream.recv_stanza(make_test_message())
+        self.xmlstream.pause_reading.assert_called_once_with()
+        self.stream.recv_stanza(make_test_message())
+        self.xmlstream.pause_reading.assert_called_once_with()
+        self.xmlstream.resume_reading.assert_not_called()
+
+        run_coroutine(asyncio.sleep(0))
+
+        self.xmlstream.resume_reading.assert_called_once_with()
+
+    def test_stop_resumes_paused_reading(self):
+        self.stream.inbound_high_watermark = 1
+        self.stream.start(self.xmlstream)
+        run_coroutine(asyncio.sleep(0))
+
+        self.stream.recv_stanza(make_test_message())
+        self.xmlstream.pause_reading.assert_called_once_with()
+
+        self.stream.stop()
+        run_coroutine(asyncio.sleep(0))
+
+        self.xmlstream.resume_reading.assert_called_once_with()
+
+    def test_iq_responses_are_enqueued_with_control_priority(self):
+        iq = make_test_iq()
+        iq.autoset_id()
+
+        self.stream.start(self.xmlstream)
+        with unittest.mock.patch.object(self.stream, "_enqueue") as enqueue:
+            self.stream.recv_stanza(iq)
+            run_coroutine(asyncio.sleep(0))
+
+        enqueue.assert_called_once_with(
+            unittest.mock.ANY,
+            priority=stream.StanzaPriority.CONTROL,
+        )
+
     def test_abort_stanza(self):
         iqs = [make_test_iq() for i in range(3)]
         self.stream.start(self.xmlstream)
@@ -2118,6 +2600,35 @@ class TestStanzaStream(StanzaStreamTestBase):
             mock.mock_calls
         )
 
+    def test_inbound_message_filters_are_keyed_by_type(self):
+        chat = stanza.Message(structs.MessageType.CHAT, from_=TEST_FROM)
+        groupchat = stanza.Message(structs.MessageType.GROUPCHAT,
+                                   from_=TEST_FROM)
+
+        mock = unittest.mock.Mock()
+        mock.groupchat.side_effect = lambda msg: msg
+        mock.cb.return_value = None
+
+        self.stream.app_inbound_message_filter.register(
+            mock.groupchat,
+            keys={structs.MessageType.GROUPCHAT},
+        )
+
+        with self.message_dispatcher.handler_context(None, None, mock.cb):
+            self.stream.recv_stanza(chat)
+            self.stream.recv_stanza(groupchat)
+            self.stream.start(self.xmlstream)
+            run_coroutine(asyncio.sleep(0))
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.cb(chat),
+                unittest.mock.call.groupchat(groupchat),
+                unittest.mock.call.cb(groupchat),
+            ],
+            mock.mock_calls
+        )
+
     def _test_outbound_presence_filter(self, filter_attr, **register_kwargs):
         pres = stanza.Presence(type_=structs.PresenceType.UNAVAILABLE)
         pres.autoset_id()
@@ -2928,7 +3439,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(self.stream._send_immediately(pres))
 
         base.register_iq_response_future.assert_not_called()
-        base._enqueue.assert_called_with(unittest.mock.ANY)
+        base._enqueue.assert_called_with(
+            unittest.mock.ANY,
+            priority=stream.StanzaPriority.INTERACTIVE,
+        )
 
     def test_send_awaits_stanza_token_for_message(self):
         message = make_test_presence()
@@ -2953,7 +3467,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(self.stream._send_immediately(message))
 
         base.register_iq_response_future.assert_not_called()
-        base._enqueue.assert_called_with(unittest.mock.ANY)
+        base._enqueue.assert_called_with(
+            unittest.mock.ANY,
+            priority=stream.StanzaPriority.INTERACTIVE,
+        )
 
     def test_send_awaits_stanza_token_for_iq_response(self):
         iq = make_test_iq(type_=aioxmpp.IQType.RESULT)
@@ -2978,7 +3495,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(self.stream._send_immediately(iq))
 
         base.register_iq_response_future.assert_not_called()
-        base._enqueue.assert_called_with(unittest.mock.ANY)
+        base._enqueue.assert_called_with(
+            unittest.mock.ANY,
+            priority=stream.StanzaPriority.INTERACTIVE,
+        )
 
     def test_send_awaits_stanza_token_for_iq_and_registers_for_reply(self):
         iq = make_test_iq()
@@ -3006,7 +3526,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
             base.iq_response_map.add_listener.assert_called_once_with(
                 (iq.to, iq.id_),
                 unittest.mock.ANY,
@@ -3053,7 +3576,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
             base.iq_response_map.add_listener.assert_called_once_with(
                 (iq.to, iq.id_),
                 unittest.mock.ANY,
@@ -3106,7 +3632,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
             base.iq_response_map.add_listener.assert_called_once_with(
                 (iq.to, iq.id_),
                 unittest.mock.ANY,
@@ -3150,13 +3679,45 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
 
             stanza_fut.set_result(None)
 
             with self.assertRaises(TimeoutError):
                 run_coroutine(task)
 
+    def test_send_timeout_is_counted_in_iq_response_stats(self):
+        iq = make_test_iq()
+
+        stanza_fut = asyncio.Future()
+        stanza_fut.set_result(None)
+
+        with unittest.mock.patch.object(self.stream, "_enqueue") as _enqueue:
+            _enqueue.return_value = stanza_fut
+
+            task = asyncio.async(self.stream._send_immediately(
+                iq,
+                timeout=0.001))
+            run_coroutine(asyncio.sleep(0))
+
+            self.assertEqual(self.stream.iq_response_stats.outstanding, 1)
+
+            with self.assertRaises(TimeoutError):
+                run_coroutine(task)
+
+        self.assertEqual(
+            self.stream.iq_response_stats,
+            stream.IQResponseStats(
+                outstanding=0,
+                registered=1,
+                answered=0,
+                timed_out=1,
+            )
+        )
+
     def test_send_invalidates_listener_if_enqueue_fails(self):
         iq = make_test_iq()
         exc = Exception()
@@ -3184,7 +3745,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
             base.iq_response_map.add_listener.assert_called_once_with(
                 (iq.to, iq.id_),
                 unittest.mock.ANY,
@@ -3229,7 +3793,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
             base.iq_response_map.add_listener.assert_called_once_with(
                 (iq.to, iq.id_),
                 unittest.mock.ANY,
@@ -3271,7 +3838,10 @@ class TestStanzaStream(StanzaStreamTestBase):
             run_coroutine(asyncio.sleep(0.01))
 
             self.assertFalse(task.done())
-            base._enqueue.assert_called_with(unittest.mock.ANY)
+            base._enqueue.assert_called_with(
+                unittest.mock.ANY,
+                priority=stream.StanzaPriority.INTERACTIVE,
+            )
             base.iq_response_map.add_listener.assert_called_once_with(
                 (iq.to, iq.id_),
                 unittest.mock.ANY,
@@ -3515,6 +4085,58 @@ class TestStanzaStream(StanzaStreamTestBase):
             unittest.mock.sentinel.result,
         )
 
+    def test_send_timeout_covers_cb_result(self):
+        cb = unittest.mock.Mock()
+        cb.return_value = asyncio.Future()
+
+        iq = make_test_iq()
+        iq.autoset_id()
+
+        self.stream.start(self.xmlstream)
+
+        task = asyncio.async(
+            self.stream._send_immediately(iq, cb=cb, timeout=0.05)
+        )
+
+        run_coroutine(self.sent_stanzas.get())
+        reply = iq.make_reply(type_=structs.IQType.RESULT)
+        self.stream.recv_stanza(reply)
+        run_coroutine(asyncio.sleep(0))
+
+        cb.assert_called_once_with(reply)
+        self.assertFalse(task.done())
+
+        with self.assertRaises(TimeoutError):
+            run_coroutine(task, timeout=1)
+
+        # a late result must not cause trouble
+        cb.return_value.set_result(unittest.mock.sentinel.result)
+        run_coroutine(asyncio.sleep(0))
+
+    def test_send_timeout_does_not_fire_after_cb_result(self):
+        cb = unittest.mock.Mock()
+        cb.return_value = asyncio.Future()
+
+        iq = make_test_iq()
+        iq.autoset_id()
+
+        self.stream.start(self.xmlstream)
+
+        task = asyncio.async(
+            self.stream._send_immediately(iq, cb=cb, timeout=0.05)
+        )
+
+        run_coroutine(self.sent_stanzas.get())
+        self.stream.recv_stanza(iq.make_reply(type_=structs.IQType.RESULT))
+        run_coroutine(asyncio.sleep(0))
+
+        cb.return_value.set_result(unittest.mock.sentinel.result)
+        self.assertEqual(
+            run_coroutine(task),
+            unittest.mock.sentinel.result,
+        )
+        run_coroutine(asyncio.sleep(0.1))
+
     def test_send_awaits_cb_result_and_reraises_exception(self):
         class FooException(Exception):
             pass
@@ -4060,6 +4682,186 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
             self.stream.sm_inbound_ctr
         )
 
+    def test_sm_request_after_stanzas(self):
+        iqs = [make_test_iq() for i in range(5)]
+
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+        self.stream.sm_request_after_stanzas = 3
+
+        self.stream._enqueue(iqs[0])
+        self.stream._enqueue(iqs[1])
+        run_coroutine(asyncio.sleep(0))
+        self.stream._enqueue(iqs[2])
+        self.stream._enqueue(iqs[3])
+        run_coroutine(asyncio.sleep(0))
+        self.stream._enqueue(iqs[4])
+        run_coroutine(asyncio.sleep(0))
+
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(iqs[0]),
+            XMLStreamMock.Send(iqs[1]),
+            XMLStreamMock.Send(iqs[2]),
+            XMLStreamMock.Send(iqs[3]),
+            XMLStreamMock.Send(nonza.SMRequest()),
+            XMLStreamMock.Send(iqs[4]),
+        ]))
+
+        self.assertEqual(len(self.stream.sm_unacked_list), 5)
+
+    def test_sm_request_due(self):
+        self.assertTrue(self.stream._sm_request_due())
+
+        self.stream.sm_request_after_bytes = 100
+        self.stream._next_ping_event_type = \
+            stream.PingEventType.SEND_OPPORTUNISTIC
+        self.assertFalse(self.stream._sm_request_due())
+
+        self.stream._sm_unrequested_bytes = 100
+        self.assertTrue(self.stream._sm_request_due())
+
+        self.stream._sm_unrequested_bytes = 0
+        self.stream._next_ping_event_type = stream.PingEventType.SEND_NOW
+        self.assertTrue(self.stream._sm_request_due())
+
+    def test_sm_ack_many_in_flight(self):
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+        self.stream.sm_request_after_stanzas = 10000
+
+        tokens = [
+            self.stream._enqueue(make_test_message())
+            for i in range(1000)
+        ]
+        run_coroutine(asyncio.sleep(0))
+
+        self.stream.sm_ack(600)
+        self.assertEqual(self.stream.sm_outbound_base, 600)
+        self.assertSequenceEqual(self.stream.sm_unacked_list, tokens[600:])
+        self.assertTrue(all(
+            token.state == stream.StanzaState.ACKED
+            for token in tokens[:600]
+        ))
+
+        self.stream.sm_ack(1000)
+        self.assertSequenceEqual(self.stream.sm_unacked_list, [])
+
+        # we don’t want XMLStreamMock testing
+        self.xmlstream = XMLStreamMock(self, loop=self)
+
+    def test_export_sm_state_requires_stopped_stream(self):
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+
+        with self.assertRaisesRegex(RuntimeError, "is running"):
+            self.stream.export_sm_state()
+
+    def test_export_sm_state_requires_enabled_sm(self):
+        with self.assertRaisesRegex(RuntimeError, "not enabled"):
+            self.stream.export_sm_state()
+
+    def test_export_sm_state_requires_resumable_stream(self):
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.sm_without_resume)
+        )
+        run_coroutine(self.stream.wait_stop())
+
+        with self.assertRaises(RuntimeError):
+            self.stream.export_sm_state()
+
+    def test_export_and_import_sm_state(self):
+        msgs = [make_test_message() for i in range(3)]
+
+        self.stream.start(self.xmlstream)
+        run_coroutine_with_peer(
+            self.stream.start_sm(),
+            self.xmlstream.run_test(self.successful_sm)
+        )
+        self.stream.sm_request_after_stanzas = 100
+
+        self.stream._enqueue(msgs[0])
+        self.stream._enqueue(msgs[1], priority=stream.StanzaPriority.BULK)
+        run_coroutine(self.xmlstream.run_test([
+            XMLStreamMock.Send(msgs[0]),
+            XMLStreamMock.Send(msgs[1]),
+        ]))
+        run_coroutine(self.stream.wait_stop())
+
+        self.stream._enqueue(msgs[2], priority=stream.StanzaPriority.CONTROL)
+
+        state = self.stream.export_sm_state()
+        self.assertEqual(state.id_, "foobar")
+        self.assertEqual(state.outbound_base, 0)
+        self.assertEqual(state.inbound_ctr, 0)
+        self.assertSequenceEqual(state.unacked_stanzas, msgs[:2])
+        self.assertSequenceEqual(state.queued_stanzas, msgs[2:])
+        self.assertSequenceEqual(
+            state.unacked_priorities,
+            [stream.StanzaPriority.INTERACTIVE, stream.StanzaPriority.BULK],
+        )
+        self.assertSequenceEqual(
+            state.queued_priorities,
+            [stream.StanzaPriority.CONTROL],
+        )
+
+        other = stream.StanzaStream(TEST_FROM.bare(), loop=self.loop)
+        tokens = other.import_sm_state(state)
+
+        self.assertTrue(other.sm_enabled)
+        self.assertTrue(other.sm_resumable)
+        self.assertEqual(other.sm_id, "foobar")
+        self.assertSequenceEqual(
+            [token.stanza for token in tokens],
+            msgs,
+        )
+        self.assertSequenceEqual(other.sm_unacked_list, tokens[:2])
+        self.assertTrue(all(
+            token.state == stream.StanzaState.SENT
+            for token in tokens[:2]
+        ))
+        self.assertEqual(tokens[2].state, stream.StanzaState.ACTIVE)
+        self.assertEqual(other.outbound_backlog, 1)
+        self.assertSequenceEqual(
+            [token.priority for token in tokens],
+            [stream.StanzaPriority.INTERACTIVE,
+             stream.StanzaPriority.BULK,
+             stream.StanzaPriority.CONTROL],
+        )
+
+        with self.assertRaisesRegex(RuntimeError, "already enabled"):
+            other.import_sm_state(state)
+
+    def test_import_sm_state_without_priorities(self):
+        msgs = [make_test_message() for i in range(2)]
+        state = stream.SMState(
+            id_="foobar",
+            location=None,
+            max_=None,
+            outbound_base=0,
+            inbound_ctr=0,
+            unacked_stanzas=msgs[:1],
+            queued_stanzas=msgs[1:],
+        )
+        self.assertIsNone(state.unacked_priorities)
+        self.assertIsNone(state.queued_priorities)
+
+        tokens = self.stream.import_sm_state(state)
+        self.assertSequenceEqual(
+            [token.priority for token in tokens],
+            [stream.StanzaPriority.INTERACTIVE] * 2,
+        )
+
     def test_sm_ack_requires_enabled_sm(self):
         with self.assertRaisesRegex(RuntimeError, "is not enabled"):
             self.stream.sm_ack(0)
@@ -4296,11 +5098,12 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
             self.stream.sm_inbound_ctr
         )
 
+        # the second and third stanza are received in one batch, thus their
+        # replies are sent in one batch with a single request
         run_coroutine(self.xmlstream.run_test([
             XMLStreamMock.Send(error_iqs.pop()),
             XMLStreamMock.Send(nonza.SMRequest()),
             XMLStreamMock.Send(error_iqs.pop()),
-            XMLStreamMock.Send(nonza.SMRequest()),
             XMLStreamMock.Send(error_iqs.pop()),
             XMLStreamMock.Send(nonza.SMRequest()),
         ]))
@@ -4341,11 +5144,12 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
             self.stream.sm_inbound_ctr
         )
 
+        # the second and third stanza are received in one batch, thus their
+        # replies are sent in one batch with a single request
         run_coroutine(self.xmlstream.run_test([
             XMLStreamMock.Send(error_iqs.pop()),
             XMLStreamMock.Send(nonza.SMRequest()),
             XMLStreamMock.Send(error_iqs.pop()),
-            XMLStreamMock.Send(nonza.SMRequest()),
             XMLStreamMock.Send(error_iqs.pop()),
             XMLStreamMock.Send(nonza.SMRequest()),
         ]))
@@ -5292,6 +6096,176 @@ class TestStanzaStreamSM(StanzaStreamTestBase):
         super().tearDown()
 
 
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.bucket = stream.TokenBucket(10, 5, clock=lambda: self.now)
+
+    def tearDown(self):
+        del self.bucket
+
+    def test_rejects_non_positive_arguments(self):
+        with self.assertRaisesRegex(ValueError, "rate must be positive"):
+            stream.TokenBucket(0, 1)
+        with self.assertRaisesRegex(ValueError, "burst must be positive"):
+            stream.TokenBucket(1, 0)
+
+    def test_starts_full(self):
+        self.assertEqual(self.bucket.level, 5)
+        self.assertEqual(self.bucket.delay(5), 0)
+
+    def test_consume_and_refill(self):
+        self.bucket.consume(5)
+        self.assertEqual(self.bucket.level, 0)
+        self.assertAlmostEqual(self.bucket.delay(1), 0.1)
+
+        self.now += 0.25
+        self.assertAlmostEqual(self.bucket.level, 2.5)
+        self.assertEqual(self.bucket.delay(1), 0)
+
+    def test_refill_is_capped_at_burst(self):
+        self.bucket.consume(1)
+        self.now += 100
+        self.assertEqual(self.bucket.level, 5)
+
+    def test_debt(self):
+        self.bucket.consume(25)
+        self.assertEqual(self.bucket.level, -20)
+        self.assertAlmostEqual(self.bucket.delay(), 2.0)
+
+        self.now += 2
+        self.assertEqual(self.bucket.delay(), 0)
+
+    def test_delay_caps_amount_at_burst(self):
+        self.bucket.consume(5)
+        self.assertAlmostEqual(self.bucket.delay(1000), 0.5)
+
+
+class TestIQResponseTable(unittest.TestCase):
+    def setUp(self):
+        self.loop = unittest.mock.Mock()
+        self.loop.time.return_value = 10.0
+        self.table = stream.IQResponseTable(resolution=1.0, loop=self.loop)
+
+    def _expire_timers(self, now):
+        self.loop.time.return_value = now
+        (_, cb), _ = self.loop.call_at.call_args
+        cb()
+
+    def test_is_tag_dispatcher(self):
+        self.assertIsInstance(self.table, callbacks.TagDispatcher)
+
+    def test_timeout_delivers_timeout_error(self):
+        listener = unittest.mock.Mock()
+        self.table.add_listener(("a", "1"), listener)
+        self.table.set_timeout(("a", "1"), 2)
+
+        self._expire_timers(12.0)
+
+        self.assertEqual(len(listener.error.mock_calls), 1)
+        _, (exc,), _ = listener.error.mock_calls[0]
+        self.assertIsInstance(exc, TimeoutError)
+
+        with self.assertRaises(KeyError):
+            self.table.unicast(("a", "1"), unittest.mock.sentinel.data)
+
+        self.assertEqual(
+            self.table.stats(),
+            stream.IQResponseStats(
+                outstanding=0,
+                registered=1,
+                answered=0,
+                timed_out=1,
+            )
+        )
+
+    def test_response_stops_timer(self):
+        listener = unittest.mock.Mock()
+        listener.data.return_value = True
+        self.table.add_listener(("a", "1"), listener)
+        self.table.set_timeout(("a", "1"), 2)
+        handle = self.loop.call_at.return_value
+
+        self.table.unicast(("a", "1"), unittest.mock.sentinel.data)
+
+        listener.data.assert_called_once_with(unittest.mock.sentinel.data)
+        handle.cancel.assert_called_once_with()
+        self.assertEqual(
+            self.table.stats(),
+            stream.IQResponseStats(
+                outstanding=0,
+                registered=1,
+                answered=1,
+                timed_out=0,
+            )
+        )
+
+    def test_set_timeout_without_listener_is_noop(self):
+        self.table.set_timeout(("a", "1"), 2)
+        self.loop.call_at.assert_not_called()
+
+    def test_replacing_invalid_listener_drops_old_timer(self):
+        old = unittest.mock.Mock()
+        old.is_valid.return_value = False
+        self.table.add_listener(("a", "1"), old)
+        self.table.set_timeout(("a", "1"), 2)
+
+        new = unittest.mock.Mock()
+        self.table.add_listener(("a", "1"), new)
+
+        self._expire_timers(12.0)
+
+        new.error.assert_not_called()
+        self.assertEqual(self.table.stats().outstanding, 1)
+
+    def test_close_all_stops_timers(self):
+        listener = unittest.mock.Mock()
+        self.table.add_listener(("a", "1"), listener)
+        self.table.set_timeout(("a", "1"), 2)
+        handle = self.loop.call_at.return_value
+
+        self.table.close_all(unittest.mock.sentinel.exc)
+
+        listener.error.assert_called_once_with(unittest.mock.sentinel.exc)
+        handle.cancel.assert_called_once_with()
+        self.assertEqual(self.table.stats().outstanding, 0)
+
+    def test_shared_timer_wheel(self):
+        timers = stream.make_iq_timer_wheel(resolution=1.0, loop=self.loop)
+        t1 = stream.IQResponseTable(timers=timers, loop=self.loop)
+        t2 = stream.IQResponseTable(timers=timers, loop=self.loop)
+
+        l1 = unittest.mock.Mock()
+        l2 = unittest.mock.Mock()
+        t1.add_listener(("a", "1"), l1)
+        t2.add_listener(("a", "1"), l2)
+        t1.set_timeout(("a", "1"), 2)
+        t2.set_timeout(("a", "1"), 5)
+        self.assertEqual(len(timers), 2)
+
+        self._expire_timers(12.0)
+
+        self.assertEqual(len(l1.error.mock_calls), 1)
+        l2.error.assert_not_called()
+        self.assertEqual(t1.stats().timed_out, 1)
+        self.assertEqual(t2.stats().outstanding, 1)
+
+    def test_close_all_with_shared_wheel_keeps_other_timers(self):
+        timers = stream.make_iq_timer_wheel(resolution=1.0, loop=self.loop)
+        t1 = stream.IQResponseTable(timers=timers, loop=self.loop)
+        t2 = stream.IQResponseTable(timers=timers, loop=self.loop)
+
+        t1.add_listener(("a", "1"), unittest.mock.Mock())
+        t2.add_listener(("a", "1"), unittest.mock.Mock())
+        t1.set_timeout(("a", "1"), 2)
+        t2.set_timeout(("a", "1"), 2)
+
+        t1.close_all(unittest.mock.sentinel.exc)
+
+        self.assertEqual(len(timers), 1)
+        self.assertIn((t2, ("a", "1")), timers)
+
+
 class TestStanzaToken(unittest.TestCase):
     def setUp(self):
         self.stanza = make_test_iq()
@@ -5310,6 +6284,20 @@ class TestStanzaToken(unittest.TestCase):
             stream.StanzaState.ACTIVE,
             self.token.state
         )
+        self.assertEqual(
+            stream.StanzaPriority.INTERACTIVE,
+            self.token.priority
+        )
+
+    def test_init_priority(self):
+        token = stream.StanzaToken(
+            self.stanza,
+            priority=stream.StanzaPriority.BULK,
+        )
+        self.assertEqual(
+            stream.StanzaPriority.BULK,
+            token.priority
+        )
 
     def test_state_not_writable(self):
         with self.assertRaises(AttributeError):
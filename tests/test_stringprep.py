@@ -19,11 +19,15 @@
 # <http://www.gnu.org/licenses/>.
 #
 ########################################################################
+import contextlib
+import random
 import unittest
+import unittest.mock
 
 from aioxmpp.stringprep import (
     nodeprep, resourceprep, nameprep,
-    check_bidi
+    check_bidi,
+    _nodeprep_full, _resourceprep_full, _nameprep_full,
 )
 
 
@@ -223,3 +227,90 @@ class TestResourceprep(unittest.TestCase):
         self.assertEqual(
             "\u0221",
             resourceprep("\u0221", allow_unassigned=True))
+
+
+class TestASCIIFastPath(unittest.TestCase):
+    CORPUS = [
+        "",
+        "romeo",
+        "Romeo",
+        "JULIET",
+        "capulet.lit",
+        "Example.COM",
+        "orchard",
+        "balcony/window",
+        "user+tag",
+        "foo bar",
+        "foo@bar",
+        "a:b",
+        "<tag>",
+        "\"quoted\"",
+        "it's",
+        "x&y",
+        "tab\there",
+        "line\nbreak",
+        "nul\x00byte",
+        "del\x7f",
+        "ÄÖÜ",
+        "ascii-then-\u00e4",
+        "I\u00adX",
+        "\u05d0\u05d1",
+        "\U0001f601",
+    ]
+
+    def _assert_equivalent(self, fast, full, s):
+        try:
+            expected = full(s)
+        except ValueError:
+            with self.assertRaises(ValueError, msg=repr(s)):
+                fast(s)
+        else:
+            self.assertEqual(expected, fast(s), repr(s))
+
+    def _check_profile(self, fast, full):
+        for c in map(chr, range(128)):
+            self._assert_equivalent(fast, full, c)
+
+        for s in self.CORPUS:
+            self._assert_equivalent(fast, full, s)
+
+        rng = random.Random(1)
+        for i in range(200):
+            s = "".join(
+                chr(rng.randrange(128))
+                for j in range(rng.randrange(1, 16))
+            )
+            self._assert_equivalent(fast, full, s)
+
+    def test_nodeprep(self):
+        self._check_profile(nodeprep, _nodeprep_full)
+
+    def test_resourceprep(self):
+        self._check_profile(resourceprep, _resourceprep_full)
+
+    def test_nameprep(self):
+        self._check_profile(nameprep, _nameprep_full)
+
+    def test_ascii_does_not_use_full_algorithm(self):
+        with contextlib.ExitStack() as stack:
+            fulls = [
+                stack.enter_context(unittest.mock.patch(
+                    "aioxmpp.stringprep._{}_full".format(name)
+                ))
+                for name in ["nodeprep", "resourceprep", "nameprep"]
+            ]
+
+            self.assertEqual("romeo.montague", nodeprep("Romeo.Montague"))
+            self.assertEqual("Balcony", resourceprep("Balcony"))
+            self.assertEqual("capulet.lit", nameprep("Capulet.LIT"))
+
+        for full in fulls:
+            full.assert_not_called()
+
+    def test_non_ascii_uses_full_algorithm(self):
+        with unittest.mock.patch(
+                "aioxmpp.stringprep._nodeprep_full") as full:
+            result = nodeprep("\u00e4", allow_unassigned=True)
+
+        full.assert_called_once_with("\u00e4", allow_unassigned=True)
+        self.assertEqual(result, full.return_value)
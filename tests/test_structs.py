@@ -21,7 +21,10 @@
 ########################################################################
 import collections.abc
 import enum
+import pickle
+import sys
 import unittest
+import unittest.mock
 import warnings
 
 import aioxmpp
@@ -575,6 +578,125 @@ class TestJID(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, "too long"):
             structs.JID.fromstr("foo/" + "ü"*512)
 
+    def test_bare_of_bare_jid_returns_self(self):
+        j = structs.JID("foo", "example.test", None)
+        self.assertIs(j.bare(), j)
+
+    def test_bare_does_not_reapply_stringprep(self):
+        j = structs.JID("foo", "example.test", "bar")
+        with unittest.mock.patch("aioxmpp.structs.nodeprep") as nodeprep, \
+                unittest.mock.patch("aioxmpp.structs.nameprep") as nameprep:
+            bare = j.bare()
+        nodeprep.assert_not_called()
+        nameprep.assert_not_called()
+        self.assertIsInstance(bare, structs.JID)
+        self.assertEqual(bare, structs.JID("foo", "example.test", None))
+
+    def test_stringprep_results_are_cached(self):
+        structs.JID("cached", "cache.example.test", "res")
+        with unittest.mock.patch("aioxmpp.structs.nodeprep") as nodeprep, \
+                unittest.mock.patch("aioxmpp.structs.nameprep") as nameprep, \
+                unittest.mock.patch(
+                    "aioxmpp.structs.resourceprep") as resourceprep:
+            j = structs.JID("cached", "cache.example.test", "res")
+        nodeprep.assert_not_called()
+        nameprep.assert_not_called()
+        resourceprep.assert_not_called()
+        self.assertEqual(j, ("cached", "cache.example.test", "res"))
+
+    def test_stringprep_cache_is_keyed_on_strictness(self):
+        structs.JID("foo", "example.com", "\U0001f601", strict=False)
+        with self.assertRaises(ValueError):
+            structs.JID("foo", "example.com", "\U0001f601")
+
+    def test_stringprep_failures_are_not_cached(self):
+        for i in range(2):
+            with self.assertRaises(ValueError):
+                structs.JID("\u0007", "example.com", "bar")
+
+    def test_fromstr_returns_cached_object(self):
+        j1 = structs.JID.fromstr("interned@example.test/res")
+        j2 = structs.JID.fromstr("interned@example.test/res")
+        self.assertIs(j1, j2)
+
+        j3 = structs.JID.fromstr("interned@example.test/res", strict=False)
+        self.assertEqual(j1, j3)
+        self.assertIsNot(j1, j3)
+
+    def test_str_is_cached(self):
+        j = structs.JID("foo", "example.test", "bar")
+        s = str(j)
+        self.assertEqual(s, "foo@example.test/bar")
+        self.assertIs(str(j), s)
+        self.assertIs(str(structs.JID("foo", "example.test", "bar")), s)
+
+    def test_bare_is_cached(self):
+        j = structs.JID("foo", "example.test", "bar")
+        self.assertIs(j.bare(), j.bare())
+
+    def test_form_caches_are_bounded(self):
+        maxsize = structs._JID_FORM_CACHE_SIZE
+        for i in range(maxsize + 10):
+            j = structs.JID("foo", "example.test", "r{}".format(i))
+            self.assertEqual(str(j), "foo@example.test/r{}".format(i))
+            self.assertEqual(j.bare(), structs.JID("foo", "example.test",
+                                                   None))
+        self.assertLessEqual(len(structs._jid_str_cache), maxsize)
+        self.assertLessEqual(len(structs._jid_bare_cache), maxsize)
+
+    def test_bare_of_subclass_is_not_shared(self):
+        class SubJID(structs.JID):
+            __slots__ = []
+
+        j = structs.JID("foo", "example.test", "bar")
+        j.bare()
+        sub = SubJID("foo", "example.test", "bar")
+        self.assertIsInstance(sub.bare(), SubJID)
+
+    def test_is_compact(self):
+        j = structs.JID("foo", "example.test", "bar")
+        str(j)
+        j.bare()
+        self.assertFalse(hasattr(j, "__dict__"))
+        self.assertEqual(
+            sys.getsizeof(j),
+            sys.getsizeof(("foo", "example.test", "bar")),
+        )
+
+    def test_hash_and_equality_compatible_with_tuple(self):
+        j = structs.JID("foo", "example.test", "bar")
+        str(j)
+        j.bare()
+        t = ("foo", "example.test", "bar")
+        self.assertEqual(hash(j), hash(t))
+        self.assertEqual(j, t)
+        self.assertEqual(j, structs.JID.fromstr("foo@example.test/bar",
+                                                strict=False))
+
+    def test_cannot_set_or_delete_attributes(self):
+        j = structs.JID("foo", "example.test", "bar")
+        with self.assertRaises(AttributeError):
+            j.foo = "bar"
+        with self.assertRaises(AttributeError):
+            del j.localpart
+
+    def test_pickle(self):
+        j = structs.JID("foo", "example.test", "bar")
+        str(j)
+        j.bare()
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            data = pickle.dumps(j, protocol)
+            j2 = pickle.loads(data)
+            self.assertIsInstance(j2, structs.JID)
+            self.assertEqual(j, j2)
+            self.assertEqual(str(j), str(j2))
+
+    def test_fromstr_cache_is_bounded(self):
+        maxsize = structs._fromstr_cache.maxsize
+        for i in range(maxsize + 10):
+            structs.JID.fromstr("user{}@example.test".format(i))
+        self.assertLessEqual(len(structs._fromstr_cache), maxsize)
+
 
 class TestPresenceShow(unittest.TestCase):
     def test_aliases(self):
@@ -21,12 +21,13 @@
 ########################################################################
 import asyncio
 import contextlib
+import inspect
 import unittest
 import unittest.mock
 
 import aioxmpp.tasks as tasks
 
-from aioxmpp.testutils import CoroutineMock
+from aioxmpp.testutils import CoroutineMock, run_coroutine
 
 
 @asyncio.coroutine
@@ -145,3 +146,69 @@ class TestTaskPool(unittest.TestCase):
             result,
             async_()
         )
+
+    def test_spawn_enforces_total_limit(self):
+        p = tasks.TaskPool(max_tasks=2)
+        t1 = p.spawn(set(), _infinite_loop)
+        t2 = p.spawn({"foo"}, _infinite_loop)
+
+        self.assertEqual(p.get_task_count(()), 2)
+        self.assertEqual(p.get_task_count("foo"), 1)
+
+        coro_fun = unittest.mock.Mock()
+        with self.assertRaisesRegex(RuntimeError, "exhausted"):
+            p.spawn(set(), coro_fun)
+        coro_fun.assert_not_called()
+
+        t1.cancel()
+        t2.cancel()
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertEqual(p.get_task_count(()), 0)
+        self.assertEqual(p.get_task_count("foo"), 0)
+
+        p.spawn(set(), _infinite_loop).cancel()
+        run_coroutine(asyncio.sleep(0))
+
+    def test_spawn_enforces_group_limit(self):
+        self.p.set_limit("foo", 1)
+        t1 = self.p.spawn({"foo"}, _infinite_loop)
+
+        with self.assertRaises(RuntimeError):
+            self.p.spawn({"foo", "bar"}, _infinite_loop)
+        self.assertEqual(self.p.get_task_count("bar"), 0)
+
+        t2 = self.p.spawn({"bar"}, _infinite_loop)
+
+        t1.cancel()
+        t2.cancel()
+        run_coroutine(asyncio.sleep(0))
+
+    def test_default_limit_applies_to_groups_without_limit(self):
+        p = tasks.TaskPool(default_limit=1)
+        t1 = p.spawn({"foo"}, _infinite_loop)
+        t2 = p.spawn({"bar"}, _infinite_loop)
+
+        with self.assertRaises(RuntimeError):
+            p.spawn({"foo"}, _infinite_loop)
+
+        t3 = p.spawn(set(), _infinite_loop)
+
+        for t in [t1, t2, t3]:
+            t.cancel()
+        run_coroutine(asyncio.sleep(0))
+
+    def test_add_accounts_coroutine(self):
+        self.p.set_limit("foo", 1)
+        t1 = self.p.add({"foo"}, _infinite_loop())
+        self.assertEqual(self.p.get_task_count("foo"), 1)
+
+        coro = _infinite_loop()
+        with self.assertRaises(RuntimeError):
+            self.p.add({"foo"}, coro)
+        self.assertEqual(inspect.getgeneratorstate(coro),
+                         inspect.GEN_CLOSED)
+
+        t1.cancel()
+        run_coroutine(asyncio.sleep(0))
+        self.assertEqual(self.p.get_task_count("foo"), 0)
@@ -27,6 +27,7 @@ import unittest.mock
 
 import lxml.sax
 
+import xml.parsers.expat as pyexpat
 import xml.sax as xml_sax
 import xml.sax.handler as saxhandler
 
@@ -410,6 +411,38 @@ class TestXMPPXMLGenerator(XMLTestCase):
 
         self.assertNotIn(b"\r", self.buf.getvalue())
 
+    def test_characters_writes_long_data_in_slices(self):
+        out = unittest.mock.Mock()
+        gen = xml.XMPPXMLGenerator(out, additional_escapes="x")
+        gen.CHARACTERS_CHUNK_SIZE = 4
+        gen.startDocument()
+        gen.startElementNS((None, "foo"), None, None)
+        gen.characters("")
+        out.reset_mock()
+
+        data = "fnord<&>xbc\u00e4\U0001f600xyz"
+        gen.characters(data)
+
+        written = [args[0] for _, args, _ in out.write.mock_calls]
+        self.assertEqual(
+            [b"fnor", b"d&lt;&amp;&gt;", b"&#120;bc\xc3\xa4",
+             "\U0001f600".encode("utf-8") + b"&#120;yz"],
+            written,
+        )
+
+        out.reset_mock()
+        gen.characters("xbcd")
+        out.write.assert_called_once_with(b"&#120;bcd")
+
+    def test_characters_rejects_control_characters_in_long_data(self):
+        gen = xml.XMPPXMLGenerator(self.buf)
+        gen.CHARACTERS_CHUNK_SIZE = 4
+        gen.startDocument()
+        gen.startElementNS((None, "foo"), None, None)
+        with self.assertRaises(ValueError):
+            gen.characters("fnordfnord\x00")
+        self.assertNotIn(b"fnord", self.buf.getvalue())
+
     def test_reject_processing_instruction(self):
         gen = xml.XMPPXMLGenerator(self.buf)
         gen.startDocument()
@@ -1082,6 +1115,29 @@ class TestXMPPXMLGenerator(XMLTestCase):
 
             buf.write.assert_called_once_with(m.bio1.getbuffer())
 
+    def test_last_buffer_size(self):
+        gen = xml.XMPPXMLGenerator(self.buf)
+        self.assertEqual(gen.last_buffer_size, 0)
+
+        gen.startDocument()
+        gen.startElementNS((None, "foo"), None, None)
+        with gen.buffer():
+            gen.characters("fnord")
+        self.assertEqual(gen.last_buffer_size, len(b">fnord"))
+
+        with gen.buffer():
+            gen.characters("\u00e4")
+        self.assertEqual(gen.last_buffer_size, 2)
+
+        with self.assertRaises(ValueError):
+            with gen.buffer():
+                gen.characters("foo")
+                raise ValueError()
+        self.assertEqual(gen.last_buffer_size, 0)
+
+        with self.assertRaises(AttributeError):
+            gen.last_buffer_size = 10
+
     def test_buffer_provides_exception_safety_for_startPrefixMapping(self):
         buf = io.BytesIO()
         gen = xml.XMPPXMLGenerator(buf)
@@ -1220,6 +1276,217 @@ class TestXMPPXMLGenerator(XMLTestCase):
             buf.getvalue(),
         )
 
+    def test_buffer_provides_exception_safety_for_new_prefix_mappings(self):
+        buf = io.BytesIO()
+        gen = xml.XMPPXMLGenerator(buf)
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+
+        class FooException(Exception):
+            pass
+
+        with self.assertRaises(FooException):
+            with gen.buffer():
+                gen.startPrefixMapping("foo", "uri:bar")
+                raise FooException()
+
+        gen.startElementNS(("uri:foo", "child"), None, {})
+        gen.endElementNS(("uri:foo", "child"), None)
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo"><child/></root>',
+            buf.getvalue(),
+        )
+
+    def test_buffer_provides_exception_safety_for_endPrefixMapping(self):
+        buf = io.BytesIO()
+        gen = xml.XMPPXMLGenerator(buf)
+        gen.startDocument()
+        gen.startPrefixMapping("foo", "uri:bar")
+        gen.startElementNS(("uri:foo", "root"), None, {})
+
+        class FooException(Exception):
+            pass
+
+        with self.assertRaises(FooException):
+            with gen.buffer():
+                gen.endElementNS(("uri:foo", "root"), None)
+                gen.endPrefixMapping("foo")
+                raise FooException()
+
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endPrefixMapping("foo")
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo" xmlns:foo="uri:bar"/>',
+            buf.getvalue(),
+        )
+
+    def test_buffer_does_not_copy_state_between_elements(self):
+        buf = io.BytesIO()
+        gen = xml.XMPPXMLGenerator(buf)
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+        gen.startElementNS(("uri:foo", "child"), None, {})
+        gen.endElementNS(("uri:foo", "child"), None)
+
+        ns_map = gen._curr_ns_map
+
+        with unittest.mock.patch("copy.copy") as copy_:
+            with gen.buffer():
+                gen.startElementNS(("uri:foo", "child"), None, {})
+                gen.endElementNS(("uri:foo", "child"), None)
+
+        copy_.assert_not_called()
+        self.assertIs(gen._curr_ns_map, ns_map)
+
+    def test_start_tag_template_is_reused(self):
+        gen = xml.XMPPXMLGenerator(self.buf, sorted_attributes=True)
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+
+        attrs = {
+            (None, "a"): "x",
+            ("uri:bar", "b"): "y",
+        }
+        gen.startElementNS(("uri:baz", "child"), None, attrs)
+        gen.endElementNS(("uri:baz", "child"), None)
+
+        attrs = {
+            (None, "a"): "<z>",
+            ("uri:bar", "b"): "'",
+        }
+        with unittest.mock.patch.object(gen, "_qname") as _qname:
+            gen.startElementNS(("uri:baz", "child"), None, attrs)
+            gen.characters("text")
+            gen.endElementNS(("uri:baz", "child"), None)
+
+        _qname.assert_not_called()
+
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo">'
+            b'<child xmlns="uri:baz" xmlns:ns0="uri:bar" a="x" ns0:b="y"/>'
+            b'<child xmlns="uri:baz" xmlns:ns0="uri:bar" a="&lt;z&gt;"'
+            b' ns0:b="\'">text</child>'
+            b'</root>',
+            self.buf.getvalue()
+        )
+
+    def test_start_tag_template_depends_on_namespaces_in_scope(self):
+        gen = xml.XMPPXMLGenerator(self.buf)
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+        gen.startElementNS(("uri:bar", "child"), None, {})
+        gen.endElementNS(("uri:bar", "child"), None)
+        gen.startPrefixMapping("x", "uri:bar")
+        gen.startElementNS(("uri:bar", "container"), None, {})
+        gen.startElementNS(("uri:bar", "child"), None, {})
+        gen.endElementNS(("uri:bar", "child"), None)
+        gen.endElementNS(("uri:bar", "container"), None)
+        gen.endPrefixMapping("x")
+        gen.startElementNS(("uri:bar", "child"), None, {})
+        gen.endElementNS(("uri:bar", "child"), None)
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo">'
+            b'<child xmlns="uri:bar"/>'
+            b'<x:container xmlns:x="uri:bar"><x:child/></x:container>'
+            b'<child xmlns="uri:bar"/>'
+            b'</root>',
+            self.buf.getvalue()
+        )
+
+    def test_start_tag_template_not_used_with_prefix_mappings(self):
+        gen = xml.XMPPXMLGenerator(self.buf)
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+        gen.startElementNS(("uri:foo", "child"), None, {})
+        gen.endElementNS(("uri:foo", "child"), None)
+        gen.startPrefixMapping("x", "uri:bar")
+        gen.startElementNS(("uri:foo", "child"), None,
+                           {("uri:bar", "a"): "v"})
+        gen.endElementNS(("uri:foo", "child"), None)
+        gen.endPrefixMapping("x")
+        gen.startElementNS(("uri:foo", "child"), None, {})
+        gen.endElementNS(("uri:foo", "child"), None)
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo">'
+            b'<child/>'
+            b'<child xmlns:x="uri:bar" x:a="v"/>'
+            b'<child/>'
+            b'</root>',
+            self.buf.getvalue()
+        )
+
+    def test_start_tag_template_cache_is_bounded(self):
+        gen = xml.XMPPXMLGenerator(self.buf)
+        gen.START_TAG_CACHE_SIZE = 2
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+        for i in range(5):
+            gen.startElementNS(("uri:foo", "c{}".format(i)), None, {})
+            gen.endElementNS(("uri:foo", "c{}".format(i)), None)
+            self.assertLessEqual(len(gen._start_tag_templates), 2)
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo"><c0/><c1/><c2/><c3/><c4/></root>',
+            self.buf.getvalue()
+        )
+
+    def test_start_tag_template_used_after_buffer_rollback(self):
+        gen = xml.XMPPXMLGenerator(self.buf)
+        gen.startDocument()
+        gen.startElementNS(("uri:foo", "root"), None, {})
+
+        class FooException(Exception):
+            pass
+
+        with self.assertRaises(FooException):
+            with gen.buffer():
+                gen.startElementNS(("uri:bar", "child"), None,
+                                   {("uri:baz", "a"): "v"})
+                raise FooException()
+
+        for i in range(2):
+            with gen.buffer():
+                gen.startElementNS(("uri:bar", "child"), None,
+                                   {("uri:baz", "a"): "v"})
+                gen.endElementNS(("uri:bar", "child"), None)
+
+        gen.startElementNS(("uri:baz", "child"), None, {})
+        gen.endElementNS(("uri:baz", "child"), None)
+        gen.endElementNS(("uri:foo", "root"), None)
+        gen.endDocument()
+
+        self.assertEqual(
+            b'<?xml version="1.0"?>'
+            b'<root xmlns="uri:foo">'
+            b'<child xmlns="uri:bar" xmlns:ns0="uri:baz" ns0:a="v"/>'
+            b'<child xmlns="uri:bar" xmlns:ns0="uri:baz" ns0:a="v"/>'
+            b'<child xmlns="uri:baz"/>'
+            b'</root>',
+            self.buf.getvalue()
+        )
+
     def test_attributes_in_ns_get_prefix_even_if_ns_matches_default(self):
         gen = xml.XMPPXMLGenerator(self.buf, sorted_attributes=True)
         gen.startDocument()
@@ -1417,6 +1684,19 @@ class TestXMLStreamWriter(unittest.TestCase):
             b'</stream:stream>',
             self.buf.getvalue())
 
+    def test_send_returns_number_of_bytes_written(self):
+        gen = self._make_gen()
+        gen.start()
+        before = len(self.buf.getvalue())
+        result = gen.send(Cls())
+        self.assertEqual(result, len(self.buf.getvalue()) - before)
+        self.assertEqual(result, len(b'<bar xmlns="uri:foo"/>'))
+
+        before = len(self.buf.getvalue())
+        result = gen.send(Cls())
+        self.assertEqual(result, len(self.buf.getvalue()) - before)
+        gen.close()
+
     def test_send_object_inherits_namespaces(self):
         obj = Cls()
         gen = self._make_gen(nsmap={"jc": "uri:foo"})
@@ -2075,6 +2355,219 @@ class TestXMPPXMLProcessor(unittest.TestCase):
     #         cm.exception.condition
     #     )
 
+    def test_process_events(self):
+        results = []
+
+        def recv(obj):
+            nonlocal results
+            results.append(obj)
+
+        class Foo(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+            attr = xso.Attr("attr")
+            text = xso.Text()
+
+        self.proc.stanza_parser = xso.XSOParser()
+        self.proc.stanza_parser.add_class(Foo, recv)
+
+        self.proc.startDocument()
+        self.proc.startElementNS(self.STREAM_HEADER_TAG, None,
+                                 self.STREAM_HEADER_ATTRS)
+        self.proc.process_events([
+            ("start", "uri:foo", "foo", {(None, "attr"): "fnord"}),
+            ("text", "foo"),
+            ("text", "bar"),
+            ("end",),
+        ])
+
+        self.assertEqual(1, len(results))
+        self.assertIsInstance(results[0], Foo)
+        self.assertEqual(results[0].attr, "fnord")
+        self.assertEqual(results[0].text, "foobar")
+
+        self.proc.endElementNS(self.STREAM_HEADER_TAG, None)
+        self.proc.endDocument()
+
+    def test_process_events_requires_stream_header(self):
+        with self.assertRaises(RuntimeError):
+            self.proc.process_events([
+                ("start", "uri:foo", "foo", {}),
+                ("end",),
+            ])
+
+        self.proc.startDocument()
+        with self.assertRaises(RuntimeError):
+            self.proc.process_events([
+                ("start", "uri:foo", "foo", {}),
+                ("end",),
+            ])
+
+    def test_process_events_exception_recovery_and_reporting(self):
+        catch_exception = unittest.mock.MagicMock()
+
+        elements = []
+
+        def recv(obj):
+            nonlocal elements
+            elements.append(obj)
+
+        class Foo(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+            t = xso.Text(type_=xso.Float())
+
+        self.proc.on_exception = catch_exception
+        self.proc.stanza_parser = xso.XSOParser()
+        self.proc.stanza_parser.add_class(Foo, recv)
+        self.proc.startDocument()
+        self.proc.startElementNS(self.STREAM_HEADER_TAG,
+                                 None,
+                                 self.STREAM_HEADER_ATTRS)
+        self.proc.process_events([
+            ("start", "uri:foo", "foo", {}),
+            ("text", "foobar"),
+            ("end",),
+        ])
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.__bool__(),
+                unittest.mock.call(unittest.mock.ANY)
+            ],
+            catch_exception.mock_calls)
+        _, (exc,), _ = catch_exception.mock_calls[1]
+        self.assertIsInstance(exc, ValueError)
+
+        self.proc.process_events([
+            ("start", "uri:foo", "foo", {}),
+            ("end",),
+        ])
+
+        self.assertTrue(elements)
+        self.assertIsInstance(elements[0], Foo)
+
+        self.proc.endElementNS(self.STREAM_HEADER_TAG, None)
+        self.proc.endDocument()
+
+    def test_process_events_reraise_without_handler(self):
+        class Foo(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+        self.proc.stanza_parser = xso.XSOParser()
+        self.proc.stanza_parser.add_class(Foo, unittest.mock.Mock())
+        self.proc.startDocument()
+        self.proc.startElementNS(self.STREAM_HEADER_TAG,
+                                 None,
+                                 self.STREAM_HEADER_ATTRS)
+
+        with self.assertRaises(xso.UnknownTopLevelTag):
+            self.proc.process_events([
+                ("start", None, "foo", {}),
+                ("end",),
+            ])
+
+    def _start_with_foo(self, recv):
+        class Foo(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+            attr = xso.Attr("attr", default=None)
+            text = xso.Text(type_=xso.Float())
+
+        self.proc.stanza_parser = xso.XSOParser()
+        self.proc.stanza_parser.add_class(Foo, recv)
+        self.proc.startDocument()
+        self.proc.startElementNS(self.STREAM_HEADER_TAG, None,
+                                 self.STREAM_HEADER_ATTRS)
+        return Foo
+
+    def test_process_events_consults_offload(self):
+        recv = unittest.mock.Mock()
+        self._start_with_foo(recv)
+        self.proc.offload = unittest.mock.Mock()
+        self.proc.offload.return_value = True
+        events = [
+            ("start", "uri:foo", "foo", {}),
+            ("text", "1.0"),
+            ("end",),
+        ]
+
+        self.proc.process_events(events)
+
+        self.proc.offload.assert_called_once_with(events)
+        recv.assert_not_called()
+
+        self.proc.offload.return_value = False
+        self.proc.process_events(events)
+        self.assertEqual(len(recv.mock_calls), 1)
+
+        self.proc.offload.reset_mock()
+        self.proc.process_events(events, allow_offload=False)
+        self.proc.offload.assert_not_called()
+        self.assertEqual(len(recv.mock_calls), 2)
+
+    def test_parse_detached(self):
+        recv = unittest.mock.Mock()
+        Foo = self._start_with_foo(recv)
+
+        cb, obj = self.proc.parse_detached([
+            ("start", "uri:foo", "foo", {(None, "attr"): "fnord"}),
+            ("text", "1."),
+            ("text", "5"),
+            ("end",),
+        ])
+
+        recv.assert_not_called()
+        self.assertIs(cb, recv)
+        self.assertIsInstance(obj, Foo)
+        self.assertEqual(obj.attr, "fnord")
+        self.assertEqual(obj.text, 1.5)
+
+        # the processor is still usable
+        self.proc.process_events([
+            ("start", "uri:foo", "foo", {}),
+            ("end",),
+        ])
+        self.assertEqual(len(recv.mock_calls), 1)
+
+    def test_parse_detached_raises(self):
+        self._start_with_foo(unittest.mock.Mock())
+
+        with self.assertRaises(xso.UnknownTopLevelTag):
+            self.proc.parse_detached([
+                ("start", None, "foo", {}),
+                ("end",),
+            ])
+
+        with self.assertRaises(ValueError):
+            self.proc.parse_detached([
+                ("start", "uri:foo", "foo", {}),
+                ("text", "foobar"),
+                ("end",),
+            ])
+
+    def test_parse_detached_rejects_incomplete_element(self):
+        self._start_with_foo(unittest.mock.Mock())
+
+        with self.assertRaisesRegex(ValueError, "incomplete"):
+            self.proc.parse_detached([
+                ("start", "uri:foo", "foo", {}),
+            ])
+
+    def test_process_detached(self):
+        cb = unittest.mock.Mock()
+        self.proc.process_detached((cb, unittest.mock.sentinel.obj))
+        cb.assert_called_once_with(unittest.mock.sentinel.obj)
+
+    def test_process_detached_exception(self):
+        exc = ValueError()
+        with self.assertRaises(ValueError):
+            self.proc.process_detached(exc=exc)
+
+        self.proc.on_exception = unittest.mock.Mock()
+        self.proc.process_detached(exc=exc)
+        self.proc.on_exception.assert_called_once_with(exc)
+
     def test_forwards_xml_lang_to_parser(self):
         results = []
 
@@ -2152,6 +2645,182 @@ class Testmake_parser(unittest.TestCase):
         )
 
 
+class TestBatchingExpatReader(unittest.TestCase):
+    STREAM_HEADER = (
+        "<stream:stream xmlns:stream='{}' xmlns='uri:foo'"
+        " version='1.0' from='example.test' "
+        "to='foo@example.test' id='foobarbaz'>".format(namespaces.xmlstream)
+    )
+
+    def setUp(self):
+        self.handler = unittest.mock.Mock()
+        self.p = xml.BatchingExpatReader()
+        self.p.setContentHandler(self.handler)
+
+    def tearDown(self):
+        del self.p
+        del self.handler
+
+    def test_is_incremental(self):
+        self.assertTrue(
+            hasattr(self.p, "feed")
+        )
+
+    def test_content_handler(self):
+        self.assertIs(self.p.getContentHandler(), self.handler)
+
+    def test_forwards_stream_header_and_footer(self):
+        self.p.feed(self.STREAM_HEADER)
+        self.p.feed("</stream:stream>")
+        self.p.close()
+
+        self.assertSequenceEqual(
+            self.handler.mock_calls,
+            [
+                unittest.mock.call.startDocument(),
+                unittest.mock.call.startElementNS(
+                    (namespaces.xmlstream, "stream"),
+                    None,
+                    {
+                        (None, "version"): "1.0",
+                        (None, "from"): "example.test",
+                        (None, "to"): "foo@example.test",
+                        (None, "id"): "foobarbaz",
+                    }
+                ),
+                unittest.mock.call.endElementNS(
+                    (namespaces.xmlstream, "stream"),
+                    None,
+                ),
+                unittest.mock.call.endDocument(),
+            ]
+        )
+
+    def test_forwards_top_level_character_data(self):
+        self.p.feed(self.STREAM_HEADER)
+        self.handler.mock_calls.clear()
+        self.p.feed(" \n<foo/>")
+
+        self.assertIn(
+            unittest.mock.call.characters(" \n"),
+            self.handler.mock_calls,
+        )
+
+    def test_batches_stream_level_elements(self):
+        self.p.feed(self.STREAM_HEADER)
+        self.handler.mock_calls.clear()
+
+        self.p.feed("<foo a='1'><bar xml:lang='de'>")
+        self.assertSequenceEqual(self.handler.mock_calls, [])
+
+        self.p.feed("text</bar>foo<baz xmlns='uri:baz'/></foo>")
+        self.assertSequenceEqual(
+            self.handler.mock_calls,
+            [
+                unittest.mock.call.process_events([
+                    ("start", "uri:foo", "foo", {(None, "a"): "1"}),
+                    ("start", "uri:foo", "bar",
+                     {(namespaces.xml, "lang"): "de"}),
+                    ("text", "text"),
+                    ("end",),
+                    ("text", "foo"),
+                    ("start", "uri:baz", "baz", {}),
+                    ("end",),
+                    ("end",),
+                ])
+            ]
+        )
+
+    def test_works_with_XMPPXMLProcessor(self):
+        results = []
+
+        class Bar(xso.XSO):
+            TAG = ("uri:foo", "bar")
+
+            text = xso.Text()
+
+        class Foo(xso.XSO):
+            TAG = ("uri:foo", "foo")
+
+            attr = xso.Attr("a")
+            bars = xso.ChildList([Bar])
+
+        proc = xml.XMPPXMLProcessor()
+        proc.stanza_parser = xso.XSOParser()
+        proc.stanza_parser.add_class(Foo, results.append)
+        proc.on_stream_footer = unittest.mock.Mock()
+        self.p.setContentHandler(proc)
+
+        self.p.feed(self.STREAM_HEADER)
+        self.p.feed("<foo a='x'><bar>1</bar><bar>2</bar></foo>")
+        self.p.feed("<foo a='y'/></stream:stream>")
+        self.p.close()
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].attr, "x")
+        self.assertSequenceEqual(
+            [bar.text for bar in results[0].bars],
+            ["1", "2"]
+        )
+        self.assertEqual(results[1].attr, "y")
+        proc.on_stream_footer.assert_called_once_with()
+
+    def test_reject_comments(self):
+        self.p.feed(self.STREAM_HEADER)
+        with self.assertRaises(errors.StreamError) as cm:
+            self.p.feed("<!-- foo -->")
+        self.assertEqual(
+            (namespaces.streams, "restricted-xml"),
+            cm.exception.condition
+        )
+
+    def test_reject_dtd(self):
+        with self.assertRaises(errors.StreamError) as cm:
+            self.p.feed("<!DOCTYPE foo [<!ENTITY bar 'baz'>]>")
+        self.assertEqual(
+            (namespaces.streams, "restricted-xml"),
+            cm.exception.condition
+        )
+
+    def test_forwards_processing_instructions(self):
+        self.p.feed(self.STREAM_HEADER)
+        self.p.feed("<?foo bar?>")
+        self.handler.processingInstruction.assert_called_once_with(
+            "foo", "bar"
+        )
+
+    def test_syntax_error_raises_SAXParseException(self):
+        self.p.feed(self.STREAM_HEADER)
+        with self.assertRaises(xml_sax.SAXParseException):
+            self.p.feed("<foo></bar>")
+
+    def test_undefined_entity_raises_SAXParseException(self):
+        self.p.feed(self.STREAM_HEADER)
+        with self.assertRaises(xml_sax.SAXParseException) as cm:
+            self.p.feed("<foo>&foo;</foo>")
+
+        self.assertTrue(
+            cm.exception.getException().args[0].startswith(
+                pyexpat.errors.XML_ERROR_UNDEFINED_ENTITY
+            )
+        )
+
+    def test_close_allows_reuse(self):
+        self.p.feed(self.STREAM_HEADER)
+        self.p.feed("</stream:stream>")
+        self.p.close()
+        self.handler.mock_calls.clear()
+
+        self.p.feed(self.STREAM_HEADER)
+
+        self.assertSequenceEqual(
+            self.handler.mock_calls[:1],
+            [
+                unittest.mock.call.startDocument(),
+            ]
+        )
+
+
 class TestXMPPLexicalHandler(unittest.TestCase):
     def setUp(self):
         self.proc = xml.XMPPLexicalHandler()
@@ -1880,6 +1880,226 @@ class TestXMLStreamClass(unittest.TestCase):
         self.assertIs(ClsB.DECLARE_NS, d)
 
 
+class TestXMLStreamClassCompiledParser(unittest.TestCase):
+    def setUp(self):
+        self.ctx = xso_model.Context()
+
+        class Bar(xso.XSO):
+            TAG = "bar"
+            COMPILED_PARSER = True
+
+            lang = xso.Attr(
+                tag=(namespaces.xml, "lang"),
+                missing=xso.lang_attr
+            )
+
+            text = xso.Text(default=None)
+
+        class Foo(xso.XSO):
+            TAG = "foo"
+            COMPILED_PARSER = True
+
+            a = xso.Attr("a", type_=xso.Integer())
+            b = xso.Attr("b", default=None)
+
+            child = xso.Child([Bar])
+
+        self.Bar = Bar
+        self.Foo = Foo
+
+    def tearDown(self):
+        del self.Foo
+        del self.Bar
+
+    def _parse(self, cls, tree, ctx=None):
+        caught_obj = None
+
+        def catch(obj):
+            nonlocal caught_obj
+            caught_obj = obj
+
+        sd = xso.SAXDriver(
+            functools.partial(from_wrapper,
+                              cls.parse_events,
+                              ctx=ctx or self.ctx),
+            on_emit=catch
+        )
+        lxml.sax.saxify(etree.fromstring(tree), sd)
+        return caught_obj
+
+    def test_default_is_off(self):
+        self.assertFalse(xso.XSO.COMPILED_PARSER)
+
+    def test_compile_parser_is_cached(self):
+        parser = self.Foo.compile_parser()
+        self.assertIs(parser, self.Foo.compile_parser())
+
+    def test_compile_parser_is_not_inherited(self):
+        class Sub(self.Foo):
+            c = xso.Attr("c", default=None)
+
+        self.Foo.compile_parser()
+        self.assertIsNot(Sub.compile_parser(), self.Foo.compile_parser())
+
+    def test_parse_events_uses_compiled_parser(self):
+        with unittest.mock.patch(
+                "aioxmpp.xso.model._compile_parse_events") as compile_:
+            gen = self.Foo.parse_events((None, "foo", {}), self.ctx)
+
+        compile_.assert_called_once_with(self.Foo)
+        compile_().assert_called_once_with((None, "foo", {}), self.ctx)
+        self.assertEqual(gen, compile_()())
+
+    def test_parse_events_does_not_compile_if_disabled(self):
+        self.Foo.COMPILED_PARSER = False
+
+        with unittest.mock.patch(
+                "aioxmpp.xso.model._compile_parse_events") as compile_:
+            self._parse(self.Foo, "<foo a='1'/>")
+
+        compile_.assert_not_called()
+
+    def test_parse_same_as_generic(self):
+        tree = (
+            "<foo a='10' b='x' c='ignored'>"
+            "<bar xml:lang='de'>text</bar>"
+            "</foo>"
+        )
+        obj = self._parse(self.Foo, tree)
+
+        self.Foo.COMPILED_PARSER = False
+        self.Bar.COMPILED_PARSER = False
+        reference = self._parse(self.Foo, tree)
+
+        self.assertEqual(obj.a, reference.a)
+        self.assertEqual(obj.b, reference.b)
+        self.assertEqual(obj.child.text, reference.child.text)
+        self.assertEqual(obj.child.lang, reference.child.lang)
+        self.assertEqual(obj.a, 10)
+        self.assertEqual(obj.b, "x")
+        self.assertEqual(obj.child.text, "text")
+
+    def test_handle_missing_attributes(self):
+        obj = self._parse(self.Foo, "<foo a='1'/>")
+        self.assertEqual(obj.a, 1)
+        self.assertIsNone(obj.b)
+        self.assertIsNone(obj.child)
+
+    def test_handle_missing_attribute_with_unknown_attribute(self):
+        with self.assertRaisesRegex(ValueError, "missing attribute"):
+            self._parse(self.Foo, "<foo b='1' c='2'/>")
+
+    def test_unknown_attribute_policy(self):
+        self.Foo.UNKNOWN_ATTR_POLICY = xso.UnknownAttrPolicy.FAIL
+
+        with self.assertRaisesRegex(ValueError, "unexpected attribute"):
+            self._parse(self.Foo, "<foo a='1' c='2'/>")
+
+    def test_unknown_child_policy(self):
+        self.Foo.UNKNOWN_CHILD_POLICY = xso.UnknownChildPolicy.FAIL
+
+        with self.assertRaisesRegex(ValueError, "unexpected child"):
+            self._parse(self.Foo, "<foo a='1'><baz/></foo>")
+
+    def test_unexpected_text(self):
+        with self.assertRaisesRegex(ValueError, "unexpected text"):
+            self._parse(self.Foo, "<foo a='1'>text</foo>")
+
+    def test_error_handler_on_broken_attribute(self):
+        self.Foo.xso_error_handler = unittest.mock.Mock()
+        self.Foo.xso_error_handler.return_value = True
+
+        obj = self._parse(self.Foo, "<foo a='x' b='y'/>")
+
+        self.Foo.xso_error_handler.assert_called_once_with(
+            self.Foo.a.xq_descriptor,
+            "x",
+            unittest.mock.ANY,
+        )
+
+        with self.assertRaisesRegex(
+                AttributeError,
+                "attribute value is incomplete"):
+            obj.a
+
+        self.assertEqual(obj.b, "y")
+
+    def test_lang_propagation(self):
+        ctx = xso_model.Context()
+        ctx.lang = "de-DE"
+
+        obj = self._parse(self.Bar, "<bar/>", ctx)
+        self.assertEqual(obj.lang, "de-DE")
+
+        obj = self._parse(self.Bar, "<bar xml:lang='en-GB'/>", ctx)
+        self.assertEqual(obj.lang, "en-GB")
+        self.assertEqual(ctx.lang, "de-DE")
+
+    def test_lang_propagation_to_child(self):
+        class Baz(xso.XSO):
+            TAG = "baz"
+            COMPILED_PARSER = True
+
+            lang = xso.Attr(
+                tag=(namespaces.xml, "lang"),
+                missing=xso.lang_attr
+            )
+
+            child = xso.Child([self.Bar])
+
+        ctx = xso_model.Context()
+        ctx.lang = "de-DE"
+
+        obj = self._parse(Baz, "<baz xml:lang='en-GB'><bar/></baz>", ctx)
+        self.assertEqual(obj.lang, "en-GB")
+        self.assertEqual(obj.child.lang, "en-GB")
+        self.assertEqual(ctx.lang, "de-DE")
+
+    def test_setattr_discards_compiled_parser(self):
+        old_parser = self.Foo.compile_parser()
+        self.Foo.c = xso.Attr("c", default=None)
+        self.assertIsNot(old_parser, self.Foo.compile_parser())
+
+        obj = self._parse(self.Foo, "<foo a='1' c='2'/>")
+        self.assertEqual(obj.c, "2")
+
+    def test_setattr_on_base_discards_compiled_parser_of_subclass(self):
+        class Sub(self.Foo):
+            pass
+
+        old_parser = Sub.compile_parser()
+        self.Foo.UNKNOWN_CHILD_POLICY = xso.UnknownChildPolicy.FAIL
+        self.assertIsNot(old_parser, Sub.compile_parser())
+
+        with self.assertRaisesRegex(ValueError, "unexpected child"):
+            self._parse(Sub, "<foo a='1'><baz/></foo>")
+
+    def test_register_child_discards_compiled_parser(self):
+        class Baz(xso.XSO):
+            TAG = "baz"
+
+        old_parser = self.Foo.compile_parser()
+        self.Foo.register_child(self.Foo.child, Baz)
+        self.assertIsNot(old_parser, self.Foo.compile_parser())
+
+        obj = self._parse(self.Foo, "<foo a='1'><baz/></foo>")
+        self.assertIsInstance(obj.child, Baz)
+
+    def test_calls_validate_and_xso_after_load(self):
+        with contextlib.ExitStack() as stack:
+            validate = stack.enter_context(
+                unittest.mock.patch.object(self.Foo, "validate")
+            )
+            after_load = stack.enter_context(
+                unittest.mock.patch.object(self.Foo, "xso_after_load")
+            )
+
+            self._parse(self.Foo, "<foo a='1'/>")
+
+        validate.assert_called_once_with()
+        after_load.assert_called_once_with()
+
+
 class TestCapturingXMLStreamClass(unittest.TestCase):
     def test_parse_events_uses_capture(self):
         class Cls(metaclass=xso_model.CapturingXMLStreamClass):
@@ -2270,6 +2490,231 @@ class TestXSO(XMLTestCase):
         del self.Cls
 
 
+class TestXSOCompactStorage(unittest.TestCase):
+    def setUp(self):
+        class Bar(xso.XSO):
+            TAG = "bar"
+            COMPACT_STORAGE = True
+
+            text = xso.Text(default=None)
+
+        class Baz(xso.XSO):
+            TAG = "baz"
+            COMPACT_STORAGE = True
+
+            text = xso.Text(default=None)
+
+        class Foo(xso.XSO):
+            TAG = "foo"
+            COMPACT_STORAGE = True
+
+            a = xso.Attr("a", type_=xso.Integer())
+            b = xso.Attr("b", default=None)
+            child = xso.Child([Bar])
+            children = xso.ChildList([Baz])
+
+        self.Bar = Bar
+        self.Baz = Baz
+        self.Foo = Foo
+
+    def tearDown(self):
+        del self.Foo
+        del self.Baz
+        del self.Bar
+
+    def test_default_is_off(self):
+        self.assertFalse(xso.XSO.COMPACT_STORAGE)
+
+        class Cls(xso.XSO):
+            pass
+
+        self.assertIsInstance(Cls()._xso_contents, dict)
+
+    def test_uses_compact_contents(self):
+        obj = self.Foo()
+        self.assertIsInstance(
+            obj._xso_contents,
+            self.Foo.compact_contents_type(),
+        )
+        self.assertIsInstance(
+            obj._xso_contents,
+            collections.abc.MutableMapping,
+        )
+
+    def test_compact_contents_type_is_cached(self):
+        self.assertIs(
+            self.Foo.compact_contents_type(),
+            self.Foo.compact_contents_type(),
+        )
+
+    def test_compact_contents_has_no_dict(self):
+        obj = self.Foo()
+        with self.assertRaises(AttributeError):
+            obj._xso_contents.__dict__
+
+    def test_get_set_delete(self):
+        obj = self.Foo()
+
+        with self.assertRaisesRegex(AttributeError, "attribute is unset"):
+            obj.a
+        self.assertIsNone(obj.b)
+        self.assertIsNone(obj.child)
+        self.assertSequenceEqual(obj.children, [])
+
+        obj.a = 10
+        obj.b = "foo"
+        bar = self.Bar()
+        obj.child = bar
+        self.assertEqual(obj.a, 10)
+        self.assertEqual(obj.b, "foo")
+        self.assertIs(obj.child, bar)
+
+        del obj.child
+        self.assertIsNone(obj.child)
+
+    def test_mapping_interface(self):
+        contents = self.Foo.compact_contents_type()()
+        a = self.Foo.a.xq_descriptor
+        b = self.Foo.b.xq_descriptor
+
+        self.assertEqual(len(contents), 0)
+        self.assertNotIn(a, contents)
+        self.assertIsNone(contents.get(a))
+        with self.assertRaises(KeyError):
+            contents[a]
+        with self.assertRaises(KeyError):
+            del contents[a]
+
+        contents[a] = 1
+        self.assertEqual(contents.setdefault(a, 2), 1)
+        self.assertEqual(contents.setdefault(b, 3), 3)
+        self.assertEqual(dict(contents), {a: 1, b: 3})
+        self.assertEqual(len(contents), 2)
+
+        del contents[a]
+        self.assertEqual(dict(contents), {b: 3})
+
+    def test_unknown_keys_are_supported(self):
+        contents = self.Foo.compact_contents_type()()
+        key = object()
+
+        with self.assertRaises(KeyError):
+            contents[key]
+
+        contents[key] = "foo"
+        self.assertEqual(contents[key], "foo")
+        self.assertEqual(dict(contents), {key: "foo"})
+
+        del contents[key]
+        self.assertEqual(len(contents), 0)
+
+    def test_descriptor_added_after_instance_creation(self):
+        obj = self.Foo()
+        old_type = type(obj._xso_contents)
+
+        self.Foo.c = xso.Attr("c", default=None)
+
+        self.assertIsNot(self.Foo.compact_contents_type(), old_type)
+        self.assertIsNone(obj.c)
+        obj.c = "foo"
+        self.assertEqual(obj.c, "foo")
+
+        obj = self.Foo()
+        obj.c = "bar"
+        self.assertEqual(obj.c, "bar")
+
+    def test_subclass_has_own_type(self):
+        class Sub(self.Foo):
+            c = xso.Attr("c", default=None)
+
+        obj = Sub()
+        self.assertIsNot(
+            type(obj._xso_contents),
+            self.Foo.compact_contents_type(),
+        )
+        obj.a = 1
+        obj.c = "foo"
+        self.assertEqual(obj.a, 1)
+        self.assertEqual(obj.c, "foo")
+
+    def test_mark_incomplete(self):
+        obj = self.Foo()
+        self.Foo.a.xq_descriptor.mark_incomplete(obj)
+
+        with self.assertRaisesRegex(
+                AttributeError,
+                "attribute value is incomplete"):
+            obj.a
+
+    def test_validate(self):
+        obj = self.Foo()
+        obj.a = 1
+        obj.child = self.Bar()
+        obj.children.append(self.Baz())
+
+        with contextlib.ExitStack() as stack:
+            bar_validate = stack.enter_context(
+                unittest.mock.patch.object(self.Bar, "validate")
+            )
+            baz_validate = stack.enter_context(
+                unittest.mock.patch.object(self.Baz, "validate")
+            )
+
+            obj.validate()
+
+        bar_validate.assert_called_once_with()
+        baz_validate.assert_called_once_with()
+
+    def test_copy(self):
+        obj = self.Foo()
+        obj.a = 1
+        obj.child = self.Bar()
+
+        copied = copy.copy(obj)
+        self.assertIsInstance(copied._xso_contents,
+                              self.Foo.compact_contents_type())
+        self.assertEqual(copied.a, 1)
+        self.assertIs(copied.child, obj.child)
+
+    def test_deepcopy(self):
+        obj = self.Foo()
+        obj.a = 1
+        obj.child = self.Bar()
+        obj.child.text = "foo"
+
+        copied = copy.deepcopy(obj)
+        self.assertIsInstance(copied._xso_contents,
+                              self.Foo.compact_contents_type())
+        self.assertEqual(copied.a, 1)
+        self.assertIsNot(copied.child, obj.child)
+        self.assertEqual(copied.child.text, "foo")
+
+    def test_parse(self):
+        caught_obj = None
+
+        def catch(obj):
+            nonlocal caught_obj
+            caught_obj = obj
+
+        sd = xso.SAXDriver(
+            functools.partial(from_wrapper,
+                              self.Foo.parse_events,
+                              ctx=xso_model.Context()),
+            on_emit=catch
+        )
+        lxml.sax.saxify(
+            etree.fromstring("<foo a='1'><baz>x</baz><baz>y</baz></foo>"),
+            sd
+        )
+
+        self.assertEqual(caught_obj.a, 1)
+        self.assertIsNone(caught_obj.b)
+        self.assertEqual(
+            [child.text for child in caught_obj.children],
+            ["x", "y"],
+        )
+
+
 class TestCapturingXSO(unittest.TestCase):
     def test_is_capturing_xml_stream_class(self):
         self.assertIsInstance(
@@ -2803,6 +3248,61 @@ class TestText(XMLTestCase):
 
         type_.coerce.assert_called_once_with("foo")
 
+    def test_to_sax_emits_pieces_from_iter_format(self):
+        dest = unittest.mock.MagicMock()
+        type_ = xso.Base64Binary()
+        type_.FORMAT_CHUNK_SIZE = 3
+
+        prop = xso.Text(type_=type_)
+        instance = make_instance_mock({
+            prop: b"fnord"
+        })
+
+        prop.to_sax(instance, dest)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.characters("Zm5v"),
+                unittest.mock.call.characters("cmQ="),
+            ],
+            dest.mock_calls
+        )
+
+    def test_from_incremental_parser(self):
+        instance = make_instance_mock()
+        parser = unittest.mock.Mock()
+        parser.close.return_value = b"foo"
+
+        prop = xso.Text(type_=xso.Base64Binary())
+        self.assertTrue(prop.from_incremental_parser(instance, parser))
+
+        parser.close.assert_called_once_with()
+        self.assertDictEqual(
+            {
+                prop: b"foo",
+            },
+            instance._xso_contents
+        )
+
+    def test_from_incremental_parser_reraises(self):
+        instance = make_instance_mock()
+        parser = unittest.mock.Mock()
+        parser.close.side_effect = ValueError()
+
+        prop = xso.Text(type_=xso.Base64Binary())
+        with self.assertRaises(ValueError):
+            prop.from_incremental_parser(instance, parser)
+
+    def test_from_incremental_parser_erroneous_as_absent(self):
+        instance = make_instance_mock()
+        parser = unittest.mock.Mock()
+        parser.close.side_effect = ValueError()
+
+        prop = xso.Text(type_=xso.Base64Binary(),
+                        erroneous_as_absent=True)
+        self.assertFalse(prop.from_incremental_parser(instance, parser))
+        self.assertDictEqual({}, instance._xso_contents)
+
     def test_to_sax_unset(self):
         instance = make_instance_mock()
 
@@ -3071,6 +3571,156 @@ class TestChild(XMLTestCase):
         instance = Cls()
         instance.prop = None
 
+    def test_default_lazy_is_False(self):
+        prop = xso.Child([])
+        self.assertIs(prop.lazy, False)
+
+    def test_lazy_controllable_from_init(self):
+        prop = xso.Child([], lazy=True)
+        self.assertIs(prop.lazy, True)
+
+    def _make_lazy_classes(self):
+        class Leaf(xso.XSO):
+            TAG = "bar"
+
+            attr = xso.Attr("a", type_=xso.Integer())
+            lang = xso.LangAttr()
+            text = xso.Text(default=None)
+
+        class Parent(xso.XSO):
+            TAG = "foo"
+
+            child = xso.Child([Leaf], lazy=True)
+
+        return Parent, Leaf
+
+    def _parse(self, cls, tree, ctx=None):
+        caught_obj = None
+
+        def catch(obj):
+            nonlocal caught_obj
+            caught_obj = obj
+
+        sd = xso.SAXDriver(
+            functools.partial(from_wrapper,
+                              cls.parse_events,
+                              ctx=ctx or self.ctx),
+            on_emit=catch
+        )
+        lxml.sax.saxify(etree.fromstring(tree), sd)
+        return caught_obj
+
+    def test_lazy_from_events_does_not_parse(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        with unittest.mock.patch.object(Leaf, "parse_events") as parse_events:
+            obj = self._parse(Parent, "<foo><bar a='1'>baz</bar></foo>")
+
+        parse_events.assert_not_called()
+        self.assertIsInstance(obj, Parent)
+
+    def test_lazy_parses_on_access(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo><bar a='1'>baz<x/></bar></foo>")
+
+        child = obj.child
+        self.assertIsInstance(child, Leaf)
+        self.assertEqual(child.attr, 1)
+        self.assertEqual(child.text, "baz")
+        self.assertIs(child, obj.child)
+
+    def test_lazy_parses_only_once(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo><bar a='1'/></foo>")
+
+        with unittest.mock.patch.object(
+                Leaf, "parse_events",
+                wraps=Leaf.parse_events) as parse_events:
+            obj.child
+            obj.child
+
+        self.assertEqual(len(parse_events.mock_calls), 1)
+
+    def test_lazy_uses_context_of_parent(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        ctx = xso_model.Context()
+        ctx.lang = structs.LanguageTag.fromstr("de-DE")
+
+        obj = self._parse(Parent, "<foo><bar a='1'/></foo>", ctx)
+        ctx.lang = structs.LanguageTag.fromstr("en-GB")
+
+        self.assertEqual(
+            obj.child.lang,
+            structs.LanguageTag.fromstr("de-DE"),
+        )
+
+    def test_lazy_reports_errors_on_access(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo><bar a='x'/></foo>")
+
+        with self.assertRaises(ValueError):
+            obj.child
+
+        with self.assertRaisesRegex(
+                AttributeError,
+                "attribute value is incomplete"):
+            obj.child
+
+    def test_lazy_absent_child(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo/>")
+        self.assertIsNone(obj.child)
+
+    def test_lazy_satisfies_required(self):
+        class Leaf(xso.XSO):
+            TAG = "bar"
+
+        class Parent(xso.XSO):
+            TAG = "foo"
+
+            child = xso.Child([Leaf], required=True, lazy=True)
+
+        obj = self._parse(Parent, "<foo><bar/></foo>")
+        self.assertIsInstance(obj.child, Leaf)
+
+        with self.assertRaisesRegex(ValueError, "missing required member"):
+            self._parse(Parent, "<foo/>")
+
+    def test_lazy_validate_contents_does_not_parse(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo><bar a='x'/></foo>")
+
+        with unittest.mock.patch.object(Leaf, "parse_events") as parse_events:
+            Parent.child.validate_contents(obj)
+
+        parse_events.assert_not_called()
+
+    def test_lazy_assignment_replaces_pending_child(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo><bar a='x'/></foo>")
+
+        new_child = Leaf()
+        obj.child = new_child
+        self.assertIs(obj.child, new_child)
+
+    def test_lazy_to_sax_parses(self):
+        Parent, Leaf = self._make_lazy_classes()
+
+        obj = self._parse(Parent, "<foo><bar a='1'/></foo>")
+
+        dest = unittest.mock.Mock()
+        with unittest.mock.patch.object(Leaf, "unparse_to_sax") as unparse:
+            Parent.child.to_sax(obj, dest)
+
+        unparse.assert_called_once_with(dest)
+
     def tearDown(self):
         del self.ClsA
         del self.ClsLeaf
@@ -3760,6 +4410,28 @@ class TestChildText(XMLTestCase):
             ],
             type_mock.mock_calls)
 
+    def test_to_sax_emits_pieces_from_iter_format(self):
+        dest = unittest.mock.MagicMock()
+        type_ = xso.Base64Binary()
+        type_.FORMAT_CHUNK_SIZE = 3
+
+        prop = xso.ChildText("body", type_=type_)
+        instance = make_instance_mock({
+            prop: b"fnord"
+        })
+
+        prop.to_sax(instance, dest)
+
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.startElementNS((None, "body"), None, {}),
+                unittest.mock.call.characters("Zm5v"),
+                unittest.mock.call.characters("cmQ="),
+                unittest.mock.call.endElementNS((None, "body"), None)
+            ],
+            dest.mock_calls
+        )
+
     def test_to_sax_declare_prefix(self):
         prefix = object()
         dest = unittest.mock.MagicMock()
@@ -3851,6 +4523,92 @@ class TestChildText(XMLTestCase):
 
         type_.coerce.assert_called_once_with("bar")
 
+    def test_from_events_uses_incremental_parser(self):
+        instance = make_instance_mock()
+
+        prop = xso.ChildText("body", type_=xso.Base64Binary(),
+                             child_policy=xso.UnknownChildPolicy.DROP)
+
+        with unittest.mock.patch.object(
+                xso.Base64Binary,
+                "incremental_parser") as incremental_parser:
+            incremental_parser().close.return_value = b"fnord"
+            incremental_parser.reset_mock()
+            drive_from_events(
+                prop.from_events, instance,
+                etree.fromstring("<body>Zm5v<a/>cmQ=</body>"),
+                self.ctx,
+            )
+
+        incremental_parser.assert_called_once_with()
+        self.assertSequenceEqual(
+            [
+                unittest.mock.call.feed("Zm5v"),
+                unittest.mock.call.feed("cmQ="),
+                unittest.mock.call.close(),
+            ],
+            incremental_parser().mock_calls
+        )
+        self.assertDictEqual(
+            {
+                prop: b"fnord",
+            },
+            instance._xso_contents
+        )
+
+    def test_from_events_decodes_base64(self):
+        instance = make_instance_mock()
+
+        prop = xso.ChildText("body", type_=xso.Base64Binary())
+        drive_from_events(
+            prop.from_events, instance,
+            etree.fromstring("<body>Zm5vcmQ=</body>"),
+            self.ctx,
+        )
+        drive_from_events(
+            prop.from_events, instance,
+            etree.fromstring("<body/>"),
+            self.ctx,
+        )
+        self.assertDictEqual(
+            {
+                prop: b"",
+            },
+            instance._xso_contents
+        )
+
+        drive_from_events(
+            prop.from_events, instance,
+            etree.fromstring("<body>Zm5vcmQ=</body>"),
+            self.ctx,
+        )
+        self.assertDictEqual(
+            {
+                prop: b"fnord",
+            },
+            instance._xso_contents
+        )
+
+    def test_from_events_incremental_erroneous_as_absent(self):
+        instance = make_instance_mock()
+
+        prop = xso.ChildText("body", type_=xso.Base64Binary(),
+                             erroneous_as_absent=True)
+        drive_from_events(
+            prop.from_events, instance,
+            etree.fromstring("<body>Zm5vc</body>"),
+            self.ctx,
+        )
+        self.assertDictEqual({}, instance._xso_contents)
+
+        prop = xso.ChildText("body", type_=xso.Base64Binary())
+        with self.assertRaises(ValueError):
+            drive_from_events(
+                prop.from_events, instance,
+                etree.fromstring("<body>Zm5vc</body>"),
+                self.ctx,
+            )
+
     def test_validate_contents_rejects_unset_and_undefaulted(self):
         instance = make_instance_mock()
 
@@ -4978,6 +5736,22 @@ class TestSAXDriver(unittest.TestCase):
 
         sd.close()
 
+    def test_send_events(self):
+        events = [
+            ("start", None, "foo", {}),
+            ("text", "bar"),
+            ("start", None, "baz", {(None, "a"): "b"}),
+            ("end",),
+            ("end",)
+        ]
+
+        sd = xso.SAXDriver(self.catchall)
+        sd.send_events(events)
+
+        self.assertSequenceEqual(events, self.l)
+
+        sd.close()
+
     def test_forwards_nested_elements(self):
         tree = etree.fromstring("<foo><bar/></foo>")
         sd = xso.SAXDriver(self.catchall)
@@ -6110,6 +6884,70 @@ class TestXSOParser(XMLTestCase):
         self.assertIsInstance(result, TestStanza)
         self.assertEqual(result.contents, "barbaz")
 
+    def test_parse_base64_text_incrementally(self):
+        class Dummy(xso.XSO):
+            TAG = "uri:bar", "dummy"
+
+        class TestStanza(xso.XSO):
+            TAG = "uri:bar", "foo"
+
+            contents = xso.Text(type_=xso.Base64Binary())
+            _ = xso.Child([Dummy])
+
+        tree = etree.fromstring(
+            "<foo xmlns='uri:bar'>Zm5v<dummy/>cmQ=</foo>"
+        )
+
+        for compiled in [True, False]:
+            TestStanza.COMPILED_PARSER = compiled
+            with unittest.mock.patch.object(
+                    xso.IncrementalBase64Decoder,
+                    "feed",
+                    autospec=True,
+                    side_effect=xso.IncrementalBase64Decoder.feed) as feed:
+                result = self.run_parser_one([TestStanza], tree)
+
+            self.assertEqual(result.contents, b"fnord")
+            self.assertSequenceEqual(
+                ["Zm5v", "cmQ="],
+                [args[1] for args, _ in feed.call_args_list]
+            )
+
+    def test_parse_base64_text_without_text_keeps_default(self):
+        class TestStanza(xso.XSO):
+            TAG = "uri:bar", "foo"
+
+            contents = xso.Text(type_=xso.Base64Binary(), default=None)
+
+        tree = etree.fromstring("<foo xmlns='uri:bar'/>")
+
+        for compiled in [True, False]:
+            TestStanza.COMPILED_PARSER = compiled
+            result = self.run_parser_one([TestStanza], tree)
+            self.assertIsNone(result.contents)
+
+    def test_parse_base64_text_error_goes_to_error_handler(self):
+        class TestStanza(xso.XSO):
+            TAG = "uri:bar", "foo"
+
+            contents = xso.Text(type_=xso.Base64Binary(), default=None)
+
+            xso_error_handler = unittest.mock.Mock(return_value=True)
+
+        tree = etree.fromstring("<foo xmlns='uri:bar'>Zm5vc</foo>")
+
+        for compiled in [True, False]:
+            TestStanza.xso_error_handler.reset_mock()
+            TestStanza.COMPILED_PARSER = compiled
+            result = self.run_parser_one([TestStanza], tree)
+            self.assertIsNone(result.contents)
+
+            (prop, value, exc_info), _ = \
+                TestStanza.xso_error_handler.call_args
+            self.assertIs(prop, TestStanza.contents.xq_descriptor)
+            self.assertIsNone(value)
+            self.assertIsInstance(exc_info[1], ValueError)
+
     def test_handle_unknown_tag_at_toplevel(self):
         tree = etree.fromstring("<foo />")
 
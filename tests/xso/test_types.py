@@ -20,6 +20,8 @@
 #
 ########################################################################
 import abc
+import base64
+import binascii
 import contextlib
 import decimal
 import fractions
@@ -131,6 +133,17 @@ class TestAbstractCDataType(unittest.TestCase):
             "23",
             self.DummyType().format(23))
 
+    def test_incremental_parser_defaults_to_None(self):
+        self.assertIsNone(self.DummyType().incremental_parser())
+
+    def test_iter_format_defaults_to_format(self):
+        t = self.DummyType()
+        with unittest.mock.patch.object(t, "format") as format_:
+            result = t.iter_format(unittest.mock.sentinel.value)
+
+        format_.assert_called_once_with(unittest.mock.sentinel.value)
+        self.assertSequenceEqual([format_()], list(result))
+
 
 class TestAbstractElementType(unittest.TestCase):
     class DummyType(xso.AbstractElementType):
@@ -758,6 +771,41 @@ class TestBase64Binary(unittest.TestCase):
             t.format(b"fnord"*20)
         )
 
+    def test_iter_format(self):
+        t = xso.Base64Binary()
+        t.FORMAT_CHUNK_SIZE = 6
+        for n in range(20):
+            data = bytes(range(n))
+            pieces = list(t.iter_format(data))
+            self.assertEqual(t.format(data), "".join(pieces))
+            self.assertEqual(max((n + 5) // 6, 1), len(pieces))
+            for piece in pieces[:-1]:
+                self.assertEqual(8, len(piece))
+
+    def test_iter_format_default_chunk_size(self):
+        t = xso.Base64Binary()
+        self.assertEqual(0, t.FORMAT_CHUNK_SIZE % 3)
+        data = bytes(range(256)) * 1000
+        pieces = list(t.iter_format(data))
+        self.assertEqual(t.format(data), "".join(pieces))
+        self.assertGreater(len(pieces), 1)
+
+    def test_iter_format_empty(self):
+        self.assertSequenceEqual(
+            [""],
+            list(xso.Base64Binary().iter_format(b""))
+        )
+        self.assertSequenceEqual(
+            ["="],
+            list(xso.Base64Binary(empty_as_equal=True).iter_format(b""))
+        )
+
+    def test_incremental_parser(self):
+        t = xso.Base64Binary()
+        parser = t.incremental_parser()
+        self.assertIsInstance(parser, xso.IncrementalBase64Decoder)
+        self.assertIsNot(parser, t.incremental_parser())
+
     def test_coerce_rejects_int(self):
         t = xso.Base64Binary()
         with self.assertRaisesRegex(TypeError,
@@ -800,6 +848,75 @@ class TestBase64Binary(unittest.TestCase):
         )
 
 
+class TestIncrementalBase64Decoder(unittest.TestCase):
+    def _decode(self, *pieces):
+        decoder = xso.IncrementalBase64Decoder()
+        for piece in pieces:
+            decoder.feed(piece)
+        return decoder.close()
+
+    def test_empty(self):
+        self.assertEqual(b"", self._decode())
+        self.assertEqual(b"", self._decode(""))
+
+    def test_matches_one_shot_decode_for_all_splits(self):
+        data = base64.b64encode(bytes(range(256)) * 3).decode("ascii")
+        data = "\n".join(data[i:i+76] for i in range(0, len(data), 76))
+        expected = base64.b64decode(data)
+
+        for i in range(len(data)):
+            for j in range(i, min(i + 9, len(data))):
+                self.assertEqual(
+                    expected,
+                    self._decode(data[:i], data[i:j], data[j:]),
+                )
+
+    def test_decodes_while_fed(self):
+        decoder = xso.IncrementalBase64Decoder()
+        decoder.feed("Zm5v")
+        decoder.feed("cmRm")
+        self.assertEqual(b"fnordf", decoder._decoded)
+        self.assertEqual(b"", decoder._pending)
+        decoder.feed("bg")
+        self.assertEqual(b"bg", decoder._pending)
+        decoder.feed("==")
+        self.assertEqual(b"fnordfn", decoder.close())
+
+    def test_ignores_characters_outside_alphabet(self):
+        data = " Zm5v\r\n cm\tQ=!"
+        self.assertEqual(
+            base64.b64decode(data),
+            self._decode(*data),
+        )
+
+    def test_data_after_padding_behaves_like_one_shot_decode(self):
+        for data in ["QQ==QUJD", "QUI=QUJD", "QQ==", "QUJD=QUJD"]:
+            self.assertEqual(
+                base64.b64decode(data),
+                self._decode(*data),
+            )
+
+    def test_incorrect_padding(self):
+        decoder = xso.IncrementalBase64Decoder()
+        decoder.feed("Zm5vc")
+        with self.assertRaises(binascii.Error):
+            decoder.close()
+
+    def test_non_ascii_raises_on_close(self):
+        decoder = xso.IncrementalBase64Decoder()
+        decoder.feed("Zm5v")
+        decoder.feed("cm\u00e4Q=")
+        decoder.feed("Zm5v")
+        with self.assertRaises(ValueError):
+            decoder.close()
+
+    def test_close_resets(self):
+        decoder = xso.IncrementalBase64Decoder()
+        decoder.feed("Zm5vcmQ=")
+        self.assertEqual(b"fnord", decoder.close())
+        self.assertEqual(b"", decoder.close())
+
+
 class TestHexBinary(unittest.TestCase):
     def test_is_cdata_type(self):
         self.assertIsInstance(